@@ -0,0 +1,151 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  benchmark_suite.py
+#
+#   Offline benchmarks for the calculators, the exporters and cold
+#   CLI startup. Results are saved as JSON together with the Python
+#   and library versions, and can be checked against an earlier
+#   result file with a regression threshold.
+#
+#   python benchmark_suite.py -o before.json
+#   (upgrade Pint, ezdxf, Pillow, pcb-tools-extension, ...)
+#   python benchmark_suite.py -o after.json --compare before.json --threshold 0.2
+##--------------------------------------------------------------------\
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from importlib import metadata
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from startup_benchmark import run_startup_benchmark
+
+LIBRARIES = ['numpy', 'Pint', 'ezdxf', 'pillow', 'pcb-tools', 'pcb-tools-extension']
+
+# 2.4 GHz microstrip patch on 1.6 mm FR-4
+PATCH = (0.03804, 0.02944, 0.01132, 0.01902, 0.00306)
+
+def calculator_args(*argv):
+    from antenna_calculator import AntennaCalculator
+    return AntennaCalculator(a=list(argv)).getArgs()
+
+def time_call(func, runs, warmup=1):
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'runs': runs}
+
+def benchmarks(workdir):
+    # name -> (callable, default runs); exporter output goes to workdir
+    from rectangular_patch import RectangularPatch
+    from dipole import Dipole
+    from monopole import Monopole
+    from dxf_generator import DXFGenerator
+    from gerber_generator import GerberGenerator
+    from print_generator import PrintGenerator
+
+    patch_args = calculator_args('rectangular_patch', '-f', '2.4e9', '-er', '4.4', '-h', '1.6e-3', '--variable_return')
+    dipole_args = calculator_args('half_wave_dipole', '-f', '2.4e9', '--variable_return')
+    monopole_args = calculator_args('quarter_wave_monopole', '-f', '2.4e9', '--variable_return')
+    export_args = calculator_args('rectangular_patch_export', '-W', '1', '-L', '1', '-x0', '1', '-y0', '1')
+    name = lambda n: os.path.join(workdir, n)
+
+    dxf = DXFGenerator(export_args)
+    gerber = GerberGenerator(export_args)
+    printer = PrintGenerator(export_args)
+    dxf.generate_patch_dxf(name('files.dxf'), *PATCH, separate_layers=True)
+    W, L, x0, y0, Ws = PATCH
+    return {
+        'rectangular_patch_calculator': (lambda: RectangularPatch(patch_args).microstrip_patch_calculator(), 200),
+        'half_wave_dipole_calculator': (lambda: Dipole(dipole_args).half_wave_dipole_calculator(), 200),
+        'quarter_wave_monopole_calculator': (lambda: Monopole(monopole_args).quarter_wave_monopole_calculator(), 200),
+        'generate_patch_dxf': (lambda: dxf.generate_patch_dxf(name('bench.dxf'), *PATCH), 20),
+        'generate_patch_dxf_layers': (lambda: dxf.generate_patch_dxf(name('layers.dxf'), *PATCH, separate_layers=True), 20),
+        'generate_gerber_from_files': (lambda: gerber.generate_gerber(name('files')), 10),
+        'dxf_to_gerber_in_memory': (lambda: gerber.generate_gerber(name('memory'), *dxf.build_patch_dxf(*PATCH, True)[1:]), 10),
+        'print_patch': (lambda: printer.print_patch(name('bench.png'), W * 100, L * 100, x0 * 100, y0 * 100, Ws * 100), 5),
+    }
+
+def library_versions():
+    versions = {}
+    for lib in LIBRARIES:
+        try:
+            versions[lib] = metadata.version(lib)
+        except metadata.PackageNotFoundError:
+            versions[lib] = None
+    return versions
+
+def run_suite(runs_scale=1.0, startup_runs=5, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for bench, (func, runs) in benchmarks(workdir).items():
+                if only and bench not in only:
+                    continue
+                results[bench] = time_call(func, max(1, int(runs * runs_scale)))
+    if startup_runs > 0:
+        for sub, t in run_startup_benchmark(SRC_DIR, startup_runs).items():
+            if not only or 'startup_' + sub in only:
+                results['startup_' + sub] = {'median_s': t, 'runs': startup_runs}
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'libraries': library_versions(), 'timestamp': time.time(), 'results': results}
+
+def compare(current, baseline, threshold):
+    # returns the names of benchmarks slower than baseline by more than threshold
+    regressions = []
+    for bench, result in current['results'].items():
+        if bench not in baseline['results']:
+            continue
+        ratio = result['median_s'] / baseline['results'][bench]['median_s']
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(bench)
+            flag = "  REGRESSION"
+        print("[*] {:<36} {:10.3f} ms  (baseline {:10.3f} ms, {:5.2f}x){}".format(
+            bench, result['median_s'] * 1e3, baseline['results'][bench]['median_s'] * 1e3, ratio, flag))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='AntennaCalculator benchmark suite')
+    parser.add_argument('-o', '--output', type=str, required=False, help='Name of .json file for the results')
+    parser.add_argument('--compare', type=str, required=False, help='Earlier .json result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown against --compare before failing, 0.2 = 20%%')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the number of runs')
+    parser.add_argument('--startup_runs', type=int, default=5, help='Cold CLI runs per subcommand, 0 to skip')
+    parser.add_argument('--only', type=str, nargs='+', required=False, help='Names of benchmarks to run')
+    args = parser.parse_args()
+
+    current = run_suite(args.scale, args.startup_runs, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print("[*] Benchmark results saved: " + args.output)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print("[*] {} benchmark(s) slower than {:.0%} over baseline: {}".format(
+                len(regressions), args.threshold, ", ".join(regressions)))
+            sys.exit(1)
+    else:
+        for bench, result in current['results'].items():
+            print("[*] {:<36} {:10.3f} ms".format(bench, result['median_s'] * 1e3))
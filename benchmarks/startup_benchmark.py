@@ -0,0 +1,64 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  startup_benchmark.py
+#
+#   Times cold runs of antenna_calculator.py for each subcommand in
+#   a fresh interpreter. Pass --compare with the src directory of
+#   another checkout (e.g. a previous release) to see the difference.
+#
+#   python startup_benchmark.py --runs 10 --compare /tmp/old/src
+##--------------------------------------------------------------------\
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+SUBCOMMANDS = {
+    'rectangular_patch': ['rectangular_patch', '-f', '2.4e9', '-er', '4.4', '-h', '1.6e-3'],
+    'half_wave_dipole': ['half_wave_dipole', '-f', '2.4e9'],
+    'quarter_wave_monopole': ['quarter_wave_monopole', '-f', '2.4e9'],
+    'rectangular_patch_export': ['rectangular_patch_export', '-W', '0.038', '-L', '0.0294', '-x0', '0.0113',
+                                 '-y0', '0.019', '-ws', '0.003', '--pngoutput', 'bench.png'],
+}
+
+def time_subcommand(src_dir, argv, runs, cwd):
+    script = os.path.join(os.path.abspath(src_dir), 'antenna_calculator.py')
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script] + argv, cwd=cwd, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def run_startup_benchmark(src_dir, runs=5, subcommands=None):
+    # returns {subcommand: median seconds}
+    results = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        for name in (subcommands or SUBCOMMANDS):
+            results[name] = time_subcommand(src_dir, SUBCOMMANDS[name], runs, cwd)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='AntennaCalculator startup benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per subcommand, the median is reported')
+    parser.add_argument('--src', type=str, default=SRC_DIR, help='src directory to benchmark')
+    parser.add_argument('--compare', type=str, required=False, help='src directory of a checkout to compare against')
+    args = parser.parse_args()
+
+    current = run_startup_benchmark(args.src, args.runs)
+    baseline = run_startup_benchmark(args.compare, args.runs) if args.compare else None
+
+    for name, t in current.items():
+        if baseline:
+            print("[*] {:<26} {:7.1f} ms  (compare {:7.1f} ms, {:.1f}x)".format(
+                name, t * 1e3, baseline[name] * 1e3, baseline[name] / t))
+        else:
+            print("[*] {:<26} {:7.1f} ms".format(name, t * 1e3))
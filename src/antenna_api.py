@@ -0,0 +1,108 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  antenna_api.py
+#
+#   Plain function API for embedding the calculator. The functions
+#   take numbers, return small __slots__ result records and never
+#   print or touch argparse. All lengths are in meters.
+#
+#   from antenna_api import design_rectangular_patch
+#   d = design_rectangular_patch(2.4e9, 4.4, 1.6e-3, feed='probe')
+#   d.W, d.L, d.x0, d.y0
+##--------------------------------------------------------------------\
+
+import math
+
+import patch_equations as eq
+
+C = eq.C
+
+class Record:
+    # base for the result records, fields are listed in __slots__ and
+    # given positionally or by keyword
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name in self.__slots__[len(args):]:
+            setattr(self, name, kwargs.pop(name))
+        if kwargs:
+            raise TypeError("unexpected fields: " + ", ".join(kwargs))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__,
+                               ", ".join("{}={!r}".format(n, getattr(self, n)) for n in self.__slots__))
+
+    def __getstate__(self):
+        return self.as_dict()
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class PatchDesign(Record):
+    # Ws is None for probe fed patches, or when no strip width form is valid.
+    # Zin_0 is the edge resistance, A and B the two strip width forms and
+    # their Ws/h, B only when the A form is not valid (None for probe feeds)
+    __slots__ = ('feed', 'frequency', 'relative_permittivity', 'height', 'Z0',
+                 'W', 'L', 'x0', 'y0', 'Ws', 'Ereff', 'dL', 'Leff', 'Zin_0', 'A', 'A_wsd', 'B', 'B_wsd')
+
+    def params(self):
+        # the tuple returned by RectangularPatch with --variable_return
+        if self.feed == 'microstrip':
+            return self.W, self.L, self.x0, self.y0, self.Ws
+        return self.W, self.L, self.x0, self.y0
+
+
+class DipoleDesign(Record):
+    __slots__ = ('frequency', 'L_total', 'L_element')
+
+
+class MonopoleDesign(Record):
+    __slots__ = ('frequency', 'L')
+
+
+def design_rectangular_patch(f, er, h, feed='microstrip', Z0=50):
+    # the equations of patch_equations.py on plain numbers, the same ones
+    # RectangularPatchBatch applies to arrays
+    if feed not in ('microstrip', 'probe'):
+        raise ValueError("feed must be 'microstrip' or 'probe'")
+    W = eq.patch_width(f, er)
+    ereff = eq.effective_relative_permittivity(er, h, W)
+    dL = eq.delta_length(h, ereff, W)
+    Leff = eq.effective_length(f, ereff)
+    L = Leff - 2*dL
+    Zin_0 = eq.edge_resistance(L, W, er)
+    x0 = eq.x0_calculation(L, W, er, Z0)
+    if math.isnan(x0):
+        raise ValueError("no inset feed point gives {} ohms, the edge resistance is {:.2f} ohms".format(Z0, Zin_0))
+    Ws = A = A_wsd = B = B_wsd = None
+    if feed == 'microstrip':
+        # as eq.strip_width_ratio(), keeping both forms for the record
+        A, A_wsd = eq.A_calculation(Z0, er), eq.A_wsd(Z0, er)
+        if A_wsd < 2:
+            Ws = A_wsd * h
+        else:
+            B, B_wsd = eq.B_calculation(Z0, er), eq.B_wsd(Z0, er)
+            if B_wsd > 2:
+                Ws = B_wsd * h
+            elif math.isnan(B_wsd):
+                B_wsd = None
+    return PatchDesign(feed, f, er, h, Z0, W, L, x0, eq.y0_calculation(W), Ws, ereff, dL, Leff, Zin_0,
+                       A, A_wsd, B, B_wsd)
+
+def design_half_wave_dipole(f):
+    l = C / (2 * f)
+    return DipoleDesign(f, l, l/2)
+
+def design_quarter_wave_monopole(f):
+    return MonopoleDesign(f, C / (4 * f))
@@ -9,9 +9,16 @@
 
 
 import argparse
-from rectangular_patch import RectangularPatch
-from dipole import Dipole
-from monopole import Monopole
+
+# the calculator modules are imported in main() so that each subcommand only
+# loads what it needs (numpy, Pint and the exporter libraries are slow to import)
+
+def gerber_format(value):
+    # --gerber_format N.M as (integer digits, decimal digits), 1 to 6 each as RS-274X allows
+    digits = value.split('.')
+    if len(digits) != 2 or not all(d.isdigit() and 1 <= int(d) <= 6 for d in digits):
+        raise argparse.ArgumentTypeError("expected integer.decimal digits from 1 to 6, e.g. 3.4, got '{}'".format(value))
+    return int(digits[0]), int(digits[1])
 
 class AntennaCalculator:
     def __init__(self, a=None):
@@ -19,6 +26,28 @@ class AntennaCalculator:
         main_parser.add_argument('--help', action='help', default=argparse.SUPPRESS,
                                  help='Show this help message and exit')
         main_parser.add_argument('--version', action='version', version='%(prog)s 2.0')
+        main_parser.add_argument('--profile', type=str, required=False,
+                                 help='Record time and peak memory per stage, saved to this .json file or printed for -')
+        main_parser.add_argument('--profile_cprofile', type=str, required=False,
+                                 help='Also save cProfile statistics to this file')
+        main_parser.add_argument('--cache', action='store_true', default=False,
+                                 help='Reuse results of points that were already calculated')
+        main_parser.add_argument('--cache_file', type=str, required=False,
+                                 help='SQLite file that keeps cached results between runs, implies --cache')
+        main_parser.add_argument('--cache_size', type=int, required=False, default=4096,
+                                 help='Number of results kept in memory')
+        main_parser.add_argument('--cache_disk_size', type=int, required=False, default=1000000,
+                                 help='Number of results kept in the cache file')
+        main_parser.add_argument('--cache_clear', action='store_true', default=False,
+                                 help='Empty the cache file and the export cache before running, needs --cache_file or --export_cache')
+        main_parser.add_argument('--cache_stats', action='store_true', default=False,
+                                 help='Print cache hits and misses after running')
+        main_parser.add_argument('--export_cache', type=str, required=False,
+                                 help='Directory that keeps exported PNG, DXF and gerber files for reuse')
+        main_parser.add_argument('--export_cache_size', type=float, required=False, default=1024,
+                                 help='Size limit of the export cache in MB')
+        main_parser.add_argument('--export_cache_copy', action='store_true', default=False,
+                                 help='Copy files out of the export cache instead of hard linking them')
 
         subparsers = main_parser.add_subparsers(help='sub-command help', dest='subparser_'
                                                                               'name')
@@ -36,6 +65,8 @@ class AntennaCalculator:
                                                  help='Relative permittivity')
         rectangular_patch_subparser.add_argument('-h', '--height', type=float, required=True,
                                                  help='Substrate height in meters')
+        rectangular_patch_subparser.add_argument('-z0', '--impedance', type=float, required=False, default=50,
+                                                 help='Feed impedance in ohms, sets x0 and Ws')
         rectangular_patch_subparser.add_argument('-u', '--unit', type=str,
                                                  choices=['meter', 'centimeter', 'millimeter', 'inch'], required=False,
                                                  help='Unit of measurement')
@@ -46,8 +77,26 @@ class AntennaCalculator:
                                                  help='Name of .dxf file')
         rectangular_patch_subparser.add_argument('--gerberoutput', type=str, required=False,
                                                  help='Name of gerber file, no extension needed')                                                 
+        rectangular_patch_subparser.add_argument('--keep_dxf', action='store_true', required=False, default=False,
+                                                 help='Also write the intermediate DXF files used for gerber output')
+        rectangular_patch_subparser.add_argument('--gerber_engine', type=str, choices=['gerberex', 'native'],
+                                                 default='gerberex', help='Gerber writer, pcb-tools-extension or the built in RS-274X writer')
+        rectangular_patch_subparser.add_argument('--gerberunit', type=str, choices=['millimeter', 'inch'],
+                                                 default='millimeter', help='Gerber unit of measurement (native writer)')
+        rectangular_patch_subparser.add_argument('--gerber_format', type=gerber_format, required=False,
+                                                 help='Gerber coordinate format as integer.decimal digits, e.g. 3.4 (native writer)')
         rectangular_patch_subparser.add_argument('--pngoutput', type=str, required=False,
                                                  help='Name of .png image for printing')
+        rectangular_patch_subparser.add_argument('--png_dpi', type=int, required=False, default=300,
+                                                 help='Resolution of the .png image in dots per inch')
+        rectangular_patch_subparser.add_argument('--png_mode', type=str, choices=['rgb', 'grayscale', '1bit'], default='rgb',
+                                                 help='Color mode of the .png image, 1bit uses the least memory')
+        rectangular_patch_subparser.add_argument('--paper', type=str, choices=['letter', 'legal', 'tabloid', 'a4', 'a3'], default='letter',
+                                                 help='Paper size of the .png image')
+        rectangular_patch_subparser.add_argument('--png_crop', action='store_true', required=False, default=False,
+                                                 help='Make the .png image only as large as the substrate instead of the paper')
+        rectangular_patch_subparser.add_argument('--show_png', action='store_true', required=False, default=False,
+                                                 help='Open the .png image in the image viewer after saving')
         rectangular_patch_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
                                                  help='Return Variables instead of printing')
 
@@ -72,8 +121,72 @@ class AntennaCalculator:
                                                         help='Name of .dxf file')
         rectangular_patch_export_subparser.add_argument('--gerberoutput', type=str, required=False, 
                                                         help='Name of gerber file, no extension needed')                                                        
+        rectangular_patch_export_subparser.add_argument('--keep_dxf', action='store_true', required=False, default=False,
+                                                        help='Also write the intermediate DXF files used for gerber output')
+        rectangular_patch_export_subparser.add_argument('--gerber_engine', type=str, choices=['gerberex', 'native'],
+                                                        default='gerberex', help='Gerber writer, pcb-tools-extension or the built in RS-274X writer')
+        rectangular_patch_export_subparser.add_argument('--gerberunit', type=str, choices=['millimeter', 'inch'],
+                                                        default='millimeter', help='Gerber unit of measurement (native writer)')
+        rectangular_patch_export_subparser.add_argument('--gerber_format', type=gerber_format, required=False,
+                                                        help='Gerber coordinate format as integer.decimal digits, e.g. 3.4 (native writer)')
         rectangular_patch_export_subparser.add_argument('--pngoutput', type=str, required=False, 
                                                         help='Name of .png image for printing')
+        rectangular_patch_export_subparser.add_argument('--png_dpi', type=int, required=False, default=300,
+                                                        help='Resolution of the .png image in dots per inch')
+        rectangular_patch_export_subparser.add_argument('--png_mode', type=str, choices=['rgb', 'grayscale', '1bit'], default='rgb',
+                                                        help='Color mode of the .png image, 1bit uses the least memory')
+        rectangular_patch_export_subparser.add_argument('--paper', type=str, choices=['letter', 'legal', 'tabloid', 'a4', 'a3'], default='letter',
+                                                        help='Paper size of the .png image')
+        rectangular_patch_export_subparser.add_argument('--png_crop', action='store_true', required=False, default=False,
+                                                        help='Make the .png image only as large as the substrate instead of the paper')
+        rectangular_patch_export_subparser.add_argument('--show_png', action='store_true', required=False, default=False,
+                                                        help='Open the .png image in the image viewer after saving')
+
+        rectangular_patch_batch_export_subparser = subparsers.add_parser('rectangular_patch_batch_export', add_help=False)
+        rectangular_patch_batch_export_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                                              help='Show this help message and exit')
+        rectangular_patch_batch_export_subparser.add_argument('--verbose', action='store_true')
+        rectangular_patch_batch_export_subparser.add_argument('-m', '--manifest', type=str, required=True,
+                                                              help='CSV or JSON lines file with one patch per row')
+        rectangular_patch_batch_export_subparser.add_argument('-j', '--workers', type=int, required=False, default=None,
+                                                              help='Number of worker processes, all cores by default')
+        rectangular_patch_batch_export_subparser.add_argument('--output_dir', type=str, required=False,
+                                                              help='Directory the output files are written to')
+        rectangular_patch_batch_export_subparser.add_argument('--summary', type=str, required=False,
+                                                              help='Name of .json file for the batch summary')
+
+        rectangular_patch_panel_subparser = subparsers.add_parser('rectangular_patch_panel', add_help=False)
+        rectangular_patch_panel_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                                       help='Show this help message and exit')
+        rectangular_patch_panel_subparser.add_argument('--verbose', action='store_true')
+        rectangular_patch_panel_subparser.add_argument('--type', type=str, choices=['microstrip', 'probe'], default='microstrip',
+                                                       help='Type of patch for manifest rows without a type')
+        rectangular_patch_panel_subparser.add_argument('-m', '--manifest', type=str, required=True,
+                                                       help='CSV or JSON lines file with one patch per row')
+        rectangular_patch_panel_subparser.add_argument('--columns', type=int, required=False,
+                                                       help='Number of columns in the panel grid, square by default')
+        rectangular_patch_panel_subparser.add_argument('--spacing', type=float, required=False, default=0.005,
+                                                       help='Spacing between substrates in meters')
+        rectangular_patch_panel_subparser.add_argument('-du', '--dxfunit', type=str, choices=['meter', 'centimeter', 'millimeter', 'inch'],
+                                                       required=False, help='DXF Unit of measurement')
+        rectangular_patch_panel_subparser.add_argument('--dxfoutput', type=str, required=False,
+                                                       help='Name of .dxf file')
+        rectangular_patch_panel_subparser.add_argument('--gerberoutput', type=str, required=False,
+                                                       help='Name of gerber file, no extension needed')
+        rectangular_patch_panel_subparser.add_argument('--gerber_engine', type=str, choices=['gerberex', 'native'],
+                                                       default='gerberex', help='Gerber writer, pcb-tools-extension or the built in RS-274X writer')
+        rectangular_patch_panel_subparser.add_argument('--gerberunit', type=str, choices=['millimeter', 'inch'],
+                                                       default='millimeter', help='Gerber unit of measurement (native writer)')
+        rectangular_patch_panel_subparser.add_argument('--gerber_format', type=gerber_format, required=False,
+                                                       help='Gerber coordinate format as integer.decimal digits, e.g. 3.4 (native writer)')
+        rectangular_patch_panel_subparser.add_argument('--pngoutput', type=str, required=False,
+                                                       help='Name of .png image for printing, numbered per page')
+        rectangular_patch_panel_subparser.add_argument('--png_dpi', type=int, required=False, default=300,
+                                                       help='Resolution of the .png image in dots per inch')
+        rectangular_patch_panel_subparser.add_argument('--png_mode', type=str, choices=['rgb', 'grayscale', '1bit'], default='rgb',
+                                                       help='Color mode of the .png image, 1bit uses the least memory')
+        rectangular_patch_panel_subparser.add_argument('--paper', type=str, choices=['letter', 'legal', 'tabloid', 'a4', 'a3'], default='letter',
+                                                       help='Paper size of the .png image')
 
         #HALF WAVE DIPOLE
         half_wave_dipole_subparser = subparsers.add_parser('half_wave_dipole', add_help=False)
@@ -100,35 +213,425 @@ class AntennaCalculator:
                                                      required=False, help='Unit of measurement')
         quarter_wave_monopole_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
                                                  help='Return Variables instead of printing')
-        
-        
+
+
+        # WIRE DIPOLE / MONOPOLE
+        wire_subparser = subparsers.add_parser('wire_antenna', add_help=False)
+        wire_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                    help='Show this help message and exit')
+        wire_subparser.add_argument('--verbose', action='store_true')
+        wire_subparser.add_argument('antenna', type=str, choices=['dipole', 'monopole'],
+                                    help='Centre fed dipole or monopole over a ground plane')
+        wire_subparser.add_argument('-f', '--frequency', type=str, required=True,
+                                    help='Frequency in Hz, comma separated for several')
+        wire_subparser.add_argument('-d', '--diameter', type=str, required=True, help='Wire diameter in meters')
+        wire_subparser.add_argument('-vf', '--velocity_factor', type=str, required=False, default='1',
+                                    help='Velocity factor of the wire')
+        wire_subparser.add_argument('--harmonic', type=str, required=False, default='1',
+                                    help='Odd number of half waves on a dipole, quarter waves on a monopole')
+        wire_subparser.add_argument('-z0', '--impedance', type=float, required=False, default=50,
+                                    help='Feed impedance in ohms')
+        wire_subparser.add_argument('--vswr', type=float, required=False, default=2.0,
+                                    help='VSWR limit of the bandwidth')
+        wire_subparser.add_argument('-u', '--unit', type=str, choices=['meter', 'centimeter', 'millimeter', 'inch'],
+                                    required=False, help='Unit of measurement')
+        wire_subparser.add_argument('-o', '--output', type=str, required=False,
+                                    help='Name of output file (.csv, .npy, .parquet or .store)')
+        wire_subparser.add_argument('--format', type=str, choices=['csv', 'npy', 'parquet', 'store'], required=False,
+                                    help='Output format, taken from the file extension if not given')
+        wire_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
+                                    help='Return Variables instead of printing')
+
+
+        # RESIDENT SERVER
+        serve_subparser = subparsers.add_parser('serve', add_help=False)
+        serve_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                     help='Show this help message and exit')
+        serve_subparser.add_argument('--verbose', action='store_true')
+        serve_subparser.add_argument('--port', type=int, required=False,
+                                     help='Serve HTTP on this port instead of reading JSON lines from stdin')
+        serve_subparser.add_argument('--host', type=str, required=False, default='127.0.0.1',
+                                     help='Address the HTTP server binds to')
+        serve_subparser.add_argument('--unix', type=str, required=False,
+                                     help='Serve JSON lines on this Unix socket path instead of stdin')
+        serve_subparser.add_argument('-j', '--workers', type=int, required=False, default=4,
+                                     help='Number of requests handled at once when reading stdin')
+
+        # PARAMETRIC SWEEP
+        sweep_subparser = subparsers.add_parser('sweep', add_help=False)
+        sweep_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                     help='Show this help message and exit')
+        sweep_subparser.add_argument('--verbose', action='store_true')
+        sweep_subparser.add_argument('antenna', type=str,
+                                     choices=['rectangular_patch', 'half_wave_dipole', 'quarter_wave_monopole'],
+                                     help='Antenna to sweep')
+        sweep_subparser.add_argument('--type', type=str, choices=['microstrip', 'probe'], default='microstrip',
+                                     help='Type of patch')
+        sweep_subparser.add_argument('-f', '--frequency', type=str, required=True,
+                                     help='Frequency in Hz, as start:stop:step or a comma separated list')
+        sweep_subparser.add_argument('-er', '--relative_permittivity', type=str, required=False,
+                                     help='Relative permittivity, as start:stop:step or a comma separated list')
+        sweep_subparser.add_argument('-h', '--height', type=str, required=False,
+                                     help='Substrate height in meters, as start:stop:step or a comma separated list')
+        sweep_subparser.add_argument('-z0', '--impedance', type=str, required=False, default='50',
+                                     help='Feed impedance in ohms, as start:stop:step or a comma separated list')
+        sweep_subparser.add_argument('-o', '--output', type=str, required=True,
+                                     help='Name of output file (.csv, .npy, .parquet or .store)')
+        sweep_subparser.add_argument('--format', type=str, choices=['csv', 'npy', 'parquet', 'store'], required=False,
+                                     help='Output format, taken from the file extension if not given')
+        sweep_subparser.add_argument('--chunk_size', type=int, required=False, default=262144,
+                                     help='Number of points calculated and written at a time')
+        sweep_subparser.add_argument('--bandwidth', action='store_true', required=False, default=False,
+                                     help='Add the feed resistance, Q and -10 dB bandwidth in Hz of each patch')
+        sweep_subparser.add_argument('--loss_tangent', type=float, required=False, default=0.0,
+                                     help='Substrate loss tangent for --bandwidth')
+
+        # IMPEDANCE SWEEP
+        impedance_subparser = subparsers.add_parser('impedance', add_help=False)
+        impedance_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                         help='Show this help message and exit')
+        impedance_subparser.add_argument('--verbose', action='store_true')
+        impedance_subparser.add_argument('--type', type=str, choices=['microstrip', 'probe'], default='microstrip',
+                                         help='Type of patch')
+        impedance_subparser.add_argument('-f', '--frequency', type=float, required=True, help='Design frequency in Hz')
+        impedance_subparser.add_argument('-er', '--relative_permittivity', type=float, required=True,
+                                         help='Relative permittivity')
+        impedance_subparser.add_argument('-h', '--height', type=float, required=True,
+                                         help='Substrate height in meters')
+        impedance_subparser.add_argument('-z0', '--impedance', type=float, required=False, default=50,
+                                         help='Feed and reference impedance in ohms')
+        impedance_subparser.add_argument('--loss_tangent', type=float, required=False, default=0.0,
+                                         help='Substrate loss tangent')
+        impedance_subparser.add_argument('--start', type=float, required=False,
+                                         help='First frequency of the sweep in Hz, 10%% below resonance by default')
+        impedance_subparser.add_argument('--stop', type=float, required=False,
+                                         help='Last frequency of the sweep in Hz, 10%% above resonance by default')
+        impedance_subparser.add_argument('--points', type=int, required=False, default=10001,
+                                         help='Number of frequencies in the sweep')
+        impedance_subparser.add_argument('-o', '--output', type=str, required=False,
+                                         help='Name of output file (.csv, .npy, .parquet or .store)')
+        impedance_subparser.add_argument('--format', type=str, choices=['csv', 'npy', 'parquet', 'store'], required=False,
+                                         help='Output format, taken from the file extension if not given')
+        impedance_subparser.add_argument('--chunk_size', type=int, required=False, default=262144,
+                                         help='Number of frequencies calculated and written at a time')
+        impedance_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
+                                         help='Return Variables instead of printing')
+
+        # MONTE CARLO TOLERANCE ANALYSIS
+        tolerance_subparser = subparsers.add_parser('tolerance', add_help=False)
+        tolerance_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                         help='Show this help message and exit')
+        tolerance_subparser.add_argument('--verbose', action='store_true')
+        tolerance_subparser.add_argument('--type', type=str, choices=['microstrip', 'probe'], default='microstrip',
+                                         help='Type of patch')
+        tolerance_subparser.add_argument('-f', '--frequency', type=float, required=True, help='Design frequency in Hz')
+        tolerance_subparser.add_argument('-er', '--relative_permittivity', type=float, required=True,
+                                         help='Nominal relative permittivity')
+        tolerance_subparser.add_argument('-h', '--height', type=float, required=True,
+                                         help='Nominal substrate height in meters')
+        tolerance_subparser.add_argument('-z0', '--impedance', type=float, required=False, default=50,
+                                         help='Feed and reference impedance in ohms')
+        tolerance_subparser.add_argument('--loss_tangent', type=float, required=False, default=0.0,
+                                         help='Substrate loss tangent')
+        tolerance_subparser.add_argument('--tol_er', type=str, required=False,
+                                         help='Distribution of the relative permittivity, e.g. normal:0.1 or uniform:2%%')
+        tolerance_subparser.add_argument('--tol_h', type=str, required=False,
+                                         help='Distribution of the substrate height')
+        tolerance_subparser.add_argument('--tol_W', type=str, required=False, help='Distribution of the etched W')
+        tolerance_subparser.add_argument('--tol_L', type=str, required=False, help='Distribution of the etched L')
+        tolerance_subparser.add_argument('--tol_x0', type=str, required=False, help='Distribution of the etched x0')
+        tolerance_subparser.add_argument('--tol_etch', type=str, required=False,
+                                         help='Distribution of the over-etch per copper edge, shrinks W and L together')
+        tolerance_subparser.add_argument('-n', '--samples', type=int, required=False, default=1000000,
+                                         help='Number of Monte Carlo samples')
+        tolerance_subparser.add_argument('--seed', type=int, required=False,
+                                         help='Seed for reproducible runs, random by default')
+        tolerance_subparser.add_argument('-j', '--workers', type=int, required=False, default=None,
+                                         help='Number of worker processes, all cores by default')
+        tolerance_subparser.add_argument('--chunk_size', type=int, required=False, default=262144,
+                                         help='Number of samples per block')
+        tolerance_subparser.add_argument('--bins', type=int, required=False, default=1000,
+                                         help='Number of histogram bins')
+        tolerance_subparser.add_argument('-o', '--output', type=str, required=False,
+                                         help='Name of .json file for quantiles and histograms')
+        tolerance_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
+                                         help='Return Variables instead of printing')
+
+        # INVERSE DESIGN
+        inverse_subparser = subparsers.add_parser('inverse', add_help=False)
+        inverse_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                       help='Show this help message and exit')
+        inverse_subparser.add_argument('--verbose', action='store_true')
+        inverse_subparser.add_argument('query', type=str,
+                                       choices=['frequency', 'resonance', 'permittivity', 'permittivity_width',
+                                                'strip_impedance', 'inset_impedance'],
+                                       help='Quantity to solve for')
+        inverse_subparser.add_argument('-f', '--frequency', type=str, required=False, help='Frequency in Hz')
+        inverse_subparser.add_argument('-er', '--relative_permittivity', type=str, required=False,
+                                       help='Relative permittivity')
+        inverse_subparser.add_argument('-h', '--height', type=str, required=False, help='Substrate height in meters')
+        inverse_subparser.add_argument('-W', '--width', type=str, required=False, help='Patch width in meters')
+        inverse_subparser.add_argument('-L', '--length', type=str, required=False, help='Patch length in meters')
+        inverse_subparser.add_argument('-ws', '--strip_width', type=str, required=False, help='Strip width in meters')
+        inverse_subparser.add_argument('-x0', type=str, required=False, help='Inset depth in meters')
+        inverse_subparser.add_argument('-o', '--output', type=str, required=False,
+                                       help='Name of output file (.csv, .npy, .parquet or .store)')
+        inverse_subparser.add_argument('--format', type=str, choices=['csv', 'npy', 'parquet', 'store'], required=False,
+                                       help='Output format, taken from the file extension if not given')
+        inverse_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
+                                       help='Return Variables instead of printing')
+
+        # SUBSTRATE SEARCH
+        substrate_subparser = subparsers.add_parser('substrate_search', add_help=False)
+        substrate_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                         help='Show this help message and exit')
+        substrate_subparser.add_argument('--verbose', action='store_true')
+        substrate_subparser.add_argument('--type', type=str, choices=['microstrip', 'probe'], default='microstrip',
+                                         help='Type of patch')
+        substrate_subparser.add_argument('-f', '--frequency', type=float, required=False, help='Target frequency in Hz')
+        substrate_subparser.add_argument('-z0', '--impedance', type=float, required=False, default=50,
+                                         help='Feed impedance in ohms')
+        substrate_subparser.add_argument('--list', action='store_true', required=False, default=False,
+                                         help='List the substrate catalog and exit')
+        substrate_subparser.add_argument('--materials', type=str, required=False,
+                                         help='JSON file of materials added to the catalog')
+        substrate_subparser.add_argument('--substrates', type=str, required=False,
+                                         help='Comma separated materials to search, the whole catalog by default')
+        substrate_subparser.add_argument('--thickness', type=str, required=False,
+                                         help='Thicknesses in meters (start:stop:step or a,b,c) instead of the standard ones')
+        substrate_subparser.add_argument('--max_width', type=float, required=False, help='Maximum patch width in meters')
+        substrate_subparser.add_argument('--max_length', type=float, required=False, help='Maximum patch length in meters')
+        substrate_subparser.add_argument('--max_area', type=float, required=False, help='Maximum patch area in square meters')
+        substrate_subparser.add_argument('--min_strip_width', type=float, required=False,
+                                         help='Narrowest feed line the fab can etch, in meters')
+        substrate_subparser.add_argument('--min_height', type=float, required=False, help='Minimum thickness in meters')
+        substrate_subparser.add_argument('--max_height', type=float, required=False, help='Maximum thickness in meters')
+        substrate_subparser.add_argument('--max_loss_tangent', type=float, required=False, help='Maximum loss tangent')
+        substrate_subparser.add_argument('--min_bandwidth', type=float, required=False,
+                                         help='Minimum -10 dB bandwidth in Hz')
+        substrate_subparser.add_argument('--min_efficiency', type=float, required=False,
+                                         help='Minimum radiation efficiency against dielectric loss, 0 to 1')
+        substrate_subparser.add_argument('--objectives', type=str, required=False, default='area,bandwidth,efficiency',
+                                         help='Comma separated Pareto objectives, ranked by the first: area, bandwidth, '
+                                              'efficiency, height, strip_width, loss_tangent')
+        substrate_subparser.add_argument('-j', '--workers', type=int, required=False, default=None,
+                                         help='Number of worker processes, all cores by default')
+        substrate_subparser.add_argument('--chunk_size', type=int, required=False, default=65536,
+                                         help='Number of candidates per block')
+        substrate_subparser.add_argument('-o', '--output', type=str, required=False,
+                                         help='Name of .json file for the Pareto set')
+        substrate_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
+                                         help='Return Variables instead of printing')
+
+        # FAR-FIELD PATTERN
+        pattern_subparser = subparsers.add_parser('pattern', add_help=False)
+        pattern_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                       help='Show this help message and exit')
+        pattern_subparser.add_argument('--verbose', action='store_true')
+        pattern_subparser.add_argument('antenna', type=str,
+                                       choices=['rectangular_patch', 'half_wave_dipole', 'quarter_wave_monopole'],
+                                       help='Antenna to design and evaluate')
+        pattern_subparser.add_argument('--type', type=str, choices=['microstrip', 'probe'], default='microstrip',
+                                       help='Type of patch')
+        pattern_subparser.add_argument('-f', '--frequency', type=float, required=True, help='Frequency in Hz')
+        pattern_subparser.add_argument('-er', '--relative_permittivity', type=float, required=False,
+                                       help='Relative permittivity')
+        pattern_subparser.add_argument('-h', '--height', type=float, required=False,
+                                       help='Substrate height in meters')
+        pattern_subparser.add_argument('-z0', '--impedance', type=float, required=False, default=50,
+                                       help='Feed impedance in ohms')
+        pattern_subparser.add_argument('--theta_step', type=float, required=False, default=1.0,
+                                       help='Grid step in theta, degrees')
+        pattern_subparser.add_argument('--phi_step', type=float, required=False, default=1.0,
+                                       help='Grid step in phi, degrees')
+        pattern_subparser.add_argument('-o', '--output', type=str, required=False,
+                                       help='Name of output file for the pattern grid (.csv, .npy, .parquet or .store)')
+        pattern_subparser.add_argument('--format', type=str, choices=['csv', 'npy', 'parquet', 'store'], required=False,
+                                       help='Output format, taken from the file extension if not given')
+        pattern_subparser.add_argument('--chunk_size', type=int, required=False, default=262144,
+                                       help='Number of grid points evaluated at a time')
+        pattern_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
+                                       help='Return Variables instead of printing')
+
+        # ANTENNA ARRAY
+        array_subparser = subparsers.add_parser('array', add_help=False)
+        array_subparser.add_argument('--help', action='help', default=argparse.SUPPRESS,
+                                     help='Show this help message and exit')
+        array_subparser.add_argument('--verbose', action='store_true')
+        array_subparser.add_argument('antenna', type=str,
+                                     choices=['rectangular_patch', 'half_wave_dipole', 'quarter_wave_monopole', 'isotropic'],
+                                     help='Array element, designed for the given frequency')
+        array_subparser.add_argument('--type', type=str, choices=['microstrip', 'probe'], default='microstrip',
+                                     help='Type of patch')
+        array_subparser.add_argument('-f', '--frequency', type=float, required=True, help='Frequency in Hz')
+        array_subparser.add_argument('-er', '--relative_permittivity', type=float, required=False,
+                                     help='Relative permittivity')
+        array_subparser.add_argument('-h', '--height', type=float, required=False,
+                                     help='Substrate height in meters')
+        array_subparser.add_argument('-z0', '--impedance', type=float, required=False, default=50,
+                                     help='Feed impedance in ohms')
+        array_subparser.add_argument('-N', type=int, required=False, default=1, help='Number of elements along x')
+        array_subparser.add_argument('-M', type=int, required=False, default=1, help='Number of elements along y')
+        array_subparser.add_argument('--dx', type=float, required=False,
+                                     help='Element spacing along x in meters, half a wavelength by default')
+        array_subparser.add_argument('--dy', type=float, required=False,
+                                     help='Element spacing along y in meters, half a wavelength by default')
+        array_subparser.add_argument('--taper', type=str, choices=['uniform', 'cosine', 'hamming', 'hann', 'blackman'],
+                                     default='uniform', help='Amplitude taper along each axis of the grid')
+        array_subparser.add_argument('--positions', type=str, required=False,
+                                     help='CSV file with columns x, y and optionally z, amplitude, phase, instead of a grid')
+        array_subparser.add_argument('--steer_theta', type=float, required=False, default=0.0,
+                                     help='Main beam direction theta in degrees')
+        array_subparser.add_argument('--steer_phi', type=float, required=False, default=0.0,
+                                     help='Main beam direction phi in degrees')
+        array_subparser.add_argument('--theta_step', type=float, required=False, default=1.0,
+                                     help='Grid step in theta, degrees')
+        array_subparser.add_argument('--phi_step', type=float, required=False, default=1.0,
+                                     help='Grid step in phi, degrees')
+        array_subparser.add_argument('-o', '--output', type=str, required=False,
+                                     help='Name of output file for the pattern grid (.csv, .npy, .parquet or .store)')
+        array_subparser.add_argument('--format', type=str, choices=['csv', 'npy', 'parquet', 'store'], required=False,
+                                     help='Output format, taken from the file extension if not given')
+        array_subparser.add_argument('--chunk_size', type=int, required=False, default=262144,
+                                     help='Number of grid points evaluated at a time')
+        array_subparser.add_argument('--variable_return', action='store_true', required=False, default=False,
+                                     help='Return Variables instead of printing')
+
 
         self.args = main_parser.parse_args(a)
+        if self.args.cache_clear and not (self.args.cache or self.args.cache_file or self.args.export_cache):
+            main_parser.error("--cache_clear needs a cache to clear, give --cache_file or --export_cache")
         self.calcedParams = None #to catch returned vars if they exist
 
 
     def main(self, args):
+        cache = None
+        if args.cache or args.cache_file:
+            from result_cache import ResultCache, get_cache, set_cache
+            cache = get_cache()
+            if cache is None:
+                cache = ResultCache(args.cache_size, args.cache_file, args.cache_disk_size)
+                set_cache(cache)
+            if args.cache_clear:
+                cache.clear()
+                print("[*] Cache cleared")
+
+        export_cache = None
+        if args.export_cache:
+            from export_cache import ExportCache, get_export_cache, set_export_cache
+            export_cache = get_export_cache()
+            if export_cache is None or export_cache.directory != args.export_cache:
+                export_cache = ExportCache(args.export_cache, int(args.export_cache_size * 1024 * 1024),
+                                           args.export_cache_copy)
+                set_export_cache(export_cache)
+            if args.cache_clear:
+                export_cache.clear()
+                print("[*] Export cache cleared")
+
+        if args.profile or args.profile_cprofile:
+            self.profiled_subcommand(args)
+        else:
+            self.subcommand(args)
+
+        if cache is not None and args.cache_stats:
+            stats = cache.stats()
+            print("[*] Cache: {} hits ({} from disk), {} misses".format(stats['hits'], stats['disk_hits'], stats['misses']))
+        if export_cache is not None and args.cache_stats:
+            stats = export_cache.stats()
+            print("[*] Export cache: {} hits, {} misses, {} entries, {:.1f} MB".format(
+                stats['hits'], stats['misses'], stats['entries'], stats['bytes'] / 1024 / 1024))
+
+    def profiled_subcommand(self, args):
+        from profiler import StageProfiler, get_profiler, set_profiler, stage
+        profiler = get_profiler()
+        if args.profile and not profiler.enabled:
+            profiler = StageProfiler()
+            set_profiler(profiler)
+        cprofile = None
+        if args.profile_cprofile:
+            import cProfile
+            cprofile = cProfile.Profile()
+            cprofile.enable()
+        try:
+            with stage("total"):
+                self.subcommand(args)
+        finally:
+            if cprofile is not None:
+                cprofile.disable()
+                cprofile.dump_stats(args.profile_cprofile)
+                print("[*] cProfile stats saved: " + args.profile_cprofile)
+            if args.profile:
+                if args.profile == '-':
+                    profiler.print_report()
+                else:
+                    profiler.save(args.profile)
+                    print("[*] Profile report saved: " + args.profile)
+
+    def subcommand(self, args):
+        if args.subparser_name in ('rectangular_patch', 'rectangular_patch_export'):
+            from rectangular_patch import RectangularPatch
         if args.subparser_name == 'rectangular_patch':
             rPatch = RectangularPatch(args)
-            self.calcedParams = rPatch.microstrip_patch_calculator()
+            self.calcedParams = rPatch.microstrip_patch_calculator(args.impedance)
 
         if args.subparser_name == 'rectangular_patch_export':
             rPatch = RectangularPatch(args)
-            if args.pngoutput:
-                rPatch.export_patch_to_png()
-            if args.dxfoutput:
-                rPatch.export_patch_to_dxf()
-            if args.gerberoutput:
-                rPatch.export_patch_to_gerber()
+            rPatch.export_patch()
+
+        if args.subparser_name == 'rectangular_patch_batch_export':
+            from batch_export import BatchExporter
+            self.calcedParams = BatchExporter(args).run()
+
+        if args.subparser_name == 'rectangular_patch_panel':
+            from panel_generator import PanelGenerator
+            self.calcedParams = PanelGenerator(args).run()
 
         if args.subparser_name == 'half_wave_dipole':
+            from dipole import Dipole
             d = Dipole(args)
             self.calcedParams = d.half_wave_dipole_calculator()
 
         if args.subparser_name == 'quarter_wave_monopole':
+            from monopole import Monopole
             m = Monopole(args)
             self.calcedParams = m.quarter_wave_monopole_calculator()
 
+        if args.subparser_name == 'wire_antenna':
+            from wire_antenna import WireAntenna
+            self.calcedParams = WireAntenna(args).run()
+
+        if args.subparser_name == 'serve':
+            from calculator_server import CalculatorServer
+            CalculatorServer(args).run()
+
+        if args.subparser_name == 'sweep':
+            from sweep import Sweep
+            Sweep(args).run()
+
+        if args.subparser_name == 'impedance':
+            from impedance_sweep import ImpedanceSweep
+            self.calcedParams = ImpedanceSweep(args).run()
+
+        if args.subparser_name == 'tolerance':
+            from tolerance_analysis import ToleranceAnalysis
+            self.calcedParams = ToleranceAnalysis(args).run()
+
+        if args.subparser_name == 'inverse':
+            from inverse_solver import InverseSolver
+            self.calcedParams = InverseSolver(args).run()
+
+        if args.subparser_name == 'substrate_search':
+            from substrate_library import SubstrateSearch
+            self.calcedParams = SubstrateSearch(args).run()
+
+        if args.subparser_name == 'pattern':
+            from radiation_pattern import PatternCalculator
+            self.calcedParams = PatternCalculator(args).run()
+
+        if args.subparser_name == 'array':
+            from array_factor import ArrayCalculator
+            self.calcedParams = ArrayCalculator(args).run()
+
 
     def getArgs(self):
         return self.args
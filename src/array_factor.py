@@ -0,0 +1,239 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  array_factor.py
+#
+#   Array factor of linear, planar and irregular arrays with amplitude
+#   tapers and phase steering, and the pattern of an array of the
+#   designed antennas (element pattern times array factor).
+#
+#   Element positions are in meters, angles in degrees as in
+#   radiation_pattern. Regular N x M grids are evaluated as two small
+#   matrix products instead of a sum over every element. Grids of
+#   FFT_MIN_ELEMENTS or more go through an oversampled 2-D FFT of the
+#   excitations, interpolated to each direction with a Gaussian kernel
+#   (Greengard and Lee's non-uniform FFT), which agrees with the direct
+#   sum to about 1e-9 of the peak. uv() returns the whole (u, v) plane
+#   from one FFT. Irregular layouts use a vectorized direct sum in
+#   chunks.
+#
+#   from array_factor import ArrayFactor
+#   af = ArrayFactor.planar(2.4e9, 64, 64, taper='hamming', steer_theta=30)
+#   af([0, 15, 30], 0)
+##--------------------------------------------------------------------\
+
+import math
+import numpy as np
+
+from antenna_api import C
+from radiation_pattern import GROUND_PLANE_MODELS, PRINCIPAL_PLANES, PatternCalculator, RadiationPattern, print_summary
+
+TAPERS = {'uniform': np.ones, 'hamming': np.hamming, 'hann': np.hanning, 'blackman': np.blackman,
+          'cosine': lambda n: np.sin(np.pi * (np.arange(n) + 0.5) / n)}
+
+# the FFT path: grids with at least this many elements, the oversampling of
+# the FFT grid and the half width of the interpolation window in grid points
+FFT_MIN_ELEMENTS = 1024
+FFT_OVERSAMPLING = 2
+FFT_SPREAD = 8
+
+def direction_cosines(theta, phi):
+    theta, phi = np.broadcast_arrays(np.radians(theta), np.radians(phi))
+    return np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)
+
+def gaussian_spread(psi, size, tau):
+    # FFT grid points around each phase psi and their Gaussian weights. tau
+    # is None along an axis with one element, which needs no interpolation
+    if tau is None:
+        return np.zeros((len(psi), 1), dtype=np.int64), np.ones((len(psi), 1))
+    step = 2 * math.pi / size
+    psi = np.mod(psi, 2 * math.pi)
+    idx = np.floor(psi / step).astype(np.int64)[:, None] + np.arange(-FFT_SPREAD + 1, FFT_SPREAD + 1)
+    return idx % size, np.exp(-(psi[:, None] - idx * step)**2 / (4 * tau))
+
+
+class ArrayFactor:
+    def __init__(self, frequency, positions, weights=None, steer_theta=0.0, steer_phi=0.0, chunk_size=262144):
+        # positions is (K, 2) or (K, 3), weights the K complex excitations
+        self.frequency = frequency
+        self.k = 2 * math.pi * frequency / C
+        positions = np.asarray(positions, dtype=np.float64)
+        self.positions = np.zeros((len(positions), 3))
+        self.positions[:, :positions.shape[1]] = positions
+        self.weights = np.ones(len(positions), dtype=np.complex128) if weights is None \
+            else np.asarray(weights, dtype=np.complex128).ravel()
+        if len(self.weights) != len(self.positions):
+            raise ValueError("weights must have one entry per element")
+        # progressive phase that points the main beam at (steer_theta, steer_phi)
+        u0, v0, w0 = direction_cosines(steer_theta, steer_phi)
+        self.weights = self.weights * np.exp(-1j * self.k * (self.positions @ np.array([u0, v0, w0])))
+        self.chunk_size = chunk_size
+        self.grid = None
+        self._fft = None
+
+    @classmethod
+    def planar(cls, frequency, N, M=1, dx=None, dy=None, taper='uniform', steer_theta=0.0, steer_phi=0.0,
+               chunk_size=262144):
+        # N elements along x and M along y, centered on the origin. The
+        # spacing defaults to half a wavelength
+        dx = dx or C / frequency / 2
+        dy = dy or C / frequency / 2
+        x = (np.arange(N) - (N - 1) / 2) * dx
+        y = (np.arange(M) - (M - 1) / 2) * dy
+        amplitude = np.outer(TAPERS[taper](N), TAPERS[taper](M))
+        positions = np.stack(np.meshgrid(x, y, indexing='ij'), axis=-1).reshape(-1, 2)
+        af = cls(frequency, positions, amplitude.ravel(), steer_theta, steer_phi, chunk_size)
+        af.grid = (x, y, af.weights.reshape(N, M))
+        return af
+
+    @classmethod
+    def linear(cls, frequency, N, d=None, taper='uniform', steer_theta=0.0, chunk_size=262144):
+        # N elements along x, steered in the xz plane
+        return cls.planar(frequency, N, 1, d, None, taper, steer_theta, 0.0, chunk_size)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __call__(self, theta, phi):
+        # complex array factor for the given directions, normalized to the
+        # sum of the excitation amplitudes
+        u, v, w = direction_cosines(theta, phi)
+        shape = u.shape
+        u, v, w = u.ravel(), v.ravel(), w.ravel()
+        out = np.empty(len(u), dtype=np.complex128)
+        if self.grid is not None and len(self) >= FFT_MIN_ELEMENTS:
+            out = self.fft_sum(u, v)
+        elif self.grid is not None:
+            # sum_mn e^{jkx_m u} w_mn e^{jky_n v}, row by row as (Ex @ W) * Ey
+            x, y, W = self.grid
+            step = max(1, self.chunk_size // max(len(x), len(y)))
+            for start in range(0, len(u), step):
+                sl = slice(start, start + step)
+                Ex = np.exp(1j * self.k * np.outer(u[sl], x))
+                Ey = np.exp(1j * self.k * np.outer(v[sl], y))
+                out[sl] = np.einsum('pn,pn->p', Ex @ W, Ey)
+        else:
+            step = max(1, self.chunk_size // len(self.positions))
+            for start in range(0, len(u), step):
+                sl = slice(start, start + step)
+                phase = np.outer(u[sl], self.positions[:, 0]) + np.outer(v[sl], self.positions[:, 1]) \
+                    + np.outer(w[sl], self.positions[:, 2])
+                out[sl] = np.exp(1j * self.k * phase) @ self.weights
+        return out.reshape(shape) / np.sum(np.abs(self.weights))
+
+    def fft_grid(self):
+        # the excitations of a grid divided by the Fourier coefficients of the
+        # Gaussian kernel and transformed onto the oversampled FFT grid, with
+        # (size, tau) per axis. Computed once per array
+        if self._fft is None:
+            _, _, W = self.grid
+            H = W.copy()
+            axes = []
+            padded_index = []
+            for axis, n in enumerate(W.shape):
+                k = np.arange(n) - n // 2
+                if n == 1:
+                    axes.append((1, None))
+                    padded_index.append(k)
+                    continue
+                size = FFT_OVERSAMPLING * n
+                tau = math.pi * FFT_SPREAD / (n**2 * FFT_OVERSAMPLING * (FFT_OVERSAMPLING - 0.5))
+                scale = np.sqrt(math.pi / tau) * np.exp(k**2 * tau)
+                H = H * (scale[:, None] if axis == 0 else scale[None, :])
+                axes.append((size, tau))
+                padded_index.append(k % size)
+            padded = np.zeros((axes[0][0], axes[1][0]), dtype=np.complex128)
+            padded[np.ix_(*padded_index)] = H
+            self._fft = (np.fft.ifft2(padded), axes)
+        return self._fft
+
+    def fft_sum(self, u, v):
+        # the unnormalized grid sum at direction cosines u, v through the FFT
+        # grid. The element indexes are centred on the middle element so that
+        # the deconvolution factors stay small
+        x, y, _ = self.grid
+        h, ((size_x, tau_x), (size_y, tau_y)) = self.fft_grid()
+        dx = x[1] - x[0] if len(x) > 1 else 0.0
+        dy = y[1] - y[0] if len(y) > 1 else 0.0
+        out = np.empty(len(u), dtype=np.complex128)
+        step = max(1, self.chunk_size // (2 * FFT_SPREAD)**2)
+        for start in range(0, len(u), step):
+            sl = slice(start, start + step)
+            ix, gx = gaussian_spread(self.k * dx * u[sl], size_x, tau_x)
+            iy, gy = gaussian_spread(self.k * dy * v[sl], size_y, tau_y)
+            window = h[ix[:, :, None], iy[:, None, :]]
+            out[sl] = np.sum(np.matmul(window, gy[:, :, None])[:, :, 0] * gx, axis=1)
+        return out * np.exp(1j * self.k * (u * x[len(x) // 2] + v * y[len(y) // 2]))
+
+    def uv(self, size=512):
+        # FFT fast path for grids: the array factor on the (u, v) plane of
+        # direction cosines, with u = sin(theta)cos(phi) and v = sin(theta)sin(phi).
+        # Returns u, v and AF[u, v]. The plane covers one period of the
+        # pattern, which is all of the visible region u^2 + v^2 <= 1 for
+        # spacings up to half a wavelength; points outside it are not visible
+        if self.grid is None:
+            raise ValueError("the FFT path needs a regular grid, use ArrayFactor.planar()")
+        x, y, W = self.grid
+        P, Q = max(size, len(x)), max(size, len(y))
+        dx = x[1] - x[0] if len(x) > 1 else C / self.frequency / 2
+        dy = y[1] - y[0] if len(y) > 1 else C / self.frequency / 2
+        # ifft2 computes sum_mn W_mn e^{+j2pi(mp/P + nq/Q)} / (PQ)
+        AF = np.fft.fftshift(np.fft.ifft2(W, (P, Q))) * (P * Q)
+        u = np.fft.fftshift(np.fft.fftfreq(P)) * 2 * math.pi / (self.k * dx)
+        v = np.fft.fftshift(np.fft.fftfreq(Q)) * 2 * math.pi / (self.k * dy)
+        # the grid is centered, not started, at the origin
+        AF *= np.exp(1j * self.k * (x[0] * u[:, None] + y[0] * v[None, :]))
+        return u, v, AF / np.sum(np.abs(W))
+
+
+class ArrayPattern(RadiationPattern):
+    # pattern of an array of identical elements, element is a design record
+    # of antenna_api or None for isotropic elements
+    def __init__(self, array, element=None, theta_step=1.0, phi_step=1.0, chunk_size=262144):
+        self.array = array
+        self.element = RadiationPattern(element) if element is not None else None
+        self.design = element
+        self.planes = PRINCIPAL_PLANES[type(element)] if element is not None else ('theta', 'phi')
+        self.ground_plane = isinstance(element, GROUND_PLANE_MODELS)
+        self.grid(theta_step, phi_step, chunk_size)
+
+    def intensity(self, theta, phi):
+        U = np.abs(self.array(theta, phi))**2
+        if self.element is not None:
+            U = U * self.element.intensity(theta, phi)
+        return U
+
+
+class ArrayCalculator:
+    # the array subcommand: designs the element, then prints the array pattern summary
+    def __init__(self, args):
+        self.args = args
+
+    def array(self):
+        if self.args.positions:
+            # columns x, y and optionally z, amplitude and phase (degrees)
+            table = np.genfromtxt(self.args.positions, delimiter=',', names=True, ndmin=1)
+            names = table.dtype.names
+            positions = np.stack([table[n] for n in ('x', 'y', 'z') if n in names], axis=1)
+            amplitude = table['amplitude'] if 'amplitude' in names else np.ones(len(table))
+            phase = np.radians(table['phase']) if 'phase' in names else np.zeros(len(table))
+            return ArrayFactor(self.args.frequency, positions, amplitude * np.exp(1j * phase),
+                               self.args.steer_theta, self.args.steer_phi, self.args.chunk_size)
+        return ArrayFactor.planar(self.args.frequency, self.args.N, self.args.M, self.args.dx, self.args.dy,
+                                  self.args.taper, self.args.steer_theta, self.args.steer_phi, self.args.chunk_size)
+
+    def run(self):
+        element = None if self.args.antenna == 'isotropic' else PatternCalculator(self.args).design()
+        array = self.array()
+        pattern = ArrayPattern(array, element, self.args.theta_step, self.args.phi_step, self.args.chunk_size)
+        if self.args.verbose:
+            print("[*] {} elements, grid of {} x {} points".format(len(array), len(pattern.theta), len(pattern.phi)))
+        s = pattern.summary()
+        if self.args.output:
+            pattern.write(self.args.output, self.args.format)
+            print("[*] Pattern file generated: " + self.args.output)
+        if self.args.variable_return:
+            return s
+        print("[*] Array of {} elements".format(len(array)))
+        print_summary(s)
+        return s
@@ -0,0 +1,134 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  batch_export.py
+#
+#   Exports a whole library of rectangular patches from a manifest.
+#   Each manifest row is one rectangular_patch_export call, and the
+#   rows are spread over a pool of worker processes.
+#
+#   Manifests are CSV files with a header row, or JSON lines files
+#   (.jsonl/.json) with one object per line. Recognized columns:
+#     W, L, x0, y0, Ws, type, dxfunit, pngoutput, dxfoutput,
+#     gerberoutput, keep_dxf, gerber_engine, gerberunit, gerber_format
+##--------------------------------------------------------------------\
+
+import contextlib
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# manifest column -> rectangular_patch_export flag
+MANIFEST_FLAGS = {'W': '-W', 'L': '-L', 'x0': '-x0', 'y0': '-y0', 'Ws': '-ws', 'type': '--type',
+                  'dxfunit': '-du', 'pngoutput': '--pngoutput', 'dxfoutput': '--dxfoutput',
+                  'gerberoutput': '--gerberoutput', 'gerber_engine': '--gerber_engine',
+                  'gerberunit': '--gerberunit', 'gerber_format': '--gerber_format',
+                  'png_dpi': '--png_dpi', 'png_mode': '--png_mode', 'paper': '--paper'}
+OUTPUT_COLUMNS = ['pngoutput', 'dxfoutput', 'gerberoutput']
+
+def read_manifest(filename):
+    # returns a list of dicts, one per manifest row
+    if os.path.splitext(filename)[1].lower() in ('.jsonl', '.json'):
+        with open(filename, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(filename, 'r', newline='') as f:
+        return [row for row in csv.DictReader(f)]
+
+def item_argv(item, output_dir=None, options=()):
+    # options are main parser options placed before the sub-command
+    argv = list(options) + ['rectangular_patch_export']
+    for column, flag in MANIFEST_FLAGS.items():
+        value = item.get(column)
+        if value is None or value == '':
+            continue
+        if column in OUTPUT_COLUMNS and output_dir:
+            value = os.path.join(output_dir, str(value))
+        argv += [flag, str(value)]
+    for column in ('keep_dxf', 'png_crop'):
+        if str(item.get(column, '')).lower() in ('1', 'true', 'yes'):
+            argv.append('--' + column)
+    return argv
+
+def item_name(item, index):
+    for column in ['name'] + OUTPUT_COLUMNS:
+        if item.get(column):
+            return str(item[column])
+    return "item {}".format(index)
+
+def export_item(index, item, output_dir=None, verbose=False, options=()):
+    # runs in a worker process, returns (index, error message or None, seconds)
+    from antenna_calculator import AntennaCalculator
+    start = time.perf_counter()
+    errors = io.StringIO()
+    try:
+        # the exporters' own messages are only shown with --verbose
+        quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet, contextlib.redirect_stderr(errors):
+            shell = AntennaCalculator(a=item_argv(item, output_dir, options))
+            shell.main(shell.getArgs())
+        return index, None, time.perf_counter() - start
+    except SystemExit:
+        # argparse exits on a bad row, keep its message without the usage text
+        message = errors.getvalue().strip().splitlines()
+        return index, message[-1] if message else "invalid manifest row", time.perf_counter() - start
+    except Exception as e:
+        return index, "{}: {}".format(type(e).__name__, e), time.perf_counter() - start
+
+
+class BatchExporter:
+    def __init__(self, args):
+        self.args = args
+
+    def options(self):
+        # the export cache is shared with the workers
+        options = []
+        if getattr(self.args, 'export_cache', None):
+            options += ['--export_cache', self.args.export_cache, '--export_cache_size', str(self.args.export_cache_size)]
+            if self.args.export_cache_copy:
+                options.append('--export_cache_copy')
+        return options
+
+    def results(self, items):
+        # yields (index, error, seconds) in completion order
+        options = self.options()
+        if self.args.workers == 1:
+            for i, item in enumerate(items):
+                yield export_item(i, item, self.args.output_dir, self.args.verbose, options)
+            return
+        with ProcessPoolExecutor(max_workers=self.args.workers) as pool:
+            futures = [pool.submit(export_item, i, item, self.args.output_dir, self.args.verbose, options)
+                       for i, item in enumerate(items)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def run(self):
+        items = read_manifest(self.args.manifest)
+        total = len(items)
+        if self.args.output_dir:
+            os.makedirs(self.args.output_dir, exist_ok=True)
+
+        start = time.perf_counter()
+        failures = []
+        done = 0
+        for index, error, seconds in self.results(items):
+            done += 1
+            name = item_name(items[index], index)
+            if error:
+                failures.append({'index': index, 'name': name, 'error': error})
+                print("[*] [{}/{}] {} failed: {}".format(done, total, name, error))
+            else:
+                print("[*] [{}/{}] {} exported ({:.2f} s)".format(done, total, name, seconds))
+
+        summary = {'total': total, 'succeeded': total - len(failures), 'failed': len(failures),
+                   'seconds': time.perf_counter() - start,
+                   'failures': sorted(failures, key=lambda f: f['index'])}
+        print("[*] Batch export finished: {} of {} succeeded in {:.2f} s".format(
+            summary['succeeded'], total, summary['seconds']))
+        if self.args.summary:
+            with open(self.args.summary, 'w') as f:
+                json.dump(summary, f, indent=2)
+            print("[*] Batch summary saved: " + self.args.summary)
+        return summary
@@ -0,0 +1,210 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  calculator_server.py
+#
+#   Resident calculator. Requests are JSON objects, either one per line
+#   on stdin, one per line on a Unix socket connection, or POSTed to a
+#   local HTTP server. Each request gets one JSON result back. The
+#   design engines are loaded once and shared by all requests.
+#
+#   {"id": 1, "antenna": "rectangular_patch", "frequency": 2.4e9,
+#    "relative_permittivity": 4.4, "height": 1.6e-3, "type": "microstrip"}
+#   {"id": 2, "antenna": "half_wave_dipole", "frequency": [1e9, 2e9]}
+#
+#   {"id": 3, "antenna": "half_wave_dipole", "frequency": [144e6, 433e6],
+#    "diameter": 2e-3, "velocity_factor": 0.95}
+#
+#   frequency, relative_permittivity, height and Z0 may be numbers or
+#   lists, results then hold lists too. Lengths are in meters. Designs
+#   come from antenna_api, through the result cache when it is on, and
+#   dipoles and monopoles with a diameter from wire_antenna. Inputs and
+#   results that are not finite, and designs the API rejects, get an
+#   error back. A value that does not exist (no strip width) is null.
+##--------------------------------------------------------------------\
+
+import json
+import math
+import os
+import signal
+import socketserver
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from antenna_api import design_half_wave_dipole, design_quarter_wave_monopole, design_rectangular_patch
+from result_cache import get_cache
+
+ANTENNAS = ['rectangular_patch', 'half_wave_dipole', 'quarter_wave_monopole']
+
+def to_json_value(a):
+    # numpy scalars/arrays to floats/lists, NaN to None. Infinite values
+    # have no JSON form and are an error
+    values = np.asarray(a, dtype=np.float64)
+    if np.any(np.isinf(values)):
+        raise ValueError("result is not a finite number")
+    if values.ndim == 0:
+        v = float(values)
+        return None if math.isnan(v) else v
+    return [None if math.isnan(v) else v for v in values.ravel().tolist()]
+
+def finite_inputs(request, names):
+    # the numeric fields of a request as float arrays, an error unless all are finite
+    values = []
+    for name, default in names:
+        value = np.asarray(request[name] if default is None else request.get(name, default), dtype=np.float64)
+        if not np.all(np.isfinite(value)):
+            raise ValueError(name + " must be a finite number")
+        values.append(value)
+    return np.broadcast_arrays(*values)
+
+def cached(kind, design, *values):
+    # design(*values), a tuple of floats, through the calculators' result cache when it is on
+    cache = get_cache()
+    if cache is None:
+        return design(*values)
+    key = cache.key(kind, *values)
+    result = cache.get(key)
+    if result is None:
+        result = design(*values)
+        cache.put(key, result)
+    return result
+
+def each(kind, design, names, values):
+    # cached(kind, design, ...) for every element of the broadcast values,
+    # returned as {name: JSON value} with the shape of the inputs
+    rows = [cached(kind, design, *v) for v in zip(*[a.ravel().tolist() for a in values])]
+    columns = np.array(rows, dtype=np.float64).reshape(values[0].shape + (len(names),))
+    return {name: to_json_value(columns[..., i]) for i, name in enumerate(names)}
+
+
+class CalculatorServer:
+    def __init__(self, args):
+        self.args = args
+
+    def calculate(self, request):
+        antenna = request.get('antenna')
+        if antenna not in ANTENNAS:
+            raise ValueError("antenna must be one of " + ", ".join(ANTENNAS))
+        if antenna == 'rectangular_patch':
+            patch_type = request.get('type', 'microstrip')
+            if patch_type not in ('microstrip', 'probe'):
+                raise ValueError("type must be microstrip or probe")
+            values = finite_inputs(request, [('frequency', None), ('relative_permittivity', None), ('height', None),
+                                             ('Z0', 50)])
+            def design(f, er, h, Z0):
+                d = design_rectangular_patch(f, er, h, patch_type, Z0)
+                return d.params() + (d.Ereff,)
+            names = ['W', 'L', 'x0', 'y0', 'Ws', 'Ereff'] if patch_type == 'microstrip' else ['W', 'L', 'x0', 'y0', 'Ereff']
+            return each('serve_rectangular_patch|' + patch_type, design, names, values)
+        if 'diameter' in request:
+            from wire_antenna import design_wire_dipole, design_wire_monopole
+            design = design_wire_dipole if antenna == 'half_wave_dipole' else design_wire_monopole
+            f, diameter, velocity_factor, harmonic, Z0 = finite_inputs(
+                request, [('frequency', None), ('diameter', None), ('velocity_factor', 1.0), ('harmonic', 1), ('Z0', 50)])
+            d = design(f, diameter, velocity_factor, harmonic, Z0)
+            names = ['L_total', 'L_element'] if antenna == 'half_wave_dipole' else ['L']
+            return {name: to_json_value(d[name]) for name in names + ['shortening', 'Rin', 'Q', 'bandwidth']}
+        values = finite_inputs(request, [('frequency', None)])
+        if antenna == 'half_wave_dipole':
+            # the same cache entries as the half_wave_dipole calculator
+            result = each('half_wave_dipole', lambda f: (design_half_wave_dipole(f).L_total,), ['L_total'], values)
+            result['L_element'] = to_json_value(np.asarray(result['L_total'], dtype=np.float64) / 2)
+            return result
+        return each('quarter_wave_monopole', lambda f: (design_quarter_wave_monopole(f).L,), ['L'], values)
+
+    def handle(self, request):
+        # never raises, errors are returned in the result
+        response = {}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            if 'id' in request:
+                response['id'] = request['id']
+            response['result'] = self.calculate(request)
+        except KeyError as e:
+            response['error'] = "missing field {}".format(e)
+        except Exception as e:
+            response['error'] = "{}: {}".format(type(e).__name__, e)
+        return response
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return json.dumps({'error': "invalid JSON: {}".format(e)})
+        return json.dumps(self.handle(request), allow_nan=False)
+
+    def serve_stdio(self, stdin=sys.stdin, stdout=sys.stdout):
+        # results are written as they complete, match them up with "id"
+        lock = threading.Lock()
+        def work(line):
+            out = self.handle_line(line)
+            with lock:
+                stdout.write(out + "\n")
+                stdout.flush()
+        with ThreadPoolExecutor(max_workers=self.args.workers) as pool:
+            for line in stdin:
+                if line.strip():
+                    pool.submit(work, line)
+
+    def serve_http(self):
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                # a single request object or a list of them
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                try:
+                    request = json.loads(body)
+                    result = [server.handle(r) for r in request] if isinstance(request, list) else server.handle(request)
+                    code = 200
+                except ValueError as e:
+                    result, code = {'error': "invalid JSON: {}".format(e)}, 400
+                data = json.dumps(result, allow_nan=False).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                if server.args.verbose:
+                    BaseHTTPRequestHandler.log_message(self, format, *args)
+
+        httpd = ThreadingHTTPServer((self.args.host, self.args.port), Handler)
+        print("[*] Serving on http://{}:{}".format(self.args.host, httpd.server_address[1]), flush=True)
+        try:
+            httpd.serve_forever()
+        finally:
+            httpd.server_close()
+
+    def serve_unix(self):
+        server = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        self.wfile.write((server.handle_line(line) + "\n").encode())
+
+        with socketserver.ThreadingUnixStreamServer(self.args.unix, Handler) as unix_server:
+            print("[*] Serving on " + self.args.unix, flush=True)
+            try:
+                unix_server.serve_forever()
+            finally:
+                os.unlink(self.args.unix)
+
+    def run(self):
+        # a plain kill should still shut the servers down cleanly
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            if self.args.unix:
+                self.serve_unix()
+            elif self.args.port is not None:
+                self.serve_http()
+            else:
+                self.serve_stdio()
+        except KeyboardInterrupt:
+            pass
@@ -1,7 +1,8 @@
 #! /usr/bin/python3
 
-from pint import UnitRegistry  #pip install pint
-ureg = UnitRegistry()
+from units import get_ureg
+from result_cache import get_cache
+from antenna_api import design_half_wave_dipole
 
 class Dipole:
     def __init__(self, args):
@@ -11,6 +12,7 @@ class Dipole:
         return(3e8 / (2 * f))
 
     def unit_print(self, name, value, unit=None):
+        ureg = get_ureg()
         if unit != None:
             print("[*]", name, "= {:.2f}".format((value*ureg.meter).to(self.args.unit)))
         else:
@@ -18,13 +20,23 @@ class Dipole:
 
     def half_wave_dipole_calculator(self):
         f = self.args.frequency
-        l = self.half_wave_dipole(f)
+        cache = get_cache()
+        if cache is not None:
+            key = cache.key('half_wave_dipole', f)
+            cached = cache.get(key)
+            if cached is None:
+                l = design_half_wave_dipole(f).L_total
+                cache.put(key, (l,))
+            else:
+                l = cached[0]
+        else:
+            l = design_half_wave_dipole(f).L_total
+        if self.args.variable_return:
+            return l
         if self.args.verbose:
             self.unit_print("Total Dipole Length", l, self.args.unit)
             self.unit_print("Each Dipole Element Length", l/2, self.args.unit)
         else:
             self.unit_print("L_total", l, self.args.unit)
             self.unit_print("L_element", l/2, self.args.unit)
-        if self.args.variable_return:
-            return l
 
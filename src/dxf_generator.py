@@ -2,12 +2,25 @@
 
 from os import sep
 import ezdxf   # pip install ezdxf
+from patch_geometry import patch_points
+from profiler import stage
 
 class DXFGenerator:
     def __init__(self, args):
         self.args = args
 
-    def generate_patch_dxf(self, filename, W, L, x0, y0, Ws=None, separate_layers=None):
+    def build_patch_dxf(self, W, L, x0, y0, Ws=None, separate_layers=None):
+        return self.build_geometry_dxf(patch_points(self.args.type, W, L, x0, y0, Ws), separate_layers)
+
+    def build_geometry_dxf(self, geometry, separate_layers=None):
+        # geometry is a patch_points() outline in the DXF unit. Returns the
+        # combined document, plus the top layer and substrate documents when
+        # separate_layers is set (None otherwise)
+        return self.build_geometries_dxf([geometry], separate_layers)
+
+    def build_geometries_dxf(self, geometries, separate_layers=None):
+        # as build_geometry_dxf() for any number of outlines, already placed
+        # side by side, as on a panel
 
         # Initialize drawing
         doc = ezdxf.new('R2000')
@@ -23,44 +36,40 @@ class DXFGenerator:
             msp1 = doc1.modelspace()
             msp2 = doc2.modelspace()
 
-        # Set up origin and supporting variables
-        substrate_origin = 0.0
-        originW = substrate_origin + 0.5 * W
-        originL = substrate_origin + 0.5 * L
-
-        if self.args.type == "microstrip":
-            g = Ws / 3
-            W_cut = (W - Ws - g * 2) / 2
-
-        # Draw patch
-        if self.args.type == "microstrip":
-            points = [(originW, originL), (originW+W, originL), (originW+W, originL+L),
-                ((originW+W_cut + Ws + g * 2), originL+L), (originW+W_cut + Ws + g*2, originL+L-x0), (originW+W_cut + Ws + g, originL+L - x0),
-                (originW+W_cut + Ws + g, originL+L * 1.5), (originW+W_cut + g, originL+L * 1.5 ), (originW+W_cut + g, originL+L - x0),
-                (originW+W_cut, originL+L - x0), (originW + W_cut, originL+L), (originW, originL+L), (originW, originL)]
+        for points, probe_feed, substrate_points in geometries:
+            # Draw patch
             msp.add_lwpolyline(points)
+            if probe_feed:
+                msp.add_circle(probe_feed[0], radius=probe_feed[1])
             if separate_layers:
                 msp1.add_lwpolyline(points)
-        elif self.args.type == "probe":
-            points = [(originW, originL), (originW+W, originL), (originW+W, originL+L), (originW, originL+L), (originW, originL)]
-            msp.add_lwpolyline(points)
-            msp.add_circle((originW+W-y0, originL+L-x0), radius=0.0005)
+                if probe_feed:
+                    msp1.add_circle(probe_feed[0], radius=probe_feed[1])
+
+            # Draw substrate
+            msp.add_lwpolyline(substrate_points)
             if separate_layers:
-                msp1.add_lwpolyline(points)
-                msp1.add_circle((originW+W-y0, originL+L-x0), radius=0.0005)
+                msp2.add_lwpolyline(substrate_points)
 
-        # Draw substrate
-        substrate_points = [(substrate_origin, substrate_origin), (substrate_origin+2*W, substrate_origin),
-        (substrate_origin+2*W, substrate_origin+2*L), (substrate_origin, substrate_origin+2*L), (substrate_origin, substrate_origin)]
-        msp.add_lwpolyline(substrate_points)
         if separate_layers:
-            msp2.add_lwpolyline(substrate_points)
+            return doc, doc1, doc2
+        return doc, None, None
+
+    def generate_patch_dxf(self, filename, W, L, x0, y0, Ws=None, separate_layers=None, save=True):
+        return self.generate_geometry_dxf(filename, patch_points(self.args.type, W, L, x0, y0, Ws), separate_layers, save)
+
+    def generate_geometry_dxf(self, filename, geometry, separate_layers=None, save=True):
+        with stage("dxf: build documents"):
+            doc, doc1, doc2 = self.build_geometry_dxf(geometry, separate_layers)
+        if not save:
+            return doc, doc1, doc2
 
         # Save DXF file
-        doc.saveas(filename)
-        if separate_layers:
-            doc1.saveas(filename.split(".")[0] + "_top.dxf")
-            doc2.saveas(filename.split(".")[0] + "_substrate.dxf")
+        with stage("dxf: save"):
+            doc.saveas(filename)
+            if separate_layers:
+                doc1.saveas(filename.split(".")[0] + "_top.dxf")
+                doc2.saveas(filename.split(".")[0] + "_substrate.dxf")
 
         # Print message
         print("[*] DXF file generated: " + filename)
@@ -68,3 +77,4 @@ class DXFGenerator:
             print("[*] Top Layer DXF file generated: " + filename.split(".")[0] + "_top.dxf")
             print("[*] Substrate DXF file generated: " + filename.split(".")[0] + "_substrate.dxf")
 
+        return doc, doc1, doc2
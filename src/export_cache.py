@@ -0,0 +1,208 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  export_cache.py
+#
+#   Content addressed cache of exported artwork. The key of an export
+#   is a hash of the rounded patch outline, the settings the exporter
+#   reads, the versions of the libraries it uses and the source of the
+#   calculator's own exporter modules. On a hit the files stored for
+#   that key are hard linked (or copied) into place instead of being
+#   drawn again, so rebuilding an unchanged design library does not
+#   load PIL, ezdxf or gerberex at all.
+#
+#   The cache is a directory with one subdirectory of files per key
+#   and an SQLite index of their sizes. It has a size limit and drops
+#   the least recently used entries first, like result_cache.
+##--------------------------------------------------------------------\
+
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+_export_cache = None
+
+def get_export_cache():
+    # the export cache configured for this process, or None when it is off
+    return _export_cache
+
+def set_export_cache(cache):
+    global _export_cache
+    _export_cache = cache
+
+
+# arguments that change the output of each exporter
+EXPORT_SETTINGS = {'png': ('type', 'png_dpi', 'png_mode', 'paper', 'png_crop'),
+                   'dxf': ('type', 'dxfunit'),
+                   'gerber': ('type', 'dxfunit', 'gerber_engine', 'gerberunit', 'gerber_format', 'keep_dxf')}
+
+# (distributions, calculator modules) each exporter depends on
+EXPORT_DEPENDENCIES = {'png': (('pillow',), ('print_generator', 'patch_geometry')),
+                       'dxf': (('ezdxf',), ('dxf_generator', 'patch_geometry')),
+                       'gerber': (('ezdxf', 'pcb-tools-extension'),
+                                  ('gerber_generator', 'rs274x_writer', 'dxf_generator', 'patch_geometry'))}
+
+def export_targets(kind, filename, args):
+    # role -> path of every file an exporter writes for filename
+    if kind != 'gerber':
+        return {kind: filename}
+    base = filename.split(".")[0]
+    targets = {'_top.gtl': base + '_top.gtl', '_substrate.gml': base + '_substrate.gml'}
+    if args.gerber_engine != 'native' and args.keep_dxf:
+        targets.update({'dxf': filename, '_top.dxf': base + '_top.dxf', '_substrate.dxf': base + '_substrate.dxf'})
+    return targets
+
+_versions = {}
+
+def dependency_versions(kind):
+    # library versions and a hash of the calculator modules, looked up
+    # without importing anything
+    if kind not in _versions:
+        distributions, modules = EXPORT_DEPENDENCIES[kind]
+        versions = {}
+        for name in distributions:
+            try:
+                versions[name] = importlib.metadata.version(name)
+            except importlib.metadata.PackageNotFoundError:
+                versions[name] = None
+        for name in modules:
+            spec = importlib.util.find_spec(name)
+            with open(spec.origin, 'rb') as f:
+                versions[name] = hashlib.sha256(f.read()).hexdigest()
+        _versions[kind] = versions
+    return _versions[kind]
+
+
+class ExportCache:
+    def __init__(self, directory, size=1 << 30, copy=False):
+        # size is the limit in bytes, copy copies files instead of hard linking them
+        self.directory = directory
+        self.size = size
+        self.copy = copy
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        # the exporters store their results from worker threads
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False, timeout=60)
+        self.db.execute("CREATE TABLE IF NOT EXISTS exports "
+                        "(key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS exports_last_used ON exports (last_used)")
+        self.db.commit()
+
+    def key(self, kind, geometry, args):
+        # geometry is the patch_points() outline in meters, rounded to 0.1 nm
+        # so that float noise in the design equations does not miss
+        r = lambda p: [round(p[0], 10), round(p[1], 10)]
+        points, probe_feed, substrate_points = geometry
+        content = {'kind': kind,
+                   'geometry': [[r(p) for p in points], [r(probe_feed[0]), probe_feed[1]] if probe_feed else None,
+                                [r(p) for p in substrate_points]],
+                   'settings': {name: getattr(args, name, None) for name in EXPORT_SETTINGS[kind]},
+                   'versions': dependency_versions(kind)}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, 'objects', key[:2], key)
+
+    def place(self, source, target):
+        if not self.copy:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                # other file system, or no hard links there
+                pass
+        shutil.copyfile(source, target)
+
+    def restore(self, key, targets):
+        # puts the cached files of key at targets (role -> path), True on a hit
+        path = self.path(key)
+        with self.lock:
+            row = self.db.execute("SELECT key FROM exports WHERE key = ?", (key,)).fetchone()
+        if row is None or not all(os.path.exists(os.path.join(path, role)) for role in targets):
+            self.misses += 1
+            return False
+        try:
+            for role, target in targets.items():
+                self.detach(target)
+                self.place(os.path.join(path, role), target)
+        except FileNotFoundError:
+            # evicted by another process in the meantime
+            self.misses += 1
+            return False
+        with self.lock:
+            self.db.execute("UPDATE exports SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        self.hits += 1
+        for target in targets.values():
+            print("[*] Restored from export cache: " + target)
+        return True
+
+    def detach(self, target):
+        # removes target before it is replaced, so that writing to a target
+        # hard linked to the cache cannot change the cached copy
+        try:
+            os.unlink(target)
+        except FileNotFoundError:
+            pass
+
+    def store(self, key, targets):
+        # adds the files just written at targets to the cache
+        path = self.path(key)
+        size = sum(os.path.getsize(target) for target in targets.values())
+        if not os.path.isdir(path):
+            staging = "{}.{}.{}".format(path, os.getpid(), threading.get_ident())
+            os.makedirs(staging)
+            for role, target in targets.items():
+                self.place(target, os.path.join(staging, role))
+            try:
+                os.rename(staging, path)
+            except OSError:
+                # stored by another process at the same time
+                shutil.rmtree(staging, ignore_errors=True)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO exports (key, size, last_used) VALUES (?, ?, ?)",
+                            (key, size, time.time()))
+            self.db.commit()
+            self.evict()
+
+    def evict(self):
+        # drops the least recently used entries until the cache fits its size
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM exports").fetchone()[0]
+        if total <= self.size:
+            return
+        evicted = []
+        for key, size in self.db.execute("SELECT key, size FROM exports ORDER BY last_used"):
+            if total <= self.size:
+                break
+            evicted.append(key)
+            total -= size
+        self.db.executemany("DELETE FROM exports WHERE key = ?", [(key,) for key in evicted])
+        self.db.commit()
+        for key in evicted:
+            shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def clear(self):
+        with self.lock:
+            keys = [row[0] for row in self.db.execute("SELECT key FROM exports")]
+            self.db.execute("DELETE FROM exports")
+            self.db.commit()
+        for key in keys:
+            shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM exports").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
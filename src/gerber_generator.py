@@ -1,6 +1,8 @@
 #! /usr/bin/python3
 
+import io
 import gerberex # pip install pcb-tools-extension
+from profiler import stage
 
 class GerberGenerator:
     def __init__(self, args):
@@ -8,24 +10,46 @@ class GerberGenerator:
 
     def read(self, filename):
         # temporary replacement for pcb-tools-extension python 3 compatibility issue for gerberex.read()
-        with open(filename, 'r') as f:
-            data = f.read()
-        load_gerber = gerberex.loads(data, filename)
+        with stage("gerber: read dxf file"):
+            with open(filename, 'r') as f:
+                data = f.read()
+        with stage("gerber: parse dxf"):
+            load_gerber = gerberex.loads(data, filename)
         return load_gerber
 
-    def generate_gerber(self, filename):
+    def read_doc(self, doc, filename):
+        # serialize an ezdxf document in memory instead of going through a file.
+        # gerberex picks its DXF parser from the .dxf extension of filename
+        with stage("gerber: serialize dxf"):
+            stream = io.StringIO()
+            doc.write(stream)
+        with stage("gerber: parse dxf"):
+            return gerberex.loads(stream.getvalue(), filename)
+
+    def generate_gerber(self, filename, top_doc=None, substrate_doc=None):
+        # top_doc and substrate_doc are the ezdxf documents from
+        # DXFGenerator.build_patch_dxf. When they are not given the
+        # _top.dxf and _substrate.dxf files are read from disk instead
 
         # Generate the top layer gerber file
-        tl_dxf = self.read(filename.split(".")[0] + '_top.dxf')
-        tl_ctx = gerberex.GerberComposition()
-        tl_dxf.draw_mode = tl_dxf.DM_FILL
-        tl_ctx.merge(tl_dxf)
-        tl_ctx.dump(filename.split(".")[0] + '_top.gtl')
+        if top_doc is not None:
+            tl_dxf = self.read_doc(top_doc, filename.split(".")[0] + '_top.dxf')
+        else:
+            tl_dxf = self.read(filename.split(".")[0] + '_top.dxf')
+        with stage("gerber: write"):
+            tl_ctx = gerberex.GerberComposition()
+            tl_dxf.draw_mode = tl_dxf.DM_FILL
+            tl_ctx.merge(tl_dxf)
+            tl_ctx.dump(filename.split(".")[0] + '_top.gtl')
         print("[*] Top layer gerber file generated: " + filename.split(".")[0] + "_top.gtl")
 
         # Generate the substrate gerber file
-        s_dxf = self.read(filename.split(".")[0] + '_substrate.dxf')
-        s_ctx = gerberex.GerberComposition()
-        s_ctx.merge(s_dxf)
-        s_ctx.dump(filename.split(".")[0] + '_substrate.gml')
+        if substrate_doc is not None:
+            s_dxf = self.read_doc(substrate_doc, filename.split(".")[0] + '_substrate.dxf')
+        else:
+            s_dxf = self.read(filename.split(".")[0] + '_substrate.dxf')
+        with stage("gerber: write"):
+            s_ctx = gerberex.GerberComposition()
+            s_ctx.merge(s_dxf)
+            s_ctx.dump(filename.split(".")[0] + '_substrate.gml')
         print("[*] Substrate gerber file generated: " + filename.split(".")[0] + "_substrate.gml")
@@ -0,0 +1,135 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  impedance_sweep.py
+#
+#   Input impedance, S11, VSWR and -10 dB bandwidth of a designed
+#   patch over a band of frequencies. Around its resonance the patch
+#   is a parallel RLC circuit: R is the edge resistance of
+#   RectangularPatch.x0_calculation() moved to the inset feed point,
+#   and the Q comes from the radiation bandwidth formula of Jackson
+#   and Alexopoulos plus the dielectric loss of the substrate.
+#
+#   Everything is vectorized over frequency and over designs, and the
+#   sweep is written out in chunks like the parametric sweep.
+##--------------------------------------------------------------------\
+
+import math
+import numpy as np
+
+from antenna_api import C
+import patch_equations as eq
+
+S11_DTYPE = np.dtype([('frequency', 'f8'), ('Zin_real', 'f8'), ('Zin_imag', 'f8'),
+                      ('S11_dB', 'f8'), ('VSWR', 'f8')])
+
+def patch_resonator(W, L, er, h, x0, ereff, dL, tan_delta=0.0):
+    # parallel RLC equivalent of the patch, returns (f0, R, Q) at the feed point
+    f0 = C / (2 * (L + 2 * dL) * np.sqrt(ereff))
+    R = eq.inset_resistance(L, W, er, x0)
+    # VSWR < 2 radiation bandwidth, BW = 1 / (sqrt(2) Q)
+    bw = 3.77 * (er - 1) / er**2 * (W / L) * (h * f0 / C)
+    Q_rad = 1 / (math.sqrt(2) * bw)
+    with np.errstate(divide='ignore'):
+        Q = 1 / (1 / Q_rad + np.asarray(tan_delta, dtype=np.float64))
+    return f0, R, Q
+
+def input_impedance(f, f0, R, Q):
+    return R / (1 + 1j * Q * (f / f0 - f0 / f))
+
+def reflection_coefficient(Zin, Z0=50):
+    return (Zin - Z0) / (Zin + Z0)
+
+def vswr(gamma):
+    a = np.abs(gamma)
+    with np.errstate(divide='ignore'):
+        return (1 + a) / (1 - a)
+
+def matched_bandwidth(f0, R, Q, Z0=50, S11_dB=-10.0):
+    # absolute bandwidth in Hz where S11 stays below S11_dB, in closed form.
+    # With y = Q(f/f0 - f0/f) the RLC gives |G|^2 = ((r-1)^2 + y^2)/((r+1)^2 + y^2)
+    # for r = R/Z0, and the band edges are at +-y_max, i.e. BW = f0 y_max / Q
+    g2 = 10 ** (S11_dB / 10)
+    r = R / Z0
+    y2 = (g2 * (r + 1)**2 - (r - 1)**2) / (1 - g2)
+    return np.where(y2 > 0, f0 * np.sqrt(np.maximum(y2, 0.0)) / Q, 0.0)
+
+
+class ImpedanceSweep:
+    def __init__(self, args):
+        self.args = args
+
+    def design(self):
+        from antenna_api import design_rectangular_patch
+        return design_rectangular_patch(self.args.frequency, self.args.relative_permittivity, self.args.height,
+                                        self.args.type, self.args.impedance)
+
+    def band(self, f0):
+        start = self.args.start or f0 * 0.9
+        stop = self.args.stop or f0 * 1.1
+        return start, stop, self.args.points
+
+    def chunks(self, f0, R, Q):
+        start, stop, points = self.band(f0)
+        chunk_size = max(1, self.args.chunk_size)
+        for i in range(0, points, chunk_size):
+            out = np.empty(min(chunk_size, points - i), dtype=S11_DTYPE)
+            f = start + (stop - start) * np.arange(i, i + len(out)) / max(points - 1, 1)
+            Zin = input_impedance(f, f0, R, Q)
+            gamma = reflection_coefficient(Zin, self.args.impedance)
+            out['frequency'] = f
+            out['Zin_real'] = Zin.real
+            out['Zin_imag'] = Zin.imag
+            with np.errstate(divide='ignore'):
+                out['S11_dB'] = 20 * np.log10(np.abs(gamma))
+            out['VSWR'] = vswr(gamma)
+            yield out
+
+    def run(self):
+        d = self.design()
+        f0, R, Q = patch_resonator(d.W, d.L, d.relative_permittivity, d.height, d.x0, d.Ereff, d.dL,
+                                   self.args.loss_tangent)
+        f0, R, Q = float(f0), float(R), float(Q)
+        writer = None
+        if self.args.output:
+            from sweep import SWEEP_WRITERS, output_format
+            writer = SWEEP_WRITERS[output_format(self.args.output, self.args.format)](
+                self.args.output, S11_DTYPE, self.args.points)
+
+        # the -10 dB band is measured on the swept points as they go by
+        best, low, high = None, None, None
+        prev = None
+        try:
+            for chunk in self.chunks(f0, R, Q):
+                if writer is not None:
+                    writer.write(chunk)
+                i = int(np.argmin(chunk['S11_dB']))
+                if best is None or chunk['S11_dB'][i] < best[1]:
+                    best = (chunk['frequency'][i], chunk['S11_dB'][i])
+                matched = chunk['S11_dB'] <= -10
+                if matched.any():
+                    if low is None:
+                        low = chunk['frequency'][int(np.argmax(matched))]
+                    high = chunk['frequency'][len(matched) - 1 - int(np.argmax(matched[::-1]))]
+        finally:
+            if writer is not None:
+                writer.close()
+                print("[*] Impedance sweep file generated: " + self.args.output)
+
+        bandwidth = float(matched_bandwidth(f0, R, Q, self.args.impedance))
+        result = {'f0': f0, 'R': R, 'Q': Q, 'S11_min_dB': float(best[1]), 'S11_min_frequency': float(best[0]),
+                  'bandwidth': bandwidth,
+                  'band_low': float(low) if low is not None else None,
+                  'band_high': float(high) if high is not None else None}
+        if self.args.variable_return:
+            return result
+
+        print("[*] Resonant frequency = {:.6g} Hz".format(f0))
+        print("[*] Rin = {:.2f} ohm at x0, Q = {:.1f}".format(R, Q))
+        print("[*] Minimum S11 = {:.2f} dB at {:.6g} Hz".format(best[1], best[0]))
+        if low is None:
+            print("[*] S11 stays above -10 dB in the swept band")
+        else:
+            print("[*] -10 dB band in sweep: {:.6g} Hz to {:.6g} Hz".format(low, high))
+        print("[*] -10 dB bandwidth = {:.6g} Hz ({:.2f} %)".format(bandwidth, bandwidth / f0 * 100))
+        return result
@@ -0,0 +1,148 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  inverse_solver.py
+#
+#   Reverse queries on the rectangular patch equations: the frequency
+#   an etched patch resonates at, the permittivity that gives a
+#   required size, the impedance of a given strip width or inset.
+#   Where the equations have no closed form inverse they are solved
+#   with a vectorized, bracketed Newton iteration that falls back to
+#   bisection, so a whole array of queries is solved at once.
+#
+#   All functions take scalars or broadcastable arrays, lengths in
+#   meters, and return NaN where a query has no solution.
+##--------------------------------------------------------------------\
+
+import numpy as np
+
+from antenna_api import C
+import patch_equations as eq
+from rectangular_patch_batch import RectangularPatchBatch
+
+_batch = RectangularPatchBatch()
+
+def solve(residual, lo, hi, *params, xtol=1e-12, max_iter=100):
+    # root of residual(x, *params) = 0 inside [lo, hi], element by element.
+    # Newton steps use a forward difference derivative and are replaced by
+    # bisection whenever they would leave the bracket
+    lo, hi, *params = [np.array(a, dtype=np.float64) for a in np.broadcast_arrays(lo, hi, *params)]
+    shape = lo.shape
+    lo, hi, params = lo.ravel(), hi.ravel(), [p.ravel() for p in params]
+    f_lo, f_hi = residual(lo, *params), residual(hi, *params)
+    x = np.full(lo.shape, np.nan)
+    exact_lo, exact_hi = f_lo == 0, f_hi == 0
+    x[exact_lo], x[exact_hi] = lo[exact_lo], hi[exact_hi]
+    active = (np.sign(f_lo) * np.sign(f_hi) < 0)
+    x[active] = (lo[active] + hi[active]) / 2
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        xa, p = x[idx], [q[idx] for q in params]
+        fx = residual(xa, *p)
+        h = np.maximum(np.abs(xa) * 1e-7, 1e-300)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = fx * h / (residual(xa + h, *p) - fx)
+        # shrink the bracket around the root
+        left = np.sign(fx) == np.sign(f_lo[idx])
+        lo[idx] = np.where(left, xa, lo[idx])
+        f_lo[idx] = np.where(left, fx, f_lo[idx])
+        hi[idx] = np.where(left, hi[idx], xa)
+        xn = xa - step
+        bisect = ~np.isfinite(xn) | (xn < lo[idx]) | (xn > hi[idx])
+        xn = np.where(bisect, (lo[idx] + hi[idx]) / 2, xn)
+        x[idx] = xn
+        done = (fx == 0) | (np.abs(xn - xa) <= xtol * np.abs(xa)) | (hi[idx] - lo[idx] <= xtol * np.abs(xa))
+        active[idx[done]] = False
+    return x.reshape(shape)
+
+def designed_length(f, er, h):
+    W = _batch.patch_width(f, er)
+    ereff = _batch.effective_relative_permittivity(f, er, h, W)
+    return _batch.effective_length(f, ereff) - 2 * _batch.delta_length(h, ereff, W)
+
+def resonant_frequency(W, L, er, h):
+    # frequency an etched W x L patch resonates at, closed form
+    ereff = _batch.effective_relative_permittivity(None, er, h, W)
+    return C / (2 * (L + 2 * _batch.delta_length(h, ereff, W)) * np.sqrt(ereff))
+
+def frequency_for_length(L, er, h):
+    # frequency whose designed patch (width included) has length L
+    f_guess = C / (2 * L * np.sqrt(er))
+    return solve(lambda f, er, h, L: designed_length(f, er, h) - L, f_guess / 4, f_guess * 4, er, h, L)
+
+def permittivity_for_width(f, W):
+    # er whose designed patch at f has width W, closed form
+    er = 2 * (C / (2 * f * W))**2 - 1
+    return np.where(er >= 1, er, np.nan)
+
+def permittivity_for_length(f, L, h, er_max=100.0):
+    return solve(lambda er, f, h, L: designed_length(f, er, h) - L, 1.0 + 1e-9, er_max, f, h, L)
+
+def strip_width_ratio(Z0, er):
+    # Ws/h of a Z0 microstrip line, the A form below Ws/h = 2 and the B form
+    # above. Unlike ws_calculation() it is defined for every Z0, so that the
+    # solver sees a monotonic function
+    wsd = _batch.A_wsd(Z0, er)
+    return np.where((wsd > 0) & (wsd < 2), wsd, _batch.B_wsd(Z0, er))
+
+def strip_impedance(Ws, er, h, Z0_min=1.0, Z0_max=500.0):
+    # characteristic impedance of a microstrip feed line of width Ws
+    return solve(lambda Z0, er, r: strip_width_ratio(Z0, er) - r, Z0_min, Z0_max, er, np.asarray(Ws) / h)
+
+def inset_impedance(W, L, er, x0):
+    # input resistance at resonance of an inset at x0 from the radiating edge
+    return eq.inset_resistance(L, W, er, x0)
+
+
+# query -> (function, required inputs, output name)
+QUERIES = {'frequency': (frequency_for_length, ('length', 'relative_permittivity', 'height'), 'frequency'),
+           'resonance': (resonant_frequency, ('width', 'length', 'relative_permittivity', 'height'), 'frequency'),
+           'permittivity': (permittivity_for_length, ('frequency', 'length', 'height'), 'relative_permittivity'),
+           'permittivity_width': (permittivity_for_width, ('frequency', 'width'), 'relative_permittivity'),
+           'strip_impedance': (strip_impedance, ('strip_width', 'relative_permittivity', 'height'), 'Z0'),
+           'inset_impedance': (inset_impedance, ('width', 'length', 'relative_permittivity', 'x0'), 'Zin')}
+
+# input name -> command line flag of the inverse subcommand
+FLAGS = {'frequency': '-f', 'relative_permittivity': '-er', 'height': '-h', 'width': '-W', 'length': '-L',
+         'strip_width': '-ws', 'x0': '-x0'}
+
+
+class InverseSolver:
+    def __init__(self, args):
+        self.args = args
+
+    def inputs(self):
+        func, names, _ = QUERIES[self.args.query]
+        values = []
+        for name in names:
+            spec = getattr(self.args, name)
+            if spec is None:
+                raise ValueError("{} queries need {}".format(self.args.query, FLAGS[name]))
+            values.append(np.array([float(v) for v in spec.split(',')]))
+        return names, np.broadcast_arrays(*values)
+
+    def run(self):
+        func, _, output = QUERIES[self.args.query]
+        names, values = self.inputs()
+        result = func(*values)
+        out = np.empty(len(result), dtype=[(n, 'f8') for n in names] + [(output, 'f8')])
+        for name, v in zip(names, values):
+            out[name] = v
+        out[output] = result
+        if self.args.output:
+            from sweep import SWEEP_WRITERS, output_format
+            writer = SWEEP_WRITERS[output_format(self.args.output, self.args.format)](self.args.output, out.dtype, len(out))
+            try:
+                writer.write(out)
+            finally:
+                writer.close()
+            print("[*] Inverse results saved: " + self.args.output + " ({} queries)".format(len(out)))
+        if self.args.variable_return:
+            return out
+        if not self.args.output:
+            for row in out:
+                inputs = ", ".join("{} = {:.6g}".format(n, row[n]) for n in names)
+                print("[*] {}: {} = {:.6g}".format(inputs, output, row[output]))
+        return out
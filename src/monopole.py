@@ -1,7 +1,8 @@
 #! /usr/bin/python3
 
-from pint import UnitRegistry
-ureg = UnitRegistry()
+from units import get_ureg
+from result_cache import get_cache
+from antenna_api import design_quarter_wave_monopole
 
 class Monopole:
     def __init__(self, args):
@@ -11,6 +12,7 @@ class Monopole:
         return(3e8 / (4 * f))
 
     def unit_print(self, name, value, unit=None):
+        ureg = get_ureg()
         if unit != None:
             print("[*]", name, "= {:.2f}".format((value*ureg.meter).to(self.args.unit)))
         else:
@@ -18,12 +20,21 @@ class Monopole:
 
     def quarter_wave_monopole_calculator(self):
         f = self.args.frequency
-        l = self.quarter_wave_monopole(f)
+        cache = get_cache()
+        if cache is not None:
+            key = cache.key('quarter_wave_monopole', f)
+            cached = cache.get(key)
+            if cached is None:
+                l = design_quarter_wave_monopole(f).L
+                cache.put(key, (l,))
+            else:
+                l = cached[0]
+        else:
+            l = design_quarter_wave_monopole(f).L
+        if self.args.variable_return:
+            return l
         if self.args.verbose:
             self.unit_print("Quarter Wave Monopole Length", l, self.args.unit)
         else:
             self.unit_print("L", l, self.args.unit)
 
-        if self.args.variable_return:
-            return l
-
@@ -0,0 +1,144 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  panel_generator.py
+#
+#   Places many rectangular patches, each with its substrate, on one
+#   panel. The panel is written as a single DXF file, one pair of
+#   gerber layers and one set of printable PNG pages, so document
+#   setup and file I/O happen once per panel instead of per antenna.
+#
+#   The patches come from a manifest (see batch_export.py). Rows with
+#   W, L, x0, y0 (and Ws) are placed as given; rows with frequency,
+#   relative_permittivity and height are designed first. A microstrip
+#   row without Ws gets it from its relative_permittivity, height and
+#   Z0 when those are given.
+##--------------------------------------------------------------------\
+
+import math
+
+from batch_export import read_manifest
+from patch_geometry import PAPER_SIZES, patch_points, place
+from units import get_ureg
+
+class PanelGenerator:
+    def __init__(self, args):
+        self.args = args
+
+    def designs(self):
+        # returns [(type, W, L, x0, y0, Ws)] in meters
+        rows = read_manifest(self.args.manifest)
+        designs = [None] * len(rows)
+        calculated = [i for i, row in enumerate(rows) if row.get('frequency') not in (None, '')]
+        if calculated:
+            from rectangular_patch_batch import RectangularPatchBatch
+            batch = RectangularPatchBatch().design([float(rows[i]['frequency']) for i in calculated],
+                                                   [float(rows[i]['relative_permittivity']) for i in calculated],
+                                                   [float(rows[i]['height']) for i in calculated],
+                                                   [float(rows[i].get('Z0') or 50) for i in calculated])
+            for i, d in zip(calculated, batch):
+                designs[i] = (rows[i].get('type') or self.args.type, d['W'], d['L'], d['x0'], d['y0'], d['Ws'])
+        for i, row in enumerate(rows):
+            if designs[i] is None:
+                designs[i] = (row.get('type') or self.args.type, float(row['W']), float(row['L']),
+                              float(row['x0']), float(row['y0']), self.strip_width(row))
+        for i, d in enumerate(designs):
+            if d[0] == 'microstrip' and (d[5] is None or math.isnan(d[5])):
+                raise ValueError("manifest row {}: no strip width for a microstrip patch, give Ws, or "
+                                 "relative_permittivity and height to calculate it".format(i + 1))
+        return designs
+
+    def strip_width(self, row):
+        # Ws of a row given by its dimensions, calculated from its substrate
+        # and Z0 when the row has no Ws column. None when neither is there
+        if row.get('Ws') not in (None, ''):
+            return float(row['Ws'])
+        if row.get('relative_permittivity') in (None, '') or row.get('height') in (None, ''):
+            return None
+        from rectangular_patch_batch import RectangularPatchBatch
+        return float(RectangularPatchBatch().ws_calculation(float(row['height']), float(row.get('Z0') or 50),
+                                                            float(row['relative_permittivity'])))
+
+    def grid_layout(self, designs, spacing):
+        # substrates are 2W x 2L; every column is as wide as its widest
+        # substrate and every row as tall as its tallest one
+        columns = self.args.columns or int(math.ceil(math.sqrt(len(designs))))
+        col_width = [0.0] * columns
+        row_height = [0.0] * int(math.ceil(len(designs) / columns))
+        for i, d in enumerate(designs):
+            col_width[i % columns] = max(col_width[i % columns], 2 * d[1])
+            row_height[i // columns] = max(row_height[i // columns], 2 * d[2])
+        col_x = [sum(col_width[:c]) + c * spacing for c in range(columns)]
+        row_y = [sum(row_height[:r]) + r * spacing for r in range(len(row_height))]
+        return [(col_x[i % columns], row_y[i // columns]) for i in range(len(designs))]
+
+    def page_layout(self, designs, spacing, w_cm=22, h_cm=28, margin=1.0):
+        # shelf packs the substrates onto w_cm x h_cm pages, everything in cm
+        pages = [[]]
+        x, y, shelf = margin, margin, 0.0
+        for i, d in enumerate(designs):
+            w, h = 2 * d[1] * 100, 2 * d[2] * 100
+            if w > w_cm - 2 * margin or h > h_cm - 2 * margin:
+                print("[*] The substrate is too large for {} paper. Please adjust paper size.".format(self.args.paper))
+            if x > margin and x + w > w_cm - margin:
+                x, y, shelf = margin, y + shelf + spacing, 0.0
+            if y > margin and y + h > h_cm - margin:
+                pages.append([])
+                x, y, shelf = margin, margin, 0.0
+            pages[-1].append((i, x, y))
+            x += w + spacing
+            shelf = max(shelf, h)
+        return pages
+
+    def outlines(self, designs):
+        return [patch_points(t, W, L, x0, y0, Ws) for t, W, L, x0, y0, Ws in designs]
+
+    def export_dxf(self, filename, designs, offsets):
+        from dxf_generator import DXFGenerator
+        scale = (1 * get_ureg().meter).to(self.args.dxfunit).magnitude if self.args.dxfunit else 1.0
+        r = lambda p: (round(p[0], 5), round(p[1], 5))
+        panel = []
+        for outline, (dx, dy) in zip(self.outlines(designs), offsets):
+            points, probe_feed, substrate_points = place(outline, dx * scale, dy * scale, scale)
+            if probe_feed:
+                # same fixed radius as a single patch, independent of the DXF unit
+                probe_feed = (r(probe_feed[0]), outline[1][1])
+            panel.append(([r(p) for p in points], probe_feed, [r(p) for p in substrate_points]))
+        doc, top_doc, substrate_doc = DXFGenerator(self.args).build_geometries_dxf(panel, True)
+        if filename:
+            doc.saveas(filename)
+            print("[*] Panel DXF file generated: " + filename)
+        return top_doc, substrate_doc
+
+    def export_gerber(self, filename, designs, offsets):
+        if self.args.gerber_engine == 'native':
+            from rs274x_writer import RS274XWriter
+            integer_digits, decimal_digits = None, None
+            if self.args.gerber_format:
+                integer_digits, decimal_digits = self.args.gerber_format
+            panel = [place(outline, dx, dy) for outline, (dx, dy) in zip(self.outlines(designs), offsets)]
+            RS274XWriter(self.args.gerberunit, integer_digits, decimal_digits).write_patch_gerber(filename, panel)
+        else:
+            from gerber_generator import GerberGenerator
+            top_doc, substrate_doc = self.export_dxf(None, designs, offsets)
+            GerberGenerator(self.args).generate_gerber(filename, top_doc, substrate_doc)
+
+    def export_png(self, filename, designs, spacing):
+        from print_generator import PrintGenerator
+        outlines = self.outlines(designs)
+        pages = []
+        for page in self.page_layout(designs, spacing * 100, *PAPER_SIZES[self.args.paper]):
+            pages.append([place(outlines[i], x, y, 100) for i, x, y in page])
+        PrintGenerator(self.args).print_panel(filename, pages)
+
+    def run(self):
+        designs = self.designs()
+        offsets = self.grid_layout(designs, self.args.spacing)
+        print("[*] Panel of {} patches".format(len(designs)))
+        if self.args.dxfoutput:
+            self.export_dxf(self.args.dxfoutput, designs, offsets)
+        if self.args.gerberoutput:
+            self.export_gerber(self.args.gerberoutput, designs, offsets)
+        if self.args.pngoutput:
+            self.export_png(self.args.pngoutput, designs, self.args.spacing)
+        return designs
@@ -0,0 +1,97 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  patch_equations.py
+#
+#   The rectangular patch design equations, written once. Every
+#   function takes plain numbers or NumPy arrays: numbers are worked
+#   out with the math module, so a single design costs a few
+#   microseconds and does not load NumPy, arrays with NumPy ufuncs.
+#   Where an equation has no solution the result is NaN. The batch
+#   engine, the scalar API and the calculator all call these.
+##--------------------------------------------------------------------\
+
+import math
+
+C = 3e8
+
+def _lib(*values):
+    # math for plain numbers, NumPy as soon as one input is an array
+    for v in values:
+        if not isinstance(v, (int, float)):
+            import numpy
+            return numpy
+    return math
+
+def patch_width(f, er):
+    return (C / (2 * f)) * _lib(er).sqrt(2/(er+1))
+
+def effective_relative_permittivity(er, h, W):
+    return ((er+1)/2) + (((er-1)/2)*(1+(12*(h/W)))**-0.5)
+
+def delta_length(h, ereff, W):
+    return h * 0.412 * ((ereff+0.3)*((W/h)+0.264))/((ereff-0.258)*((W/h)+0.8))
+
+def effective_length(f, ereff):
+    return C / (2 * f * _lib(ereff).sqrt(ereff))
+
+def A_calculation(Z0, er):
+    return Z0/60 * _lib(er).sqrt((er+1)/2) + ((er-1)/(er+1)) * (0.23+0.11/er)
+
+def A_wsd(Z0, er):
+    # Ws/h from the A form, valid for narrow strips (Ws/h < 2)
+    A = A_calculation(Z0, er)
+    lib = _lib(A)
+    return (8 * lib.exp(A))/(lib.exp(2*A) - 2)
+
+def B_calculation(Z0, er):
+    return (377*math.pi)/(2*Z0*_lib(er).sqrt(er))
+
+def B_wsd(Z0, er):
+    # Ws/h from the B form, valid for wide strips (Ws/h > 2)
+    B = B_calculation(Z0, er)
+    lib = _lib(B, er)
+    if lib is math:
+        if B <= 1:
+            return math.nan
+        return (2/math.pi)*(B - 1 - math.log(2*B-1) + (er-1)/(2*er) * (math.log(B-1) + 0.39 - 0.61/(er)))
+    with lib.errstate(invalid='ignore', divide='ignore'):
+        return (2/math.pi)*(B - 1 - lib.log(2*B-1) + (er-1)/(2*er) * (lib.log(B-1) + 0.39 - 0.61/(er)))
+
+def strip_width_ratio(Z0, er):
+    # Ws/h of a Z0 feed line, the A form where it is valid and else the B
+    # form, NaN where neither is
+    wsd = A_wsd(Z0, er)
+    lib = _lib(wsd)
+    if lib is math:
+        if wsd < 2:
+            return wsd
+        wsd = B_wsd(Z0, er)
+        return wsd if wsd > 2 else math.nan
+    wide = ~(wsd < 2)
+    if not lib.any(wide):
+        return wsd
+    wsd_b = B_wsd(Z0, er)
+    return lib.where(wide, lib.where(wsd_b > 2, wsd_b, lib.nan), wsd)
+
+def edge_resistance(L, W, er):
+    # Zin_0, the input resistance at the radiating edge
+    return (90 * (er**2))/(er-1) * (L/W)
+
+def inset_resistance(L, W, er, x0):
+    # input resistance at resonance of an inset x0 deep from the radiating edge
+    return edge_resistance(L, W, er) * _lib(x0, L).cos(math.pi * x0 / L)**2
+
+def x0_calculation(L, W, er, Z0):
+    # inset depth where the input resistance is Z0, NaN when Z0 is above
+    # the edge resistance
+    ratio = Z0/edge_resistance(L, W, er)
+    lib = _lib(ratio)
+    if lib is math:
+        if not 0 <= ratio <= 1:
+            return math.nan
+        return math.acos(math.sqrt(ratio)) * (L/math.pi)
+    return lib.arccos(lib.sqrt(ratio)) * (L/math.pi)
+
+def y0_calculation(W):
+    return W/2
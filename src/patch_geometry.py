@@ -0,0 +1,50 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  patch_geometry.py
+#
+#   Outline of the rectangular patch, its feed and its substrate as
+#   plain point lists. The patch sits in the middle of a 2W x 2L
+#   substrate whose lower left corner is at substrate_origin.
+##--------------------------------------------------------------------\
+
+PROBE_FEED_RADIUS = 0.0005
+
+# Printable paper sizes (width, height) in cm
+PAPER_SIZES = {'letter': (22, 28), 'legal': (22, 35.6), 'tabloid': (28, 43.2),
+               'a4': (21, 29.7), 'a3': (29.7, 42)}
+
+def patch_points(patch_type, W, L, x0, y0, Ws=None, substrate_origin=0.0):
+    # Returns (patch_points, probe_feed, substrate_points). probe_feed is
+    # ((x, y), radius) for probe fed patches and None for microstrip ones.
+    originW = substrate_origin + 0.5 * W
+    originL = substrate_origin + 0.5 * L
+    probe_feed = None
+
+    if patch_type == "microstrip":
+        g = Ws / 3
+        W_cut = (W - Ws - g * 2) / 2
+        points = [(originW, originL), (originW+W, originL), (originW+W, originL+L),
+            ((originW+W_cut + Ws + g * 2), originL+L), (originW+W_cut + Ws + g*2, originL+L-x0), (originW+W_cut + Ws + g, originL+L - x0),
+            (originW+W_cut + Ws + g, originL+L * 1.5), (originW+W_cut + g, originL+L * 1.5 ), (originW+W_cut + g, originL+L - x0),
+            (originW+W_cut, originL+L - x0), (originW + W_cut, originL+L), (originW, originL+L), (originW, originL)]
+    else:
+        points = [(originW, originL), (originW+W, originL), (originW+W, originL+L), (originW, originL+L), (originW, originL)]
+        probe_feed = ((originW+W-y0, originL+L-x0), PROBE_FEED_RADIUS)
+
+    substrate_points = [(substrate_origin, substrate_origin), (substrate_origin+2*W, substrate_origin),
+        (substrate_origin+2*W, substrate_origin+2*L), (substrate_origin, substrate_origin+2*L), (substrate_origin, substrate_origin)]
+
+    return points, probe_feed, substrate_points
+
+def place(geometry, dx, dy, scale=1.0, digits=None):
+    # scales a patch_points() result and moves it by (dx, dy), given in the scaled unit.
+    # With digits the coordinates are rounded to that many decimals
+    points, probe_feed, substrate_points = geometry
+    if digits is None:
+        move = lambda p: (p[0] * scale + dx, p[1] * scale + dy)
+    else:
+        move = lambda p: (round(p[0] * scale + dx, digits), round(p[1] * scale + dy, digits))
+    if probe_feed:
+        probe_feed = (move(probe_feed[0]), probe_feed[1] * scale)
+    return [move(p) for p in points], probe_feed, [move(p) for p in substrate_points]
@@ -1,71 +1,93 @@
 #! /usr/bin/python3
 
+import os
 from PIL import Image, ImageDraw  #pip install pillow
+from patch_geometry import PAPER_SIZES, patch_points, place
+from profiler import stage
+
+# PIL mode, background and ink for each --png_mode. The artwork is black
+# and white, so '1bit' needs 1/24 of the memory of 'rgb' and encodes faster
+IMAGE_MODES = {'rgb': ('RGB', (255, 255, 255), (0, 0, 0)),
+               'grayscale': ('L', 255, 0),
+               '1bit': ('1', 1, 0)}
+
+# Diameter of the probe feed hole in cm
+PROBE_FEED_DIAMETER = 0.0707
 
 class PrintGenerator:
     def __init__(self, args):
         self.args = args
+        self.mode, self.background, self.ink = IMAGE_MODES[args.png_mode]
+        self.res = args.png_dpi
+
+    def canvas(self, w_cm, h_cm):
+        # New blank image of w_cm x h_cm. Returns the image, a drawing
+        # context and the cm-to-pixel function
+        f = 2.54      # Inch-to-cm factor
+        width = int(w_cm / f * self.res)
+        height = int(h_cm / f * self.res)
+        img = Image.new(self.mode, (width, height), color=self.background)
+        px = lambda c: (int(c[0] / f * self.res), int(c[1] / f * self.res))
+        return img, ImageDraw.Draw(img), px
+
+    def draw_patch(self, draw, px, geometry):
+        points, probe_feed, substrate_points = geometry
+        draw.polygon(tuple(px(c) for c in points), fill=self.ink)
+        if probe_feed:
+            (x, y), _ = probe_feed
+            r = PROBE_FEED_DIAMETER / 2
+            draw.ellipse((px((x-r, y-r)), px((x+r, y+r))), fill=self.background)
+        draw.rectangle((px(substrate_points[0]), px(substrate_points[2])), outline=self.ink)
+
+    def save(self, img, filename):
+        with stage("png: save"):
+            img.save(filename, dpi=(self.res, self.res))
+        print("[*] Image saved: " + filename)
 
     def print_patch(self, filename, W, L, x0, y0, Ws=None):
-        w_cm, h_cm = (22, 28)             # Size of letter paper in cm
-        res_x, res_y = (300, 300)           # Desired resolution
-
-        # Inch-to-cm factor
-        f = 2.54
-
-        # Determine image size w.r.t. resolution
-        width = int(w_cm / f * res_x)
-        height = int(h_cm / f * res_y)
-
-        # Create new image with proper size
-        img = Image.new('RGB', (width, height), color=(255, 255, 255))
-
-        # Draw elements
-        draw = ImageDraw.Draw(img)
+        # all lengths in cm
+        self.print_geometry(filename, patch_points(self.args.type, W, L, x0, y0, Ws))
+
+    def print_geometry(self, filename, geometry):
+        # geometry is a patch_points() outline in cm with the substrate at the
+        # origin. The image is paper sized, or only as large as the substrate
+        # with --png_crop. Either way it prints true to size
+        (x_min, y_min), _, (x_max, y_max) = geometry[2][:3]
+        W, L = (x_max - x_min) / 2, (y_max - y_min) / 2
+        with stage("png: render"):
+            if self.args.png_crop:
+                # one pixel wider and taller so the substrate outline fits
+                substrate_origin = 0.0
+                pixel = 2.54 / self.res
+                img, draw, px = self.canvas(2 * W + pixel, 2 * L + pixel)
+            else:
+                w_cm, h_cm = PAPER_SIZES[self.args.paper]
+                # Substrate origin
+                substrate_origin = 5.0
+                if W * 2 > w_cm - 7:
+                    substrate_origin = 1.0
+                if W * 2 > w_cm:
+                    print("[*] The substrate is too large for {} paper. Please adjust paper size.".format(self.args.paper))
+                img, draw, px = self.canvas(w_cm, h_cm)
+
+            self.draw_patch(draw, px, place(geometry, substrate_origin, substrate_origin))
 
-        # Supporing variables
-        if self.args.type == "microstrip":
-            g = Ws / 3
-            W_cut = (W - Ws - g * 2) / 2
-
-        # Substrate origin
-        substrate_origin = 5.0
-        if W * 2 > 15:
-            substrate_origin = 1.0
-        if W * 2 > 22:
-            print("[*] The substrate is too large for letter paper. Please adjust paper size.")
-
-        # Origin of patch
-        originW = substrate_origin + 0.5 * W
-        originL = substrate_origin + 0.5 * L
-
-        # Draw patch
-        if self.args.type == "microstrip":
-            microstrip_patch_coords_cm = [(originW, originL), (originW+W, originL), (originW+W, originL+L),
-            ((originW+W_cut + Ws + g * 2), originL+L), (originW+W_cut + Ws + g*2, originL+L-x0), (originW+W_cut + Ws + g, originL+L - x0),
-            (originW+W_cut + Ws + g, originL+L * 1.5), (originW+W_cut + g, originL+L * 1.5 ), (originW+W_cut + g, originL+L - x0),
-            (originW+W_cut, originL+L - x0), (originW + W_cut, originL+L), (originW, originL+L), (originW, originL)]
-            microstrip_patch_coords = [(int(c[0] / f * res_x), int(c[1] / f * res_y)) for c in microstrip_patch_coords_cm]
-            draw.polygon(tuple(microstrip_patch_coords), fill=(0, 0, 0))
-        elif self.args.type == "probe":
-            probe_patch_coords_cm = [(originW, originL), (originW+W, originL),  (originW+W, originL+L),(originW, originL+L), (originW, originL)]
-            probe_patch_coords = [(int(c[0] / f * res_x), int(c[1] / f * res_y)) for c in probe_patch_coords_cm]
-            draw.polygon(tuple(probe_patch_coords), fill=(0, 0, 0))
-
-            probe_feed_coords_cm = [(originW+W-y0-0.0707/2, originL+L-x0-0.0707/2),(originW+W-y0+0.0707/2, originL+L-x0+0.0707/2)]
-            probe_feed_coords = [(int(c[0] / f * res_x), int(c[1] / f * res_y)) for c in probe_feed_coords_cm]
-            draw.ellipse(tuple(probe_feed_coords), fill=(255, 255, 255))
+        # Show image for debugging
+        if self.args.show_png:
+            img.show()
 
-        # Draw substrate
-        substrate_coords_cm = [(substrate_origin, substrate_origin), (substrate_origin+ 2* W, substrate_origin+ 2*L)]
-        substrate_coords = [(int(c[0] / f * res_x), int(c[1] / f * res_y)) for c in substrate_coords_cm]
-        draw.rectangle(tuple(substrate_coords), outline=(0, 0, 0))
+        self.save(img, filename)
 
-        # Show image for debugging
-        if self.args.verbose:
-            img.show() # enable for debugging
 
-        # Save image
-        img.save(filename, dpi=(res_x, res_y))
-        print("[*] Image saved: " + filename)
+    def print_panel(self, filename, pages):
+        # pages is a list of pages, each a list of patch_points() outlines in cm
+        # already placed on the page. One image is saved per page
+        w_cm, h_cm = PAPER_SIZES[self.args.paper]
+        base, ext = os.path.splitext(filename)
+        for n, page in enumerate(pages):
+            with stage("png: render"):
+                img, draw, px = self.canvas(w_cm, h_cm)
+                for geometry in page:
+                    self.draw_patch(draw, px, geometry)
 
+            self.save(img, filename if len(pages) == 1 else base + "_{}".format(n + 1) + ext)
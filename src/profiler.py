@@ -0,0 +1,115 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  profiler.py
+#
+#   Per-stage wall time and peak memory. Code marks its stages with
+#
+#       with stage("dxf: save"):
+#           ...
+#
+#   which does nothing until a StageProfiler is installed with
+#   set_profiler(), either by --profile on the command line or by a
+#   library caller. Peak memory comes from tracemalloc and covers the
+#   Python allocations made inside the stage. Stages nest per thread;
+#   the peaks of stages running at the same time in other threads
+#   include each other's allocations.
+##--------------------------------------------------------------------\
+
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+
+_NULL_STAGE = contextlib.nullcontext()
+
+class NullProfiler:
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+
+class StageProfiler:
+    enabled = True
+
+    def __init__(self, track_memory=True, callback=None):
+        # callback(record) is called as each stage finishes
+        self.track_memory = track_memory
+        self.callback = callback
+        self.records = []
+        self._local = threading.local()
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def stack(self):
+        # stages open in the calling thread
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.track_memory:
+            # keep the parent's peak so far before the peak counter is reset
+            if self.stack:
+                self.stack[-1]['peak'] = max(self.stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        entry = {'peak': 0}
+        self.stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.stack.pop()
+            record = {'stage': name, 'seconds': seconds, 'depth': len(self.stack)}
+            if self.track_memory:
+                peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+                record['peak_bytes'] = peak - base
+                if self.stack:
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+            self.records.append(record)
+            if self.callback:
+                self.callback(record)
+
+    def summary(self):
+        # per stage name: calls, total and max seconds, largest peak
+        stages = {}
+        for r in self.records:
+            s = stages.setdefault(r['stage'], {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            s['calls'] += 1
+            s['total_seconds'] += r['seconds']
+            s['max_seconds'] = max(s['max_seconds'], r['seconds'])
+            if 'peak_bytes' in r:
+                s['peak_bytes'] = max(s.get('peak_bytes', 0), r['peak_bytes'])
+        return stages
+
+    def report(self):
+        return {'stages': self.summary(), 'records': self.records}
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_report(self):
+        for name, s in self.summary().items():
+            peak = " {:10.1f} KiB".format(s['peak_bytes'] / 1024) if 'peak_bytes' in s else ""
+            print("[*] {:<28} {:4d} x {:10.3f} ms{}".format(name, s['calls'], s['total_seconds'] * 1e3, peak))
+
+
+_profiler = NullProfiler()
+
+def get_profiler():
+    return _profiler
+
+def set_profiler(profiler):
+    # pass None to turn profiling off again
+    global _profiler
+    _profiler = profiler if profiler is not None else NullProfiler()
+
+def stage(name):
+    return _profiler.stage(name)
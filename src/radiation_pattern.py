@@ -0,0 +1,220 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  radiation_pattern.py
+#
+#   Far-field patterns of the designed antennas, evaluated with NumPy
+#   on theta/phi grids. The patch uses the two slot transmission line
+#   model over an infinite ground plane, the dipole and monopole the
+#   sinusoidal current thin wire model. Directivity is integrated
+#   numerically over the grid, a few rows of theta at a time, so the
+#   grid size is not limited by memory.
+#
+#   Coordinates follow patch_geometry: the patch lies in the xy plane
+#   with W along x and L along y, the wires lie along z. Angles are
+#   in degrees, theta from +z and phi from +x.
+#
+#   from antenna_api import design_rectangular_patch
+#   from radiation_pattern import RadiationPattern
+#   RadiationPattern(design_rectangular_patch(2.4e9, 4.4, 1.6e-3)).summary()
+##--------------------------------------------------------------------\
+
+import math
+import numpy as np
+
+from antenna_api import (C, DipoleDesign, MonopoleDesign, PatchDesign, Record, design_half_wave_dipole,
+                         design_quarter_wave_monopole, design_rectangular_patch)
+
+class PatternSummary(Record):
+    # hpbw_* are None when the pattern never drops to half power in that cut,
+    # front_to_back_dB is inf when nothing is radiated backwards
+    __slots__ = ('directivity', 'directivity_dBi', 'peak_theta', 'peak_phi',
+                 'hpbw_e_plane', 'hpbw_h_plane', 'front_to_back_dB')
+
+
+def patch_field(design, theta, phi):
+    # two radiating slots of W x h, Leff apart along y, fed in phase
+    k = 2 * math.pi * design.frequency / C
+    u = np.sin(theta) * np.cos(phi)
+    v = np.sin(theta) * np.sin(phi)
+    w = np.cos(theta)
+    F = (np.sinc(k * design.W / 2 * u / math.pi) * np.sinc(k * design.height / 2 * w / math.pi)
+         * np.cos(k * design.Leff / 2 * v))
+    F = np.where(w > -1e-12, F, 0.0)
+    return F * np.sin(phi), F * w * np.cos(phi)
+
+def wire_field(l, f, theta):
+    # thin wire of length l along z with a sinusoidal current
+    k = 2 * math.pi * f / C
+    s = np.sin(theta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        E = (np.cos(k * l / 2 * np.cos(theta)) - math.cos(k * l / 2)) / s
+    return np.where(np.abs(s) > 1e-12, E, 0.0)
+
+def dipole_field(design, theta, phi):
+    E = wire_field(design.L_total, design.frequency, theta)
+    return E, np.zeros_like(E)
+
+def monopole_field(design, theta, phi):
+    # image theory: a dipole of twice the length, above the ground plane only
+    E = np.where(np.cos(theta) > -1e-12, wire_field(2 * design.L, design.frequency, theta), 0.0)
+    return E, np.zeros_like(E)
+
+FIELD_MODELS = {PatchDesign: patch_field, DipoleDesign: dipole_field, MonopoleDesign: monopole_field}
+
+# (E-plane, H-plane) per model, as the direction of the great circle cut
+# through the peak: 'theta' keeps phi and sweeps over the zenith, 'phi'
+# goes around at right angles to that
+PRINCIPAL_PLANES = {PatchDesign: ('phi', 'theta'), DipoleDesign: ('theta', 'phi'), MonopoleDesign: ('theta', 'phi')}
+
+# models over an infinite ground plane, nothing is radiated below theta = 90
+GROUND_PLANE_MODELS = (PatchDesign, MonopoleDesign)
+
+
+class RadiationPattern:
+    def __init__(self, design, theta_step=1.0, phi_step=1.0, chunk_size=262144):
+        if type(design) not in FIELD_MODELS:
+            raise TypeError("design must be a PatchDesign, DipoleDesign or MonopoleDesign")
+        self.design = design
+        self.field = FIELD_MODELS[type(design)]
+        self.planes = PRINCIPAL_PLANES[type(design)]
+        self.ground_plane = isinstance(design, GROUND_PLANE_MODELS)
+        self.grid(theta_step, phi_step, chunk_size)
+
+    def grid(self, theta_step, phi_step, chunk_size):
+        self.theta = np.linspace(0.0, 180.0, int(round(180.0 / theta_step)) + 1)
+        self.phi = np.arange(0.0, 360.0, phi_step)
+        self.chunk_size = chunk_size
+        self._summary = None
+        self.U_max = None
+
+    def intensity(self, theta, phi):
+        # radiation intensity in arbitrary units, angles in degrees
+        theta, phi = np.broadcast_arrays(np.radians(theta), np.radians(phi))
+        E_theta, E_phi = self.field(self.design, theta, phi)
+        return E_theta**2 + E_phi**2
+
+    def rows(self):
+        # yields (theta, U) with U of shape (len(theta), len(phi))
+        step = max(1, self.chunk_size // len(self.phi))
+        for start in range(0, len(self.theta), step):
+            theta = self.theta[start:start + step]
+            yield theta, self.intensity(theta[:, None], self.phi[None, :])
+
+    def beamwidth(self, peak_theta, peak_phi, along, resolution=0.05):
+        # half power beamwidth in degrees along the great circle through the
+        # peak in the direction of theta or phi, found on a fine 1-D cut
+        t, p = math.radians(peak_theta), math.radians(peak_phi)
+        peak = np.array([math.sin(t) * math.cos(p), math.sin(t) * math.sin(p), math.cos(t)])
+        if along == 'theta':
+            tangent = np.array([math.cos(t) * math.cos(p), math.cos(t) * math.sin(p), -math.sin(t)])
+        else:
+            tangent = np.array([-math.sin(p), math.cos(p), 0.0])
+        s = np.radians(np.arange(0.0, 360.0, resolution))
+        d = np.cos(s)[:, None] * peak + np.sin(s)[:, None] * tangent
+        r = self.intensity(np.degrees(np.arccos(np.clip(d[:, 2], -1.0, 1.0))), np.degrees(np.arctan2(d[:, 1], d[:, 0])))
+        half = r[0] / 2
+        below = r < half
+        if not below.any():
+            return None
+        n = len(r)
+        j = int(np.argmax(below))
+        right = j - 1 + (r[j-1] - half) / (r[j-1] - r[j])
+        k = n - 1 - int(np.argmax(below[::-1]))
+        left = n - k - (half - r[k]) / (r[(k+1) % n] - r[k])
+        return float((right + left) * resolution)
+
+    def summary(self):
+        if self._summary is not None:
+            return self._summary
+        d_theta = math.radians(self.theta[1] - self.theta[0])
+        d_phi = math.radians(360.0 / len(self.phi))
+        # trapezoid weights over theta, the phi grid is periodic. The field
+        # jumps to zero below a ground plane, so the horizon ends the interval
+        weights = np.sin(np.radians(self.theta)) * d_theta
+        weights[[0, -1]] /= 2
+        if self.ground_plane:
+            weights[np.isclose(self.theta, 90.0)] /= 2
+        power, U_max, peak = 0.0, -1.0, (0.0, 0.0)
+        offset = 0
+        for theta, U in self.rows():
+            power += float(np.sum(U * weights[offset:offset + len(theta), None])) * d_phi
+            offset += len(theta)
+            # the first grid point at the maximum, so ties (the whole zenith
+            # row of a patch) resolve to the lowest theta and phi
+            m = float(np.max(U))
+            if m > U_max * (1 + 1e-9):
+                i = int(np.argmax(U >= m * (1 - 1e-9)))
+                U_max = m
+                peak = (float(theta[i // U.shape[1]]), float(self.phi[i % U.shape[1]]))
+        D = 4 * math.pi * U_max / power
+        self.U_max = U_max
+
+        back = float(self.intensity(180.0 - peak[0], peak[1] + 180.0))
+        fb = math.inf if back <= 0 else 10 * math.log10(U_max / back)
+        e_plane, h_plane = self.planes
+        self._summary = PatternSummary(D, 10 * math.log10(D), peak[0], peak[1],
+                                       self.beamwidth(*peak, e_plane), self.beamwidth(*peak, h_plane), fb)
+        return self._summary
+
+    def write(self, filename, fmt=None):
+        # streams theta, phi and the directive gain in dBi of every grid point
+        from sweep import SWEEP_WRITERS, output_format
+        dtype = np.dtype([('theta', 'f8'), ('phi', 'f8'), ('directivity_dBi', 'f8')])
+        scale = self.summary().directivity / self.U_max
+        writer = SWEEP_WRITERS[output_format(filename, fmt)](filename, dtype, len(self.theta) * len(self.phi))
+        try:
+            for theta, U in self.rows():
+                out = np.empty(U.size, dtype=dtype)
+                out['theta'] = np.repeat(theta, len(self.phi))
+                out['phi'] = np.tile(self.phi, len(theta))
+                with np.errstate(divide='ignore'):
+                    out['directivity_dBi'] = 10 * np.log10(U.ravel() * scale)
+                writer.write(out)
+        finally:
+            writer.close()
+
+
+def print_summary(s):
+    beamwidth = lambda b: "{:.2f} deg".format(b) if b is not None else "omnidirectional"
+    print("[*] Directivity = {:.2f} dBi ({:.3f})".format(s.directivity_dBi, s.directivity))
+    print("[*] Peak direction: theta = {:.1f} deg, phi = {:.1f} deg".format(s.peak_theta, s.peak_phi))
+    print("[*] HPBW E-plane = " + beamwidth(s.hpbw_e_plane))
+    print("[*] HPBW H-plane = " + beamwidth(s.hpbw_h_plane))
+    print("[*] Front-to-back ratio = {:.2f} dB".format(s.front_to_back_dB))
+
+
+class PatternCalculator:
+    # the pattern subcommand: designs the antenna, then prints its pattern summary
+    def __init__(self, args):
+        self.args = args
+
+    def design(self):
+        if self.args.antenna == 'rectangular_patch':
+            if self.args.relative_permittivity is None or self.args.height is None:
+                raise ValueError("rectangular_patch patterns need -er and -h")
+            return design_rectangular_patch(self.args.frequency, self.args.relative_permittivity,
+                                            self.args.height, self.args.type, self.args.impedance)
+        if self.args.antenna == 'half_wave_dipole':
+            return design_half_wave_dipole(self.args.frequency)
+        return design_quarter_wave_monopole(self.args.frequency)
+
+    def run(self):
+        try:
+            design = self.design()
+        except ValueError as e:
+            if self.args.variable_return:
+                raise
+            print("[*] " + str(e))
+            return None
+        pattern = RadiationPattern(design, self.args.theta_step, self.args.phi_step, self.args.chunk_size)
+        if self.args.verbose:
+            print("[*] Grid of {} x {} points".format(len(pattern.theta), len(pattern.phi)))
+        s = pattern.summary()
+        if self.args.output:
+            pattern.write(self.args.output, self.args.format)
+            print("[*] Pattern file generated: " + self.args.output)
+        if self.args.variable_return:
+            return s
+        print_summary(s)
+        return s
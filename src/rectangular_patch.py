@@ -1,203 +1,331 @@
 #! /usr/bin/python3
 
-import math
-from cmath import e
-from pint import UnitRegistry  #pip install pint
-ureg = UnitRegistry()
-
-from print_generator import PrintGenerator
-from dxf_generator import DXFGenerator
-from gerber_generator import GerberGenerator
+import threading
+from units import get_ureg
+from result_cache import get_cache
+from export_cache import export_targets, get_export_cache
+from antenna_api import design_rectangular_patch
+import patch_equations as eq
+from patch_geometry import patch_points, place
+from profiler import stage
+from concurrent.futures import ThreadPoolExecutor
 
 class RectangularPatch():
     def __init__(self, args):
-        self.printGen = PrintGenerator(args)
-        self.dxfGen = DXFGenerator(args)
-        self.gerberGen = GerberGenerator(args)
         self.args = args
-
+        # the exporters pull in PIL, ezdxf and gerberex, so they are only
+        # created when an output is requested
+        self._printGen = None
+        self._dxfGen = None
+        self._gerberGen = None
+        # the exporters are created from the export threads
+        self._exporter_lock = threading.Lock()
+
+    @property
+    def printGen(self):
+        with self._exporter_lock:
+            if self._printGen is None:
+                with stage("png: import"):
+                    from print_generator import PrintGenerator
+                self._printGen = PrintGenerator(self.args)
+        return self._printGen
+
+    @property
+    def dxfGen(self):
+        with self._exporter_lock:
+            if self._dxfGen is None:
+                with stage("dxf: import"):
+                    from dxf_generator import DXFGenerator
+                self._dxfGen = DXFGenerator(self.args)
+        return self._dxfGen
+
+    @property
+    def gerberGen(self):
+        with self._exporter_lock:
+            if self._gerberGen is None:
+                with stage("gerber: import"):
+                    from gerber_generator import GerberGenerator
+                self._gerberGen = GerberGenerator(self.args)
+        return self._gerberGen
+
+    # the single equations, kept for callers of the methods. They wrap
+    # patch_equations and print their steps in verbose mode as before
     def patch_width(self, f, er):
-        return (3e8 / (2 * f)) * math.sqrt(2/(er+1))
+        return eq.patch_width(f, er)
 
     def effective_relative_permittivity(self, f, er, h, W):
-        return ((er+1)/2) + (((er-1)/2)*(1+(12*(h/W)))**-0.5)
+        return eq.effective_relative_permittivity(er, h, W)
 
     def delta_length(self, h, ereff, W):
-        return h * 0.412 * ((ereff+0.3)*((W/h)+0.264))/((ereff-0.258)*((W/h)+0.8))
+        return eq.delta_length(h, ereff, W)
 
     def effective_length(self, f, ereff):
-        return 3e8 / (2 * f * math.sqrt(ereff))
+        return eq.effective_length(f, ereff)
 
     def A_calculation(self, Z0, er):
-        return Z0/60 * math.sqrt((er+1)/2) + ((er-1)/(er+1)) * (0.23+0.11/er)
+        return eq.A_calculation(Z0, er)
 
     def A_check(self, Z0, er):
-        A = self.A_calculation(Z0, er)
+        # Ws/d from the A form, -1 when it is not valid
         if self.args.verbose:
-            print("[*] A =", A)
-        wsd = (8 * e**(A))/(e**(2*A) - 2)
+            print("[*] A =", eq.A_calculation(Z0, er))
+        wsd = eq.A_wsd(Z0, er)
         if self.args.verbose:
             print("[*] A Ws/d =", wsd)
         if wsd < 2:
             if self.args.verbose:
                 print("[*] A is valid")
             return wsd
-        else:
-            if self.args.verbose:
-                print("[*] A is not valid")
-            return -1
+        if self.args.verbose:
+            print("[*] A is not valid")
+        return -1
 
     def B_calculation(self, Z0, er):
-        return (377*math.pi)/(2*Z0*math.sqrt(er))
+        return eq.B_calculation(Z0, er)
 
     def B_check(self, Z0, er):
-        B = self.B_calculation(Z0, er)
+        # Ws/d from the B form, -1 when it is not valid
         if self.args.verbose:
-            print("[*] B =", B)
-        wsd = (2/math.pi)*(B - 1 - math.ln(2*B-1) + (er-1)/(2*er) * (math.ln(B-1) + 0.39 - 0.61/(er)))
+            print("[*] B =", eq.B_calculation(Z0, er))
+        wsd = eq.B_wsd(Z0, er)
         if self.args.verbose:
             print("[*] B Ws/d =", wsd)
         if wsd > 2:
             if self.args.verbose:
                 print("[*] B is valid")
             return wsd
-        else:
-            if self.args.verbose:
-                print("[*] B is not valid")
-            return -1
+        if self.args.verbose:
+            print("[*] B is not valid")
+        return -1
 
     def ws_calculation(self, h, Z0, er):
-        if self.A_check != -1:
-            return self.A_check(Z0, er) * h
-        elif self.B_check != -1:
-            return self.B_check(Z0, er) * h
-        else:
-            if self.args.verbose:
-                print("No valid Stripline width found")
+        # strip width, None when neither form is valid
+        wsd = self.A_check(Z0, er)
+        if wsd == -1:
+            wsd = self.B_check(Z0, er)
+        if wsd != -1:
+            return wsd * h
+        if self.args.verbose:
+            print("No valid Stripline width found")
 
     def y0_calculation(self, W):
+        y0 = eq.y0_calculation(W)
         if self.args.verbose:
-            print("[*] y0 =", W/2)
-        return W/2
+            print("[*] y0 =", y0)
+        return y0
 
     def x0_calculation(self, L, W, er, Z0):
-        Zin_0 = (90 * (er**2))/(er-1) * (L/W)
         if self.args.verbose:
-            print("[*] Zin_0 =", Zin_0)
-        Zin_x0 = Z0
-        if self.args.verbose:
-            print("[*] Zin_x0 =", Zin_x0)
-        x0 = math.acos(math.sqrt(Zin_x0/Zin_0)) * (L/math.pi)
+            print("[*] Zin_0 =", eq.edge_resistance(L, W, er))
+            print("[*] Zin_x0 =", Z0)
+        x0 = eq.x0_calculation(L, W, er, Z0)
         if self.args.verbose:
             print("[*] x0 =", x0)
         return x0
 
     def unit_print(self, name, value, unit=None):
+        ureg = get_ureg()
         if unit != None:
             print("[*]", name, "= {:.2f}".format((value*ureg.meter).to(self.args.unit)))
         else:
             print("[*]", name, "= {:.2f}".format((value*ureg.meter).to_compact()))
 
-    def export_png(self, filename, W, L, x0, y0, ws):
-        if self.args.pngoutput:
-             filename = self.args.pngoutput
-        if self.args.type == "microstrip":
-            self.printGen.print_patch(filename, round((W * ureg.meter).to(ureg.centimeter), 3).magnitude, round((L * ureg.meter).to(ureg.centimeter), 3).magnitude,
-            round((x0 * ureg.meter).to(ureg.centimeter), 3).magnitude, round((y0 * ureg.meter).to(ureg.centimeter), 3).magnitude,
-            round((ws * ureg.meter).to(ureg.centimeter), 3).magnitude)
-        elif self.args.type == "probe":
-            self.printGen.print_patch(filename, round((W * ureg.meter).to(ureg.centimeter), 3).magnitude, round((L * ureg.meter).to(ureg.centimeter), 3).magnitude,
-            round((x0 * ureg.meter).to(ureg.centimeter), 3).magnitude, round((y0 * ureg.meter).to(ureg.centimeter), 3).magnitude)
-
-    def export_dxf(self, filename, W, L, x0, y0, ws, separate_layers=None):
-        if self.args.gerberoutput:
-            filename = self.args.gerberoutput
-        elif self.args.dxfoutput:
-            filename = self.args.dxfoutput
-        if self.args.type == "microstrip":
-            if self.args.dxfunit:
-                self.dxfGen.generate_patch_dxf(filename, round((W * ureg.meter).to(self.args.dxfunit), 5).magnitude, round((L * ureg.meter).to(self.args.dxfunit), 5).magnitude,
-                round((x0 * ureg.meter).to(self.args.dxfunit), 5).magnitude, round((y0 * ureg.meter).to(self.args.dxfunit), 5).magnitude,
-                round((ws * ureg.meter).to(self.args.dxfunit), 5).magnitude, separate_layers)
-            else:
-                self.dxfGen.generate_patch_dxf(filename, round((W * ureg.meter), 5).magnitude, round((L * ureg.meter), 5).magnitude,
-                round((x0 * ureg.meter), 5).magnitude, round((y0 * ureg.meter), 5).magnitude,
-                round((ws * ureg.meter), 5).magnitude, separate_layers)
-        elif self.args.type == "probe":
-            if self.args.dxfunit:
-                self.dxfGen.generate_patch_dxf(filename, round((W * ureg.meter).to(self.args.dxfunit), 5).magnitude, round((L * ureg.meter).to(self.args.dxfunit), 5).magnitude,
-                round((x0 * ureg.meter).to(self.args.dxfunit), 5).magnitude, round((y0 * ureg.meter).to(self.args.dxfunit), 5).magnitude, None, separate_layers)
-            else:
-                self.dxfGen.generate_patch_dxf(filename, round((W * ureg.meter), 5).magnitude, round((L * ureg.meter), 5).magnitude,
-                round((x0 * ureg.meter), 5).magnitude, round((y0 * ureg.meter), 5).magnitude, None, separate_layers)
+    def geometry(self, W, L, x0, y0, ws):
+        # the outline in meters, computed once and shared by every exporter
+        with stage("geometry"):
+            return patch_points(self.args.type, W, L, x0, y0, ws if self.args.type == "microstrip" else None)
+
+    def dxf_scale(self):
+        # meters to --dxfunit, looked up once instead of per value
+        if not self.args.dxfunit:
+            return 1.0
+        with stage("dxf: unit conversion"):
+            return (1 * get_ureg().meter).to(self.args.dxfunit).magnitude
+
+    def export_png(self, filename, geometry):
+        # the printer works in cm
+        self.printGen.print_geometry(filename, place(geometry, 0.0, 0.0, 100, 3))
+
+    def dxf_geometry(self, W, L, x0, y0, ws, scale=1.0):
+        # the DXF and gerberex outline is built from the dimensions in the DXF
+        # unit rounded to 5 decimals, so their coordinates stay what they were.
+        # The feed radius does not follow the DXF unit
+        with stage("dxf: unit conversion"):
+            values = [None if v is None else round(v * scale, 5) for v in (W, L, x0, y0, ws)]
+        return self.geometry(*values)
+
+    def export_dxf(self, filename, geometry, separate_layers=None, save=True):
+        # geometry comes from dxf_geometry()
+        return self.dxfGen.generate_geometry_dxf(filename, geometry, separate_layers, save)
+
+    def export_gerber(self, filename, geometry, dxf_geometry=None):
+        # the native writer takes the geometry in meters, gerberex the
+        # dxf_geometry() documents
+        if self.args.gerber_engine == 'native':
+            from rs274x_writer import RS274XWriter
+            integer_digits, decimal_digits = None, None
+            if self.args.gerber_format:
+                integer_digits, decimal_digits = self.args.gerber_format
+            writer = RS274XWriter(self.args.gerberunit, integer_digits, decimal_digits)
+            with stage("gerber: native write"):
+                writer.write_patch_gerber(filename, [geometry])
+            return
+
+        # the layer documents are handed to the gerber generator in memory,
+        # the intermediate DXF files are only written with --keep_dxf
+        _, top_doc, substrate_doc = self.export_dxf(filename, dxf_geometry, True, self.args.keep_dxf)
+        self.gerberGen.generate_gerber(filename, top_doc, substrate_doc)
+
+    def export(self, W, L, x0, y0, ws, kinds=('png', 'dxf', 'gerber')):
+        # writes every requested output of kinds from one geometry. Outputs found in the
+        # export cache are restored from it. With more than one output left the
+        # writers run in a thread pool, the file writes and PIL encoding overlap
+        # while the pure Python DXF and gerber code shares the GIL
+        outputs = [(kind, filename) for kind, filename in (('png', self.args.pngoutput), ('dxf', self.args.dxfoutput),
+                                                           ('gerber', self.args.gerberoutput))
+                   if filename and kind in kinds]
+        if not outputs:
+            return
+        if self.args.type == "microstrip" and ws is None:
+            print("[*] Not exported, a microstrip patch needs a strip width")
+            return
+        geometry = self.geometry(W, L, x0, y0, ws)
+        cache = get_export_cache()
+        keys = {}
+        if cache is not None:
+            with stage("export cache: lookup"):
+                for kind, filename in outputs:
+                    keys[kind] = cache.key(kind, geometry, self.args)
+                outputs = [(kind, filename) for kind, filename in outputs
+                           if not cache.restore(keys[kind], export_targets(kind, filename, self.args))]
+                for kind, filename in outputs:
+                    for target in export_targets(kind, filename, self.args).values():
+                        cache.detach(target)
+        if not outputs:
+            return
+
+        dxf_geometry = None
+        if any(kind == 'dxf' or (kind == 'gerber' and self.args.gerber_engine != 'native') for kind, _ in outputs):
+            dxf_geometry = self.dxf_geometry(W, L, x0, y0, ws, self.dxf_scale())
+        exporters = {'png': lambda filename: self.export_png(filename, geometry),
+                     'dxf': lambda filename: self.export_dxf(filename, dxf_geometry),
+                     'gerber': lambda filename: self.export_gerber(filename, geometry, dxf_geometry)}
+
+        def export(kind, filename):
+            exporters[kind](filename)
+            if cache is not None:
+                with stage("export cache: store"):
+                    cache.store(keys[kind], export_targets(kind, filename, self.args))
+
+        if len(outputs) < 2:
+            for kind, filename in outputs:
+                export(kind, filename)
+            return
+        with ThreadPoolExecutor(max_workers=len(outputs)) as pool:
+            futures = [pool.submit(export, kind, filename) for kind, filename in outputs]
+            for future in futures:
+                future.result()
+
+    def export_patch(self, kinds=('png', 'dxf', 'gerber')):
+        # rectangular_patch_export: the dimensions come from the arguments
+        self.export(self.args.width, self.args.length, self.args.x0, self.args.y0, self.args.strip_width, kinds)
 
     def export_patch_to_png(self):
-        if self.args.type == 'microstrip':
-            self.export_png(self.args.pngoutput, self.args.width, self.args.length, self.args.x0, self.args.y0, self.args.strip_width if self.args.type == "microstrip" else None)
-        elif self.args.type == 'probe':
-            self.export_png(self.args.pngoutput, self.args.width, self.args.length, self.args.x0, self.args.y0, self.args.strip_width if self.args.type == "microstrip" else None)
+        self.export_patch(('png',))
 
     def export_patch_to_dxf(self):
-        if self.args.type == 'microstrip':
-            self.export_dxf(self.args.dxfoutput, self.args.width, self.args.length, self.args.x0, self.args.y0, self.args.strip_width if self.args.type == "microstrip" else None)
-        elif self.args.type == 'probe':
-            self.export_dxf(self.args.dxfoutput, self.args.width, self.args.length, self.args.x0, self.args.y0, self.args.strip_width if self.args.type == "microstrip" else None)
+        self.export_patch(('dxf',))
 
     def export_patch_to_gerber(self):
-        if self.args.type == 'microstrip':
-            self.export_dxf(self.args.gerberoutput, self.args.width, self.args.length, self.args.x0, self.args.y0, self.args.strip_width if self.args.type == "microstrip" else None, True)
-            self.gerberGen.generate_gerber(self.args.gerberoutput)
-        elif self.args.type == 'probe':
-            self.export_dxf(self.args.gerberoutput, self.args.width, self.args.length, self.args.x0, self.args.y0, self.args.strip_width if self.args.type == "microstrip" else None, True)
-            self.gerberGen.generate_gerber(self.args.gerberoutput)
+        self.export_patch(('gerber',))
 
 
-    def microstrip_patch_calculator(self, Z0=50):
-
-        Z0 = Z0 #50 ohms by default
-
-        W = self.patch_width(self.args.frequency, self.args.relative_permittivity)
+    def calculate_patch(self, Z0=50):
+        # design values and the intermediate values printed in verbose mode
+        # all come from antenna_api. Returns (W, L, x0, y0, Ws), Ws is None
+        # for probe fed patches
+        with stage("design equations"):
+            d = design_rectangular_patch(self.args.frequency, self.args.relative_permittivity, self.args.height,
+                                         self.args.type, Z0)
         if not (self.args.variable_return):
-            self.unit_print("W", W, self.args.unit)
+            self.unit_print("W", d.W, self.args.unit)
 
-        ereff = self.effective_relative_permittivity(self.args.frequency, self.args.relative_permittivity, self.args.height, W)
         if self.args.verbose:
-            print("[*] Ereff = {:.2f}".format(ereff))
+            print("[*] Ereff = {:.2f}".format(d.Ereff))
+            self.unit_print("dL", d.dL, self.args.unit)
+            self.unit_print("Leff", d.Leff, self.args.unit)
 
-        dL = self.delta_length(self.args.height, ereff, W)
-        if self.args.verbose:
-            self.unit_print("dL", dL, self.args.unit)
+        if not (self.args.variable_return):
+            self.unit_print("L", d.L, self.args.unit)
 
-        Leff = self.effective_length(self.args.frequency, ereff)
         if self.args.verbose:
-            self.unit_print("Leff", Leff, self.args.unit)
-
-        L = Leff - 2*dL
+            print("[*] Zin_0 =", d.Zin_0)
+            print("[*] Zin_x0 =", Z0)
+            print("[*] x0 =", d.x0)
         if not (self.args.variable_return):
-            self.unit_print("L", L, self.args.unit)
+            self.unit_print("x0", d.x0, self.args.unit)
 
-        x0 = self.x0_calculation(L, W, self.args.relative_permittivity, Z0)
+        if self.args.verbose:
+            print("[*] y0 =", d.y0)
         if not (self.args.variable_return):
-            self.unit_print("x0", x0, self.args.unit)
+            self.unit_print("y0", d.y0, self.args.unit)
 
-        y0 = self.y0_calculation(W)
-        if not (self.args.variable_return):
-            self.unit_print("y0", y0, self.args.unit)
+        if self.args.type == "microstrip":
+            if self.args.verbose:
+                self.print_strip_forms(d)
+            if not (self.args.variable_return):
+                if d.Ws is None:
+                    print("No valid Stripline width found")
+                else:
+                    self.unit_print("Ws", d.Ws, self.args.unit)
+
+        return d.W, d.L, d.x0, d.y0, d.Ws
+
+    def print_strip_forms(self, d):
+        print("[*] A =", d.A)
+        print("[*] A Ws/d =", d.A_wsd)
+        if d.B is None:
+            print("[*] A is valid")
+            return
+        print("[*] A is not valid")
+        print("[*] B =", d.B)
+        print("[*] B Ws/d =", d.B_wsd)
+        if d.Ws is None:
+            print("[*] B is not valid")
+        else:
+            print("[*] B is valid")
 
+    def print_patch_params(self, W, L, x0, y0, ws):
+        self.unit_print("W", W, self.args.unit)
+        self.unit_print("L", L, self.args.unit)
+        self.unit_print("x0", x0, self.args.unit)
+        self.unit_print("y0", y0, self.args.unit)
         if self.args.type == "microstrip":
-            ws = self.ws_calculation(self.args.height, Z0, self.args.relative_permittivity)
-            if not (self.args.variable_return):    
+            if ws is None:
+                print("No valid Stripline width found")
+            else:
                 self.unit_print("Ws", ws, self.args.unit)
 
-        if self.args.pngoutput:
-            self.export_png(self.args.pngoutput, W, L, x0, y0, ws if self.args.type == "microstrip" else None)
+    def microstrip_patch_calculator(self, Z0=50):
+
+        Z0 = Z0 #50 ohms by default
 
-        if self.args.dxfoutput:
-            self.export_dxf(self.args.dxfoutput, W, L, x0, y0, ws if self.args.type == "microstrip" else None)
+        # verbose runs always calculate, so every intermediate value is printed
+        cache = get_cache()
+        if cache is not None and not self.args.verbose:
+            key = cache.key('rectangular_patch', self.args.type, self.args.frequency,
+                            self.args.relative_permittivity, self.args.height, float(Z0))
+            params = cache.get(key)
+            if params is None:
+                params = self.calculate_patch(Z0)
+                cache.put(key, params)
+            elif not (self.args.variable_return):
+                self.print_patch_params(*params)
+        else:
+            params = self.calculate_patch(Z0)
+        W, L, x0, y0, ws = params
 
-        if self.args.gerberoutput:
-            self.export_dxf(self.args.gerberoutput, W, L, x0, y0, ws if self.args.type == "microstrip" else None, True)
-            self.gerberGen.generate_gerber(self.args.gerberoutput)
+        self.export(W, L, x0, y0, ws)
 
         if self.args.variable_return:
             if self.args.type == "microstrip":
@@ -0,0 +1,92 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  rectangular_patch_batch.py
+#
+#   The rectangular patch design, vectorized. Inputs are broadcast
+#   against each other so a whole grid of designs is sized in one
+#   NumPy pass, with no printing and no Pint conversions. The equations
+#   themselves are in patch_equations.py, shared with the scalar API.
+##--------------------------------------------------------------------\
+
+import numpy as np
+
+import patch_equations as eq
+
+# fields of the structured array returned by RectangularPatchBatch.design()
+PATCH_DTYPE = np.dtype([('W', 'f8'), ('L', 'f8'), ('x0', 'f8'), ('y0', 'f8'),
+                        ('Ws', 'f8'), ('Ereff', 'f8')])
+
+class RectangularPatchBatch:
+    def __init__(self, Z0=50):
+        self.Z0 = Z0 #50 ohms by default
+
+    def patch_width(self, f, er):
+        return eq.patch_width(f, er)
+
+    def effective_relative_permittivity(self, f, er, h, W):
+        return eq.effective_relative_permittivity(er, h, W)
+
+    def delta_length(self, h, ereff, W):
+        return eq.delta_length(h, ereff, W)
+
+    def effective_length(self, f, ereff):
+        return eq.effective_length(f, ereff)
+
+    def A_calculation(self, Z0, er):
+        return eq.A_calculation(Z0, er)
+
+    def A_wsd(self, Z0, er):
+        return eq.A_wsd(Z0, er)
+
+    def B_calculation(self, Z0, er):
+        return eq.B_calculation(Z0, er)
+
+    def B_wsd(self, Z0, er):
+        return eq.B_wsd(Z0, er)
+
+    def ws_calculation(self, h, Z0, er, steps=None):
+        # the A form holds for Ws/d < 2, the B form for wide strips (Ws/d > 2)
+        # NaN marks points where neither form is valid. steps, when given, gets
+        # A, B and their Ws/d, B only where the A form is not valid
+        if steps is not None:
+            wsd = eq.A_wsd(Z0, er)
+            wide = ~(wsd < 2)
+            steps.update(A=eq.A_calculation(Z0, er), A_wsd=wsd,
+                         B=np.where(wide, eq.B_calculation(Z0, er), np.nan),
+                         B_wsd=np.where(wide, eq.B_wsd(Z0, er), np.nan))
+        return eq.strip_width_ratio(Z0, er) * h
+
+    def edge_resistance(self, L, W, er):
+        return eq.edge_resistance(L, W, er)
+
+    def x0_calculation(self, L, W, er, Z0):
+        return eq.x0_calculation(L, W, er, Z0)
+
+    def design(self, f, er, h, Z0=None, steps=None):
+        # f, er, h and Z0 can be scalars or any broadcastable arrays. steps, a
+        # dict, gets the intermediate values (dL, Leff, Zin_0 and the strip
+        # width forms) when given
+        if Z0 is None:
+            Z0 = self.Z0
+        f, er, h, Z0 = np.broadcast_arrays(np.asarray(f, dtype=np.float64),
+                                           np.asarray(er, dtype=np.float64),
+                                           np.asarray(h, dtype=np.float64),
+                                           np.asarray(Z0, dtype=np.float64))
+
+        out = np.empty(f.shape, dtype=PATCH_DTYPE)
+        W = eq.patch_width(f, er)
+        ereff = eq.effective_relative_permittivity(er, h, W)
+        dL = eq.delta_length(h, ereff, W)
+        Leff = eq.effective_length(f, ereff)
+        L = Leff - 2*dL
+
+        out['W'] = W
+        out['L'] = L
+        out['x0'] = eq.x0_calculation(L, W, er, Z0)
+        out['y0'] = eq.y0_calculation(W)
+        out['Ws'] = self.ws_calculation(h, Z0, er, steps)
+        out['Ereff'] = ereff
+        if steps is not None:
+            steps.update(dL=dL, Leff=Leff, Zin_0=eq.edge_resistance(L, W, er))
+        return out
@@ -0,0 +1,117 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  result_cache.py
+#
+#   Memoizes calculator results keyed on the normalized inputs. An
+#   in-process LRU dictionary sits in front of an optional SQLite
+#   file, so repeated design runs and CI jobs can reuse points that
+#   were already calculated. Both levels have a size limit and drop
+#   the least recently used entries first.
+##--------------------------------------------------------------------\
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_cache = None
+
+def get_cache():
+    # the cache configured for this process, or None when caching is off
+    return _cache
+
+def set_cache(cache):
+    global _cache
+    _cache = cache
+
+
+class ResultCache:
+    def __init__(self, size=4096, filename=None, disk_size=1000000):
+        self.size = size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        # serve answers requests from several threads
+        self.lock = threading.RLock()
+        if filename:
+            self.db = sqlite3.connect(filename, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS results "
+                            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self.db.commit()
+            self.disk_count = self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def key(self, kind, *values):
+        # floats are written with 12 significant digits so that 2.4e9 and
+        # 2400000000.0000002 share an entry
+        parts = [kind]
+        for v in values:
+            parts.append("{:.12g}".format(v) if isinstance(v, float) else str(v))
+        return "|".join(parts)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+            if self.db is not None:
+                row = self.db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self.db.commit()
+                    value = tuple(json.loads(row[0]))
+                    self.remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def put(self, key, value):
+        with self.lock:
+            value = tuple(value)
+            self.remember(key, value)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                                (key, json.dumps(value), time.time()))
+                # put() follows a miss, so the key is almost always new
+                self.disk_count += 1
+                if self.disk_count > self.disk_size:
+                    # drop the least recently used tenth in one go
+                    evict = self.disk_count - self.disk_size + self.disk_size // 10
+                    self.db.execute("DELETE FROM results WHERE key IN "
+                                    "(SELECT key FROM results ORDER BY last_used LIMIT ?)", (evict,))
+                    self.disk_count = self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+                self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM results")
+                self.db.commit()
+                self.disk_count = 0
+
+    def stats(self):
+        stats = {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                 'memory_entries': len(self.memory)}
+        if self.db is not None:
+            stats['disk_entries'] = self.disk_count
+        return stats
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,231 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  result_store.py
+#
+#   Columnar result store for very large sweeps. A store is a
+#   directory with one .npy file per output column and a small
+#   header.json that lists the columns and the sweep axes. Columns
+#   are memory-mapped, so the sweep writes into them in place and
+#   analysis code opens a store of any size without reading it.
+#
+#   The axis values are not stored: row i is the point
+#   np.unravel_index(i, shape) of the cartesian product of the axes,
+#   as in sweep.py, and is found from the axis definitions. Output
+#   columns get a sorted index on first use, saved next to them, and
+#   are then searched with a binary search over the mapped files.
+#
+#   from result_store import ResultStore
+#   store = ResultStore('patch_sweep.store')
+#   store.row(store.select(frequency=2.4e9, relative_permittivity=4.4, height=1.6e-3))
+#   store.between('W', 0.030, 0.031)
+##--------------------------------------------------------------------\
+
+import bisect
+import json
+import os
+import numpy as np
+
+from sweep import ParameterAxis
+
+HEADER = 'header.json'
+
+class StoreRows:
+    # rows start:stop of the columns, set like a structured array chunk. Only
+    # those rows are mapped, so writing a large store keeps few pages mapped
+    def __init__(self, store, start, stop):
+        self.store = store
+        self.dtype = store.dtype
+        self.start, self.stop = start, stop
+        self.windows = {}
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, name):
+        if name not in self.windows:
+            self.windows[name] = self.store.window(name, self.start, self.stop)
+        return self.windows[name]
+
+    def __setitem__(self, name, value):
+        self[name][:] = value
+
+    def flush(self):
+        # writes the mapped rows back to the column files and unmaps them,
+        # before the store is closed and marked complete
+        for window in self.windows.values():
+            window.flush()
+        self.windows = {}
+
+
+class SortedColumn:
+    # a column in sorted order through its index, without copying either
+    def __init__(self, column, index):
+        self.column = column
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        return self.column[self.index[i]]
+
+
+class ResultStore:
+    def __init__(self, path, mode='r'):
+        # mode 'r' maps the columns read-only, 'r+' for writing
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, HEADER)) as f:
+            self.header = json.load(f)
+        self.axes = [ParameterAxis(a['name'], a['spec']) for a in self.header['axes']]
+        self.shape = tuple(len(a) for a in self.axes)
+        self.dtype = np.dtype([(name, dt) for name, dt in self.header['columns']])
+        self.columns = {}
+        self.indexes = {}
+        self.offsets = {}
+
+    @classmethod
+    def create(cls, path, dtype, count, axes=()):
+        # new store of count rows for the fields of dtype. axes are the
+        # ParameterAxis objects of the sweep, their product must be count
+        if axes and int(np.prod([len(a) for a in axes], dtype=np.int64)) != count:
+            raise ValueError("the sweep axes do not match the row count")
+        os.makedirs(path, exist_ok=True)
+        for name in dtype.names:
+            np.lib.format.open_memmap(os.path.join(path, name + '.npy'), mode='w+', dtype=dtype[name],
+                                      shape=(count,)).flush()
+        header = {'version': 1, 'count': count, 'complete': False,
+                  'axes': [{'name': a.name, 'spec': a.spec} for a in axes],
+                  'columns': [[name, dtype[name].str] for name in dtype.names]}
+        with open(os.path.join(path, HEADER), 'w') as f:
+            json.dump(header, f, indent=2)
+        return cls(path, 'r+')
+
+    def __len__(self):
+        return self.header['count']
+
+    @property
+    def names(self):
+        return [a.name for a in self.axes] + list(self.dtype.names)
+
+    def __getitem__(self, name):
+        # the mapped column, or the values of an axis for every row (computed)
+        if name in self.dtype.names:
+            if name not in self.columns:
+                self.columns[name] = np.load(os.path.join(self.path, name + '.npy'), mmap_mode=self.mode)
+            return self.columns[name]
+        return self.axis_values(name, np.arange(len(self), dtype=np.int64))
+
+    def axis_values(self, name, rows):
+        for i, axis in enumerate(self.axes):
+            if axis.name == name:
+                return axis.take(np.unravel_index(rows, self.shape)[i])
+        raise KeyError(name)
+
+    def window(self, name, start, stop):
+        # memory map of rows start:stop of a column
+        filename = os.path.join(self.path, name + '.npy')
+        if name not in self.offsets:
+            with open(filename, 'rb') as f:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    np.lib.format.read_array_header_1_0(f)
+                else:
+                    np.lib.format.read_array_header_2_0(f)
+                self.offsets[name] = f.tell()
+        dtype = self.dtype[name]
+        return np.memmap(filename, dtype=dtype, mode=self.mode, offset=self.offsets[name] + start * dtype.itemsize,
+                         shape=(stop - start,))
+
+    def rows(self, start, stop):
+        return StoreRows(self, start, stop)
+
+    def row(self, i):
+        # every axis value and column of row i as a dict
+        i = int(i)
+        values = {}
+        if self.axes:
+            for axis, idx in zip(self.axes, np.unravel_index(i, self.shape)):
+                values[axis.name] = float(axis.take(idx))
+        for name in self.dtype.names:
+            values[name] = self[name][i].item()
+        return values
+
+    def nearest_step(self, axis, target):
+        # index of the axis value closest to target
+        if axis.values is not None:
+            return int(np.argmin(np.abs(axis.values - target)))
+        return int(min(max(round((target - axis.start) / axis.step), 0), len(axis) - 1))
+
+    def select(self, **targets):
+        # rows of the grid point nearest to the targets, one per value of the
+        # axes that are not given, or the row number when that is one row
+        unknown = [name for name in targets if name not in [a.name for a in self.axes]]
+        if unknown:
+            raise KeyError("not a sweep axis: " + ", ".join(unknown))
+        idx = [np.array([self.nearest_step(a, targets[a.name])]) if a.name in targets else np.arange(len(a))
+               for a in self.axes]
+        rows = np.ravel_multi_index(np.meshgrid(*idx, indexing='ij'), self.shape).ravel()
+        return int(rows[0]) if len(rows) == 1 else rows
+
+    def sorted_index(self, name):
+        # row numbers of column name in ascending order of its values. Built
+        # with one argsort the first time and kept as <name>.index.npy
+        if name not in self.indexes:
+            filename = os.path.join(self.path, name + '.index.npy')
+            if not os.path.exists(filename) or os.path.getmtime(filename) < os.path.getmtime(
+                    os.path.join(self.path, name + '.npy')):
+                order = np.argsort(self[name], kind='stable')
+                index = np.lib.format.open_memmap(filename, mode='w+', dtype=np.int64, shape=order.shape)
+                index[:] = order
+                index.flush()
+                del order, index
+            self.indexes[name] = np.load(filename, mmap_mode='r')
+        return self.indexes[name]
+
+    def sorted_column(self, name):
+        # the sorted view of a column and the number of its values that are
+        # not NaN, which argsort puts last
+        values = SortedColumn(self[name], self.sorted_index(name))
+        if values.column.dtype.kind != 'f':
+            return values, len(values)
+        lo, hi = 0, len(values)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if np.isnan(values[mid]):
+                hi = mid
+            else:
+                lo = mid + 1
+        return values, lo
+
+    def nearest(self, name, target):
+        # row whose value of column name is closest to target, None if all are NaN
+        values, valid = self.sorted_column(name)
+        if valid == 0:
+            return None
+        i = bisect.bisect_left(values, target, 0, valid)
+        if i == valid or (i > 0 and target - values[i - 1] <= values[i] - target):
+            i -= 1
+        return int(values.index[i])
+
+    def between(self, name, lo, hi):
+        # rows with lo <= value <= hi, as a view of the sorted index
+        values, valid = self.sorted_column(name)
+        return values.index[bisect.bisect_left(values, lo, 0, valid):bisect.bisect_right(values, hi, 0, valid)]
+
+    def flush(self):
+        for column in self.columns.values():
+            if isinstance(column, np.memmap):
+                column.flush()
+
+    def close(self, complete=True):
+        # flushes the columns and, after writing, marks the store complete
+        self.flush()
+        if self.mode != 'r' and complete:
+            self.header['complete'] = True
+            with open(os.path.join(self.path, HEADER), 'w') as f:
+                json.dump(self.header, f, indent=2)
+        self.columns = {}
+        self.indexes = {}
+
@@ -0,0 +1,90 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  rs274x_writer.py
+#
+#   Writes the top copper (.gtl) and board outline (.gml) gerber
+#   layers straight from the patch point lists in patch_geometry.py,
+#   without going through ezdxf and pcb-tools-extension. Geometry is
+#   given in meters and written in millimeters or inches.
+##--------------------------------------------------------------------\
+
+GERBER_UNITS = {'millimeter': ('MM', 1e3), 'inch': ('IN', 1 / 0.0254)}
+
+class RS274XWriter:
+    def __init__(self, unit='millimeter', integer_digits=None, decimal_digits=None, outline_width=1e-4):
+        # outline_width is the board outline line width in meters
+        self.unit_code, self.scale = GERBER_UNITS[unit]
+        if unit == 'inch':
+            self.integer_digits = integer_digits or 2
+            self.decimal_digits = decimal_digits or 5
+        else:
+            self.integer_digits = integer_digits or 3
+            self.decimal_digits = decimal_digits or 4
+        self.outline_width = outline_width
+        self.factor = self.scale * 10 ** self.decimal_digits
+
+    def xy(self, point):
+        # leading zeros are omitted, so coordinates are plain integers
+        return "X{:d}Y{:d}".format(int(round(point[0] * self.factor)), int(round(point[1] * self.factor)))
+
+    def header(self, lines):
+        lines.append("%FSLAX{0}{1}Y{0}{1}*%".format(self.integer_digits, self.decimal_digits))
+        lines.append("%MO{}*%".format(self.unit_code))
+        lines.append("%LPD*%")
+
+    def aperture(self, dcode, diameter):
+        return "%ADD{}C,{:.{}f}*%".format(dcode, diameter, self.decimal_digits)
+
+    def polyline(self, lines, points):
+        lines.append(self.xy(points[0]) + "D02*")
+        for p in points[1:]:
+            lines.append(self.xy(p) + "D01*")
+
+    def top_layer(self, patches):
+        # patches is a list of (patch_points, probe_feed, substrate_points)
+        lines = ["G04 AntennaCalculator top layer*"]
+        self.header(lines)
+        lines.append(self.aperture(10, self.outline_width * self.scale))
+        feeds = [p[1] for p in patches if p[1]]
+        feed_dcodes = {}
+        for _, radius in feeds:
+            if radius not in feed_dcodes:
+                feed_dcodes[radius] = 11 + len(feed_dcodes)
+                lines.append(self.aperture(feed_dcodes[radius], 2 * radius * self.scale))
+        lines.append("D10*")
+        lines.append("G01*")
+        for points, _, _ in patches:
+            lines.append("G36*")
+            self.polyline(lines, points)
+            lines.append("G37*")
+        if feeds:
+            # the probe feed is cut out of the copper
+            lines.append("%LPC*%")
+            for center, radius in feeds:
+                lines.append("D{}*".format(feed_dcodes[radius]))
+                lines.append(self.xy(center) + "D03*")
+        lines.append("M02*")
+        return "\n".join(lines) + "\n"
+
+    def outline_layer(self, patches):
+        lines = ["G04 AntennaCalculator substrate outline*"]
+        self.header(lines)
+        lines.append(self.aperture(10, self.outline_width * self.scale))
+        lines.append("D10*")
+        lines.append("G01*")
+        for _, _, substrate_points in patches:
+            self.polyline(lines, substrate_points)
+        lines.append("M02*")
+        return "\n".join(lines) + "\n"
+
+    def write_patch_gerber(self, filename, patches):
+        # writes <filename>_top.gtl and <filename>_substrate.gml for any number of patches
+        top_name = filename.split(".")[0] + '_top.gtl'
+        substrate_name = filename.split(".")[0] + '_substrate.gml'
+        with open(top_name, 'w') as f:
+            f.write(self.top_layer(patches))
+        print("[*] Top layer gerber file generated: " + top_name)
+        with open(substrate_name, 'w') as f:
+            f.write(self.outline_layer(patches))
+        print("[*] Substrate gerber file generated: " + substrate_name)
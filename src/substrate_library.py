@@ -0,0 +1,290 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  substrate_library.py
+#
+#   Catalog of common PCB and microwave substrates and a search over
+#   every material and thickness in it for a rectangular patch at a
+#   target frequency. Candidates that break a constraint (footprint,
+#   narrowest feed line the fab can etch, loss, bandwidth, ...) are
+#   dropped, and the rest are reduced to the Pareto set of the chosen
+#   objectives, ordered by the first one.
+#
+#   Constraints that only depend on the material (loss tangent, patch
+#   width) or on closed forms of the thickness (strip width) prune the
+#   candidates before any design is sized. The remaining candidates
+#   are sized in blocks, spread over worker processes, and every block
+#   only sends back its own Pareto set.
+#
+#   The catalog values are nominal datasheet design values, check the
+#   current datasheet of a laminate before ordering it. More materials
+#   are added with register_substrate() or a JSON file of the form
+#   {"name": {"relative_permittivity": 3.0, "loss_tangent": 0.001,
+#             "thicknesses": [0.000508, 0.001524]}}
+#
+#   Efficiency is the radiation efficiency against dielectric loss,
+#   1 - Q tan_delta, conductor loss is not included.
+##--------------------------------------------------------------------\
+
+import json
+import math
+import os
+from collections import deque
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from antenna_api import Record
+from impedance_sweep import matched_bandwidth, patch_resonator
+from rectangular_patch_batch import RectangularPatchBatch
+
+class Substrate(Record):
+    # thicknesses are the standard dielectric thicknesses in meters
+    __slots__ = ('name', 'relative_permittivity', 'loss_tangent', 'thicknesses')
+
+
+class SubstrateCandidate(Record):
+    __slots__ = ('material', 'relative_permittivity', 'loss_tangent', 'height', 'W', 'L', 'area', 'x0', 'Ws',
+                 'Q', 'bandwidth', 'efficiency')
+
+
+_mm = lambda *t: tuple(v * 1e-3 for v in t)
+
+SUBSTRATES = {}
+
+def register_substrate(name, relative_permittivity, loss_tangent, thicknesses):
+    SUBSTRATES[name] = Substrate(name, float(relative_permittivity), float(loss_tangent),
+                                 tuple(float(h) for h in thicknesses))
+    return SUBSTRATES[name]
+
+for _s in (('FR4', 4.4, 0.02, _mm(0.2, 0.4, 0.8, 1.0, 1.2, 1.6, 2.0, 2.4, 3.2)),
+           ('RO4003C', 3.55, 0.0027, _mm(0.203, 0.305, 0.406, 0.508, 0.813, 1.524)),
+           ('RO4350B', 3.66, 0.0037, _mm(0.101, 0.168, 0.254, 0.338, 0.422, 0.508, 0.762, 1.524)),
+           ('RO3003', 3.00, 0.001, _mm(0.13, 0.25, 0.50, 0.75, 1.52)),
+           ('RO3006', 6.15, 0.002, _mm(0.13, 0.25, 0.64, 1.28)),
+           ('RO3010', 10.2, 0.0022, _mm(0.13, 0.25, 0.64, 1.28)),
+           ('RT5880', 2.20, 0.0009, _mm(0.127, 0.254, 0.381, 0.508, 0.787, 1.575, 3.175)),
+           ('RT5870', 2.33, 0.0012, _mm(0.127, 0.254, 0.381, 0.508, 0.787, 1.575, 3.175)),
+           ('RT6002', 2.94, 0.0012, _mm(0.127, 0.254, 0.508, 0.762, 1.524)),
+           ('RT6010', 10.2, 0.0023, _mm(0.254, 0.635, 1.27, 1.9, 2.5)),
+           ('TLY-5', 2.20, 0.0009, _mm(0.127, 0.254, 0.508, 0.787, 1.575)),
+           ('AD255C', 2.55, 0.0014, _mm(0.508, 0.762, 1.524)),
+           ('alumina', 9.8, 0.0002, _mm(0.254, 0.381, 0.635, 1.016))):
+    register_substrate(*_s)
+
+def load_substrates(filename):
+    # adds or replaces the materials of a JSON catalog file
+    with open(filename) as f:
+        catalog = json.load(f)
+    return [register_substrate(name, m['relative_permittivity'], m.get('loss_tangent', 0.0), m['thicknesses'])
+            for name, m in catalog.items()]
+
+
+CANDIDATE_DTYPE = np.dtype([('material', 'i4'), ('relative_permittivity', 'f8'), ('loss_tangent', 'f8'),
+                            ('height', 'f8'), ('W', 'f8'), ('L', 'f8'), ('area', 'f8'), ('x0', 'f8'), ('Ws', 'f8'),
+                            ('Q', 'f8'), ('bandwidth', 'f8'), ('efficiency', 'f8')])
+
+# objective -> (column, 1 to minimize or -1 to maximize)
+OBJECTIVES = {'area': ('area', 1), 'bandwidth': ('bandwidth', -1), 'efficiency': ('efficiency', -1),
+              'height': ('height', 1), 'strip_width': ('Ws', -1), 'loss_tangent': ('loss_tangent', 1)}
+
+# constraint option -> (column, bound)
+CONSTRAINTS = {'max_width': ('W', 'max'), 'max_length': ('L', 'max'), 'max_area': ('area', 'max'),
+               'min_strip_width': ('Ws', 'min'), 'min_height': ('height', 'min'), 'max_height': ('height', 'max'),
+               'max_loss_tangent': ('loss_tangent', 'max'), 'min_bandwidth': ('bandwidth', 'min'),
+               'min_efficiency': ('efficiency', 'min')}
+
+def pareto_mask(costs):
+    # True for the rows of costs (all minimized) that no other row dominates.
+    # Each kept point removes everything it dominates, so the loop runs once
+    # per point of the front, not once per row
+    order = np.lexsort(costs.T[::-1])
+    costs = costs[order]
+    keep = np.arange(len(costs))
+    i = 0
+    while i < len(costs):
+        better = np.any(costs < costs[i], axis=1)
+        better[i] = True
+        keep, costs = keep[better], costs[better]
+        i = int(np.sum(better[:i])) + 1
+    mask = np.zeros(len(order), dtype=bool)
+    mask[order[keep]] = True
+    return mask
+
+def evaluate(f, Z0, feed, material, er, tan_delta, h, limits, objectives):
+    # sizes every candidate and returns the feasible, non-dominated ones
+    batch = RectangularPatchBatch()
+    with np.errstate(invalid='ignore'):
+        d = batch.design(f, er, h, Z0)
+    out = np.empty(len(h), dtype=CANDIDATE_DTYPE)
+    out['material'], out['relative_permittivity'], out['loss_tangent'], out['height'] = material, er, tan_delta, h
+    for name in ('W', 'L', 'x0', 'Ws'):
+        out[name] = d[name]
+    out['area'] = d['W'] * d['L']
+    dL = batch.delta_length(h, d['Ereff'], d['W'])
+    f0, R, out['Q'] = patch_resonator(d['W'], d['L'], er, h, d['x0'], d['Ereff'], dL, tan_delta)
+    out['bandwidth'] = matched_bandwidth(f0, R, out['Q'], Z0)
+    out['efficiency'] = 1 - out['Q'] * tan_delta
+
+    # no inset reaches Z0 when the edge resistance is already below it
+    feasible = np.isfinite(out['x0'])
+    if feed == 'microstrip':
+        feasible &= np.isfinite(out['Ws'])
+    for column, (lo, hi) in limits.items():
+        if lo is not None:
+            feasible &= out[column] >= lo
+        if hi is not None:
+            feasible &= out[column] <= hi
+    out = out[feasible]
+    if len(out):
+        out = out[pareto_mask(costs(out, objectives))]
+    return out
+
+def costs(candidates, objectives):
+    return np.stack([OBJECTIVES[o][1] * candidates[OBJECTIVES[o][0]] for o in objectives], axis=1)
+
+
+class SubstrateSearch:
+    def __init__(self, args):
+        self.args = args
+
+    def materials(self):
+        if self.args.materials:
+            load_substrates(self.args.materials)
+        if not self.args.substrates:
+            return list(SUBSTRATES.values())
+        names = [n.strip() for n in self.args.substrates.split(',')]
+        unknown = [n for n in names if n not in SUBSTRATES]
+        if unknown:
+            raise ValueError("unknown substrates: " + ", ".join(unknown))
+        return [SUBSTRATES[n] for n in names]
+
+    def limits(self):
+        # column -> (lower bound, upper bound), None where unbounded
+        limits = {}
+        for option, (column, bound) in CONSTRAINTS.items():
+            value = getattr(self.args, option)
+            if value is None:
+                continue
+            if column == 'Ws' and self.args.type == 'probe':
+                continue
+            lo, hi = limits.get(column, (None, None))
+            limits[column] = (value, hi) if bound == 'min' else (lo, value)
+        return limits
+
+    def objectives(self):
+        objectives = [o.strip() for o in self.args.objectives.split(',')]
+        unknown = [o for o in objectives if o not in OBJECTIVES]
+        if unknown:
+            raise ValueError("unknown objectives: {}, choose from {}".format(", ".join(unknown), ", ".join(OBJECTIVES)))
+        return objectives
+
+    def candidates(self, materials, limits):
+        # (material index, er, tan_delta, h) arrays of the candidates left after
+        # the closed form constraints, and the number pruned
+        from sweep import ParameterAxis
+        batch = RectangularPatchBatch()
+        thickness = None
+        if self.args.thickness:
+            axis = ParameterAxis('height', self.args.thickness)
+            thickness = axis.take(np.arange(len(axis)))
+        columns, pruned = [], 0
+        for i, m in enumerate(materials):
+            h = np.asarray(thickness if thickness is not None else m.thicknesses, dtype=np.float64)
+            keep = np.ones(len(h), dtype=bool)
+            # the patch width only depends on the material
+            W = batch.patch_width(self.args.frequency, m.relative_permittivity)
+            if not (self.within(limits, 'loss_tangent', m.loss_tangent) and self.within(limits, 'W', W)):
+                keep[:] = False
+            keep &= self.within(limits, 'height', h)
+            if self.args.type == 'microstrip' and 'Ws' in limits:
+                # the strip width grows in proportion to the thickness
+                with np.errstate(invalid='ignore'):
+                    keep &= self.within(limits, 'Ws', batch.ws_calculation(h, self.args.impedance, m.relative_permittivity))
+            pruned += int(np.sum(~keep))
+            h = h[keep]
+            columns.append((np.full(len(h), i), np.full(len(h), m.relative_permittivity),
+                            np.full(len(h), m.loss_tangent), h))
+        return [np.concatenate(c) for c in zip(*columns)] if columns else [np.empty(0)] * 4, pruned
+
+    def within(self, limits, column, values):
+        lo, hi = limits.get(column, (None, None))
+        ok = np.ones(np.shape(values), dtype=bool)
+        if lo is not None:
+            ok &= np.asarray(values) >= lo
+        if hi is not None:
+            ok &= np.asarray(values) <= hi
+        return ok
+
+    def blocks(self, candidates, limits, objectives):
+        # yields the Pareto set of every block, with at most two blocks per worker in flight
+        size = max(1, self.args.chunk_size)
+        n = len(candidates[0])
+        jobs = ((self.args.frequency, self.args.impedance, self.args.type, *[c[i:i + size] for c in candidates],
+                 limits, objectives) for i in range(0, n, size))
+        if self.args.workers == 1 or n <= size:
+            for job in jobs:
+                yield evaluate(*job)
+            return
+        window = 2 * (self.args.workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=self.args.workers) as pool:
+            pending = deque()
+            for job in jobs:
+                pending.append(pool.submit(evaluate, *job))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def search(self):
+        # the ranked Pareto set, as an array of CANDIDATE_DTYPE, and the materials
+        materials = self.materials()
+        limits, objectives = self.limits(), self.objectives()
+        candidates, pruned = self.candidates(materials, limits)
+        fronts = list(self.blocks(candidates, limits, objectives))
+        front = np.concatenate(fronts) if fronts else np.empty(0, dtype=CANDIDATE_DTYPE)
+        evaluated = len(candidates[0])
+        if len(front):
+            front = front[pareto_mask(costs(front, objectives))]
+            front = front[np.lexsort(costs(front, objectives).T[::-1])]
+        if self.args.verbose:
+            print("[*] {} candidates, {} pruned before sizing, {} sized in {} blocks".format(
+                evaluated + pruned, pruned, evaluated, int(math.ceil(evaluated / max(1, self.args.chunk_size)))))
+        return front, materials
+
+    def list_materials(self):
+        materials = self.materials()
+        for m in materials:
+            print("[*] {}: er = {}, tan_delta = {}, thicknesses = {} mm".format(
+                m.name, m.relative_permittivity, m.loss_tangent,
+                ", ".join("{:g}".format(h * 1e3) for h in m.thicknesses)))
+        return materials
+
+    def run(self):
+        if self.args.list:
+            return self.list_materials()
+        try:
+            if self.args.frequency is None:
+                raise ValueError("substrate searches need -f")
+            front, materials = self.search()
+        except ValueError as e:
+            if self.args.variable_return:
+                raise
+            print("[*] " + str(e))
+            return None
+        results = [SubstrateCandidate(materials[c['material']].name, *[float(c[n]) for n in CANDIDATE_DTYPE.names[1:]])
+                   for c in front]
+        if self.args.output:
+            with open(self.args.output, 'w') as f:
+                json.dump([r.as_dict() for r in results], f, indent=2)
+            print("[*] Substrate search saved: " + self.args.output + " ({} designs)".format(len(results)))
+        if self.args.variable_return:
+            return results
+
+        if not results:
+            print("[*] No substrate meets the constraints")
+        for rank, r in enumerate(results, 1):
+            print("[*] {}. {} h = {:g} mm: W = {:.2f} mm, L = {:.2f} mm, Ws = {:.2f} mm, "
+                  "bandwidth = {:.2f} %, efficiency = {:.1f} %".format(
+                      rank, r.material, r.height * 1e3, r.W * 1e3, r.L * 1e3, r.Ws * 1e3,
+                      r.bandwidth / self.args.frequency * 100, r.efficiency * 100))
+        return results
@@ -0,0 +1,243 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  sweep.py
+#
+#   Parametric sweeps over frequency, relative permittivity, height
+#   and feed impedance. The cartesian product of the sweep axes is
+#   walked in fixed size chunks and every chunk is written out as
+#   soon as it is calculated, so memory use does not depend on the
+#   number of points in the sweep.
+##--------------------------------------------------------------------\
+
+import os
+import numpy as np
+
+from rectangular_patch_batch import RectangularPatchBatch
+from dipole import Dipole
+from monopole import Monopole
+
+SWEEP_FORMATS = ['csv', 'npy', 'parquet', 'store']
+
+class ParameterAxis:
+    # One sweep axis, parsed from 'start:stop:step', 'a,b,c' or a single value.
+    # Ranges include the stop value and are never expanded in memory.
+    def __init__(self, name, spec):
+        self.name = name
+        self.values = None
+        spec = str(spec).strip()
+        self.spec = spec
+        if ':' in spec:
+            parts = [float(p) for p in spec.split(':')]
+            if len(parts) != 3 or parts[2] == 0:
+                raise ValueError("Range for " + name + " must be start:stop:step with a non-zero step")
+            self.start, self.stop, self.step = parts
+            count = int(np.floor((self.stop - self.start) / self.step + 1e-9)) + 1
+            if count < 1:
+                raise ValueError("Range for " + name + " is empty: " + spec)
+            self.count = count
+        else:
+            self.values = np.array([float(v) for v in spec.split(',')], dtype=np.float64)
+            self.count = len(self.values)
+
+    def __len__(self):
+        return self.count
+
+    def take(self, idx):
+        if self.values is not None:
+            return self.values[idx]
+        return self.start + idx * self.step
+
+
+class CSVSweepWriter:
+    def __init__(self, filename, dtype, total):
+        self.f = open(filename, 'w')
+        self.f.write(','.join(dtype.names) + '\n')
+
+    def write(self, chunk):
+        np.savetxt(self.f, chunk, delimiter=',', fmt='%.10g')
+
+    def close(self):
+        self.f.close()
+
+
+class NPYSweepWriter:
+    # the point count is known up front, so the header is written once and
+    # every chunk is appended as raw records
+    def __init__(self, filename, dtype, total):
+        self.f = open(filename, 'wb')
+        np.lib.format.write_array_header_2_0(self.f, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                      'fortran_order': False,
+                                                      'shape': (total,)})
+
+    def write(self, chunk):
+        self.f.write(np.ascontiguousarray(chunk).tobytes())
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSweepWriter:
+    def __init__(self, filename, dtype, total):
+        try:
+            import pyarrow  # pip install pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.names = list(dtype.names)
+        schema = pyarrow.schema([(n, pyarrow.float64()) for n in self.names])
+        self.writer = pyarrow.parquet.ParquetWriter(filename, schema)
+
+    def write(self, chunk):
+        self.writer.write_table(self.pa.Table.from_arrays([self.pa.array(chunk[n]) for n in self.names],
+                                                          names=self.names))
+
+    def close(self):
+        self.writer.close()
+
+
+class StoreSweepWriter:
+    # every field becomes a column of a result_store directory
+    def __init__(self, filename, dtype, total):
+        from result_store import ResultStore
+        self.store = ResultStore.create(filename, dtype, total)
+        self.written = 0
+
+    def write(self, chunk):
+        rows = self.store.rows(self.written, self.written + len(chunk))
+        for name in chunk.dtype.names:
+            rows[name] = chunk[name]
+        rows.flush()
+        self.written += len(chunk)
+
+    def close(self):
+        self.store.close(self.written == len(self.store))
+
+
+SWEEP_WRITERS = {'csv': CSVSweepWriter, 'npy': NPYSweepWriter, 'parquet': ParquetSweepWriter,
+                 'store': StoreSweepWriter}
+
+def output_format(filename, fmt=None):
+    # the given format, or the one matching the file extension, csv otherwise
+    if fmt:
+        return fmt
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    return ext if ext in SWEEP_FORMATS else 'csv'
+
+
+class Sweep:
+    def __init__(self, args):
+        self.args = args
+
+    def axes(self):
+        axes = [ParameterAxis('frequency', self.args.frequency)]
+        if self.args.antenna == 'rectangular_patch':
+            if self.args.relative_permittivity is None or self.args.height is None:
+                raise ValueError("rectangular_patch sweeps need -er and -h")
+            axes.append(ParameterAxis('relative_permittivity', self.args.relative_permittivity))
+            axes.append(ParameterAxis('height', self.args.height))
+            axes.append(ParameterAxis('Z0', self.args.impedance))
+        return axes
+
+    def output_dtype(self, axes):
+        inputs = [(a.name, 'f8') for a in axes]
+        if self.args.antenna == 'rectangular_patch':
+            outputs = [('W', 'f8'), ('L', 'f8'), ('x0', 'f8'), ('y0', 'f8'), ('Ereff', 'f8')]
+            if self.args.type == 'microstrip':
+                outputs.insert(4, ('Ws', 'f8'))
+            if self.args.bandwidth:
+                outputs += [('Rin', 'f8'), ('Q', 'f8'), ('bandwidth', 'f8')]
+        elif self.args.antenna == 'half_wave_dipole':
+            outputs = [('L_total', 'f8'), ('L_element', 'f8')]
+        else:
+            outputs = [('L', 'f8')]
+        return np.dtype(inputs + outputs)
+
+    def calculate(self, columns, out):
+        f = columns['frequency']
+        if self.args.antenna == 'rectangular_patch':
+            batch = RectangularPatchBatch()
+            designs = batch.design(f, columns['relative_permittivity'], columns['height'], columns['Z0'])
+            for name in out.dtype.names:
+                if name in designs.dtype.names:
+                    out[name] = designs[name]
+            if self.args.bandwidth:
+                from impedance_sweep import matched_bandwidth, patch_resonator
+                er, h = columns['relative_permittivity'], columns['height']
+                dL = batch.delta_length(h, designs['Ereff'], designs['W'])
+                f0, out['Rin'], out['Q'] = patch_resonator(designs['W'], designs['L'], er, h, designs['x0'],
+                                                           designs['Ereff'], dL, self.args.loss_tangent)
+                out['bandwidth'] = matched_bandwidth(f0, out['Rin'], out['Q'], columns['Z0'])
+        elif self.args.antenna == 'half_wave_dipole':
+            l = Dipole(self.args).half_wave_dipole(f)
+            out['L_total'] = l
+            out['L_element'] = l / 2
+        else:
+            out['L'] = Monopole(self.args).quarter_wave_monopole(f)
+
+    def blocks(self, axes):
+        # yields (start, stop, columns) for every chunk_size points, in C order
+        # over the axes, with columns the axis values of those points
+        shape = tuple(len(a) for a in axes)
+        total = int(np.prod(shape, dtype=np.int64))
+        chunk_size = max(1, self.args.chunk_size)
+        for start in range(0, total, chunk_size):
+            flat = np.arange(start, min(start + chunk_size, total), dtype=np.int64)
+            columns = {axis.name: axis.take(idx) for axis, idx in zip(axes, np.unravel_index(flat, shape))}
+            yield start, start + len(flat), columns
+
+    def chunks(self):
+        # yields structured arrays of at most chunk_size points
+        axes = self.axes()
+        dtype = self.output_dtype(axes)
+        for start, stop, columns in self.blocks(axes):
+            out = np.empty(stop - start, dtype=dtype)
+            for name, values in columns.items():
+                out[name] = values
+            self.calculate(columns, out)
+            yield out
+
+    def run_store(self, axes, total):
+        # the results are calculated straight into the memory-mapped columns.
+        # The axes are only described in the store header
+        from result_store import ResultStore
+        dtype = self.output_dtype(axes)
+        names = [a.name for a in axes]
+        store = ResultStore.create(self.args.output, np.dtype([(n, dtype[n]) for n in dtype.names if n not in names]),
+                                   total, axes)
+        written = 0
+        try:
+            for start, stop, columns in self.blocks(axes):
+                rows = store.rows(start, stop)
+                self.calculate(columns, rows)
+                rows.flush()
+                written = stop
+                if self.args.verbose:
+                    print("[*] {}/{} points written".format(written, total))
+        finally:
+            store.close(written == total)
+        return written
+
+    def run(self):
+        try:
+            axes = self.axes()
+        except ValueError as e:
+            print("[*] " + str(e))
+            return None
+        total = int(np.prod([len(a) for a in axes], dtype=np.int64))
+        fmt = output_format(self.args.output, self.args.format)
+        if fmt == 'store':
+            written = self.run_store(axes, total)
+        else:
+            writer = SWEEP_WRITERS[fmt](self.args.output, self.output_dtype(axes), total)
+            written = 0
+            try:
+                for chunk in self.chunks():
+                    writer.write(chunk)
+                    written += len(chunk)
+                    if self.args.verbose:
+                        print("[*] {}/{} points written".format(written, total))
+            finally:
+                writer.close()
+        print("[*] Sweep file generated: " + self.args.output + " ({} points)".format(written))
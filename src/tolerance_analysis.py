@@ -0,0 +1,196 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  tolerance_analysis.py
+#
+#   Monte Carlo manufacturing tolerance analysis of a rectangular
+#   patch. The substrate (er, h) and the etched W, L and x0 of the
+#   nominal design are drawn from the given distributions, and every
+#   sample is pushed through the patch equations for its resonant
+#   frequency, feed resistance and S11 at the design frequency.
+#
+#   Samples are generated and reduced in blocks of chunk_size, spread
+#   over worker processes. Each block has its own seed derived from
+#   the run seed and the block number, so a run is reproducible with
+#   any number of workers. Only fixed size histograms and running
+#   sums are kept, so memory does not grow with the sample count.
+#
+#   Distributions are written as normal:SIGMA, uniform:HALF_WIDTH or
+#   triangular:HALF_WIDTH, with a % suffix for values relative to the
+#   nominal value, e.g. normal:2% or uniform:25e-6.
+##--------------------------------------------------------------------\
+
+import json
+import math
+import os
+from collections import deque
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from antenna_api import design_rectangular_patch
+from impedance_sweep import input_impedance, patch_resonator, reflection_coefficient
+from rectangular_patch_batch import RectangularPatchBatch
+
+DISTRIBUTIONS = ['normal', 'uniform', 'triangular']
+METRICS = ['frequency_shift', 'Rin', 'S11_dB']
+QUANTILES = [0.001, 0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99, 0.999]
+
+def parse_tolerance(spec, nominal):
+    # 'normal:2%' -> ('normal', 0.02 * nominal)
+    kind, _, width = spec.partition(':')
+    if kind not in DISTRIBUTIONS or not width:
+        raise ValueError("tolerance must be one of {} followed by :WIDTH, got {}".format(
+            ", ".join(DISTRIBUTIONS), spec))
+    if width.endswith('%'):
+        return kind, abs(nominal) * float(width[:-1]) / 100
+    return kind, float(width)
+
+def draw(rng, kind, width, size):
+    # zero mean deviations
+    if kind == 'normal':
+        return rng.normal(0.0, width, size)
+    if kind == 'uniform':
+        return rng.uniform(-width, width, size)
+    return rng.triangular(-width, 0.0, width, size)
+
+def block_seed(seed, block):
+    return np.random.SeedSequence(seed, spawn_key=(block,))
+
+def simulate(nominal, tolerances, rng, size):
+    # returns the metric arrays of size samples
+    er, h, W, L, x0 = [np.full(size, nominal[n]) for n in ('er', 'h', 'W', 'L', 'x0')]
+    values = {'er': er, 'h': h, 'W': W, 'L': L, 'x0': x0}
+    for name, (kind, width) in tolerances.items():
+        if name == 'etch':
+            # over-etching eats into every edge of the copper
+            e = draw(rng, kind, width, size)
+            W -= 2 * e
+            L -= 2 * e
+        else:
+            values[name] += draw(rng, kind, width, size)
+    batch = RectangularPatchBatch()
+    ereff = batch.effective_relative_permittivity(nominal['f'], er, h, W)
+    dL = batch.delta_length(h, ereff, W)
+    f0, R, Q = patch_resonator(W, L, er, h, x0, ereff, dL, nominal['tan_delta'])
+    gamma = reflection_coefficient(input_impedance(nominal['f'], f0, R, Q), nominal['Z0'])
+    with np.errstate(divide='ignore'):
+        S11 = 20 * np.log10(np.abs(gamma))
+    return {'frequency_shift': f0 - nominal['f'], 'Rin': R, 'S11_dB': S11}
+
+def simulate_block(nominal, tolerances, seed, block, size, edges):
+    # one block reduced to histogram counts and running sums
+    metrics = simulate(nominal, tolerances, np.random.default_rng(block_seed(seed, block)), size)
+    result = {}
+    for name, values in metrics.items():
+        values = values[np.isfinite(values)]
+        counts, _ = np.histogram(values, edges[name])
+        result[name] = {'counts': counts, 'under': int(np.sum(values < edges[name][0])),
+                        'over': int(np.sum(values > edges[name][-1])), 'n': len(values),
+                        'sum': float(np.sum(values)), 'sum2': float(np.sum(values**2)),
+                        'min': float(np.min(values)) if len(values) else math.inf,
+                        'max': float(np.max(values)) if len(values) else -math.inf}
+    return result
+
+def histogram_quantiles(edges, counts, under, quantiles):
+    # quantiles interpolated inside the histogram bins
+    cdf = np.concatenate(([under], under + np.cumsum(counts))).astype(np.float64)
+    total = cdf[-1] + 0.0
+    out = {}
+    for q in quantiles:
+        out[q] = float(np.interp(q * total, cdf, edges)) if total > 0 else None
+    return out
+
+
+class ToleranceAnalysis:
+    def __init__(self, args):
+        self.args = args
+
+    def nominal(self):
+        d = design_rectangular_patch(self.args.frequency, self.args.relative_permittivity, self.args.height,
+                                     self.args.type, self.args.impedance)
+        return {'f': self.args.frequency, 'er': self.args.relative_permittivity, 'h': self.args.height,
+                'W': d.W, 'L': d.L, 'x0': d.x0, 'Z0': self.args.impedance, 'tan_delta': self.args.loss_tangent}
+
+    def tolerances(self, nominal):
+        specs = {'er': self.args.tol_er, 'h': self.args.tol_h, 'W': self.args.tol_W, 'L': self.args.tol_L,
+                 'x0': self.args.tol_x0, 'etch': self.args.tol_etch}
+        return {name: parse_tolerance(spec, nominal.get(name, 0.0)) for name, spec in specs.items() if spec}
+
+    def histogram_edges(self, nominal, tolerances, seed):
+        # bin ranges from a pilot run, widened so that few samples overflow
+        pilot = simulate(nominal, tolerances, np.random.default_rng(block_seed(seed, 2**32)), 20000)
+        edges = {}
+        for name, values in pilot.items():
+            values = values[np.isfinite(values)]
+            lo, hi = float(np.min(values)), float(np.max(values))
+            pad = (hi - lo) * 0.5 or max(abs(lo) * 1e-6, 1e-9)
+            edges[name] = np.linspace(lo - pad, hi + pad, self.args.bins + 1)
+        return edges
+
+    def blocks(self, nominal, tolerances, seed, edges):
+        # yields block results in order, with at most two blocks per worker in flight
+        samples, size = self.args.samples, max(1, self.args.chunk_size)
+        jobs = ((nominal, tolerances, seed, b, min(size, samples - b * size), edges)
+                for b in range(int(math.ceil(samples / size))))
+        if self.args.workers == 1:
+            for job in jobs:
+                yield simulate_block(*job)
+            return
+        window = 2 * (self.args.workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=self.args.workers) as pool:
+            pending = deque()
+            for job in jobs:
+                pending.append(pool.submit(simulate_block, *job))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def run(self):
+        seed = self.args.seed if self.args.seed is not None else np.random.SeedSequence().entropy
+        nominal = self.nominal()
+        tolerances = self.tolerances(nominal)
+        edges = self.histogram_edges(nominal, tolerances, seed)
+
+        totals = {name: None for name in METRICS}
+        blocks = int(math.ceil(self.args.samples / max(1, self.args.chunk_size)))
+        done = 0
+        for result in self.blocks(nominal, tolerances, seed, edges):
+            for name, r in result.items():
+                t = totals[name]
+                if t is None:
+                    totals[name] = dict(r)
+                    continue
+                t['counts'] = t['counts'] + r['counts']
+                for key in ('under', 'over', 'n', 'sum', 'sum2'):
+                    t[key] += r[key]
+                t['min'], t['max'] = min(t['min'], r['min']), max(t['max'], r['max'])
+            done += 1
+            if self.args.verbose:
+                print("[*] {}/{} blocks".format(done, blocks))
+
+        report = {'seed': seed, 'samples': self.args.samples,
+                  'nominal': nominal, 'tolerances': {k: list(v) for k, v in tolerances.items()}, 'metrics': {}}
+        for name, t in totals.items():
+            mean = t['sum'] / t['n']
+            report['metrics'][name] = {
+                'mean': mean, 'std': math.sqrt(max(t['sum2'] / t['n'] - mean**2, 0.0)),
+                'min': t['min'], 'max': t['max'],
+                'quantiles': histogram_quantiles(edges[name], t['counts'], t['under'], QUANTILES),
+                'histogram': {'edges': edges[name].tolist(), 'counts': t['counts'].tolist(),
+                              'under': t['under'], 'over': t['over']}}
+
+        if self.args.output:
+            with open(self.args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print("[*] Tolerance report saved: " + self.args.output)
+        if self.args.variable_return:
+            return report
+
+        print("[*] {} samples, seed {}".format(self.args.samples, seed))
+        units = {'frequency_shift': 'Hz', 'Rin': 'ohm', 'S11_dB': 'dB'}
+        for name, m in report['metrics'].items():
+            q = m['quantiles']
+            print("[*] {} ({}): mean {:.6g}, std {:.6g}, 1% {:.6g}, median {:.6g}, 99% {:.6g}".format(
+                name, units[name], m['mean'], m['std'], q[0.01], q[0.5], q[0.99]))
+        return report
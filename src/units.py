@@ -0,0 +1,23 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  units.py
+#
+#   One Pint unit registry shared by every module. Pint is imported
+#   and the registry is built the first time get_ureg() is called, so
+#   runs that never format or convert a unit do not pay for it.
+##--------------------------------------------------------------------\
+
+_ureg = None
+
+def get_ureg():
+    global _ureg
+    if _ureg is None:
+        from profiler import stage
+        with stage("units: build registry"):
+            from pint import UnitRegistry  #pip install pint
+            # ':auto:' keeps the parsed unit definitions in the user cache
+            # directory, which makes building the registry much faster after
+            # the first run
+            _ureg = UnitRegistry(cache_folder=':auto:')
+    return _ureg
@@ -0,0 +1,217 @@
+#! /usr/bin/python3
+
+##--------------------------------------------------------------------\
+#   AntennaCalculator  wire_antenna.py
+#
+#   Wire dipoles and monopoles of finite diameter. The input impedance
+#   of a centre fed dipole comes from the induced EMF method [1], and
+#   the resonant length is where its reactance is zero, so the wire is
+#   shortened more the thicker it is. A velocity factor below one (an
+#   insulated wire) scales that length again and nothing else, the
+#   impedance is the one of the bare wire. The Q of the resonance,
+#   from the slope of the reactance, gives the VSWR bandwidth against
+#   the feed impedance. A monopole over a perfect ground plane is half
+#   of the dipole: half the length and half the impedance.
+#
+#   The induced EMF method holds for thin wires. A wire too thick for
+#   it (a diameter of roughly a tenth of a wavelength) has no resonance
+#   in the model, and is rejected with a ValueError.
+#
+#   Every input may be an array and the inputs are broadcast against
+#   each other, so a whole channel plan, or the odd harmonic
+#   resonances of one wire, are designed in one vectorized call.
+#
+#   from wire_antenna import design_wire_dipole
+#   d = design_wire_dipole([144e6, 433e6], 2e-3, velocity_factor=0.95)
+#   d['L_total'], d['Rin'], d['bandwidth']
+##--------------------------------------------------------------------\
+
+import numpy as np
+
+from antenna_api import C
+from inverse_solver import solve
+
+ETA = 120 * np.pi
+EULER = 0.5772156649015329
+
+def sici(x):
+    # sine and cosine integrals Si(x), Ci(x) for x > 0: the power series up
+    # to x = 4, the continued fraction of E1(ix) above it
+    x = np.asarray(x, dtype=np.float64)
+    si, ci = np.empty_like(x), np.empty_like(x)
+    small = x <= 4
+    t = x[small]
+    t2 = t * t
+    term = np.ones_like(t)
+    s, c = t.copy(), np.zeros_like(t)
+    for k in range(1, 30):
+        term = -term * t2 / ((2 * k - 1) * (2 * k))
+        c += term / (2 * k)
+        s += term * t / (2 * k + 1)**2
+    si[small], ci[small] = s, EULER + np.log(t) + c
+    t = x[~small]
+    # NaN inputs give NaN, without warnings and without holding up the others
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        b = 1 + 1j * t
+        c = np.full(t.shape, 1e300, dtype=np.complex128)
+        d = h = 1 / b
+        for i in range(2, 200):
+            a = -(i - 1)**2
+            b = b + 2
+            d = 1 / (a * d + b)
+            c = b + a / c
+            step = c * d
+            h = h * step
+            if not np.any(np.abs(step - 1) >= 1e-15):
+                break
+        h = (np.cos(t) - 1j * np.sin(t)) * h
+    si[~small], ci[~small] = np.pi / 2 + h.imag, -h.real
+    return si, ci
+
+def dipole_impedance(f, length, radius):
+    # (R, X) at the feed of a centre fed dipole of total length and wire
+    # radius in free space, for a sinusoidal current distribution
+    k = 2 * np.pi * f / C
+    kl = k * length
+    si1, ci1 = sici(kl)
+    si2, ci2 = sici(2 * kl)
+    _, cia = sici(2 * k * radius**2 / length)
+    R = ETA / (2 * np.pi) * (EULER + np.log(kl) - ci1 + 0.5 * np.sin(kl) * (si2 - 2 * si1)
+                             + 0.5 * np.cos(kl) * (EULER + np.log(kl / 2) + ci2 - 2 * ci1))
+    X = ETA / (4 * np.pi) * (2 * si1 + np.cos(kl) * (2 * si1 - si2) - np.sin(kl) * (2 * ci1 - ci2 - cia))
+    # referred from the current maximum to the feed point
+    s2 = np.sin(kl / 2)**2
+    return R / s2, X / s2
+
+def electrical_length(f, diameter, harmonic=1, scan=17):
+    # total length of the bare dipole that resonates (X = 0) at f with
+    # harmonic half waves on it. Only odd harmonics put a current maximum at
+    # the feed. X > 0 at exactly harmonic half waves whatever the diameter.
+    # A thick wire has X < 0 only in a narrow band below that, so where X is
+    # not negative at the usual lower end the bracket starts at the lowest X
+    # of a coarse scan from harmonic - 1/2 half waves instead
+    f, diameter, harmonic = [np.array(a, dtype=np.float64) for a in np.broadcast_arrays(f, diameter, harmonic)]
+    if np.any(harmonic % 2 != 1):
+        raise ValueError("a centre fed dipole only resonates on odd harmonics")
+    half_wave = C / (2 * f)
+    hi = harmonic * half_wave
+    lo = np.array(hi - 0.4 * half_wave)
+    thick = dipole_impedance(f, lo, diameter / 2)[1] >= 0
+    if np.any(thick):
+        candidates = hi[thick] - half_wave[thick] * np.linspace(0.5, 0.0, scan)[:, None]
+        X = dipole_impedance(f[thick], candidates, diameter[thick] / 2)[1]
+        lo[thick] = candidates[np.argmin(X, axis=0), np.arange(candidates.shape[1])]
+    length = solve(lambda l, f, r: dipole_impedance(f, l, r)[1], lo, hi, f, diameter / 2)
+    if np.any(np.isnan(length)):
+        i = np.unravel_index(np.argmax(np.isnan(length)), length.shape)
+        raise ValueError("no resonant length for a {:g} m wire at {:g} Hz, the induced EMF method only holds for "
+                         "wires much thinner than a wavelength".format(diameter[i], f[i]))
+    return length
+
+def resonant_length(f, diameter, velocity_factor=1.0, harmonic=1):
+    # physical length of the resonant dipole, the bare wire length scaled
+    # by the velocity factor
+    return electrical_length(f, diameter, harmonic) * velocity_factor
+
+def quality_factor(f, length, radius):
+    # Q of the series resonance, f / 2R * dX/df at constant length
+    R, _ = dipole_impedance(f, length, radius)
+    df = f * 1e-6
+    dX = dipole_impedance(f + df, length, radius)[1] - dipole_impedance(f - df, length, radius)[1]
+    return f / (2 * R) * dX / (2 * df)
+
+def vswr_bandwidth(Q, R, Z0, vswr):
+    # fractional bandwidth of a resonance for VSWR <= vswr on a Z0 feed,
+    # NaN where R alone is already outside the limit
+    T = R / Z0
+    fbw = np.sqrt((T * vswr - 1) * (vswr - T) / vswr, where=(T * vswr >= 1) & (vswr >= T),
+                  out=np.full(np.broadcast(T, vswr).shape, np.nan)) / Q
+    return fbw
+
+def wire_design(f, diameter, velocity_factor, harmonic, Z0, vswr, monopole):
+    f, diameter, velocity_factor, harmonic, Z0, vswr = [np.asarray(a, dtype=np.float64) for a in np.broadcast_arrays(
+        f, diameter, velocity_factor, harmonic, Z0, vswr)]
+    electrical = electrical_length(f, diameter, harmonic)
+    R, _ = dipole_impedance(f, electrical, diameter / 2)
+    Q = quality_factor(f, electrical, diameter / 2)
+    length = electrical * velocity_factor
+    if monopole:
+        length, R = length / 2, R / 2
+        names = ['L']
+    else:
+        names = ['L_total', 'L_element']
+    out = np.empty(f.shape, dtype=[('frequency', 'f8'), ('diameter', 'f8'), ('velocity_factor', 'f8'),
+                                   ('harmonic', 'i8')] + [(n, 'f8') for n in names] +
+                                  [('shortening', 'f8'), ('Rin', 'f8'), ('Q', 'f8'), ('bandwidth', 'f8')])
+    out['frequency'], out['diameter'], out['velocity_factor'], out['harmonic'] = f, diameter, velocity_factor, harmonic
+    out[names[0]] = length
+    if not monopole:
+        out['L_element'] = length / 2
+    # against the free space length harmonic * C / 2f (C / 4f for a monopole)
+    out['shortening'] = length / (harmonic * C / (2 * f) / (2 if monopole else 1))
+    out['Rin'] = R
+    out['Q'] = Q
+    out['bandwidth'] = vswr_bandwidth(Q, R, Z0, vswr) * f
+    return out
+
+def design_wire_dipole(f, diameter, velocity_factor=1.0, harmonic=1, Z0=50.0, vswr=2.0):
+    # structured array with L_total, L_element, shortening, Rin, Q and
+    # bandwidth (Hz) for every element of the broadcast inputs
+    return wire_design(f, diameter, velocity_factor, harmonic, Z0, vswr, False)
+
+def design_wire_monopole(f, diameter, velocity_factor=1.0, harmonic=1, Z0=50.0, vswr=2.0):
+    # as design_wire_dipole, with the monopole height L
+    return wire_design(f, diameter, velocity_factor, harmonic, Z0, vswr, True)
+
+
+# factors from meters, so that a table of lengths is printed without Pint
+UNIT_SCALE = {'meter': 1.0, 'centimeter': 100.0, 'millimeter': 1000.0, 'inch': 1 / 0.0254}
+
+
+class WireAntenna:
+    def __init__(self, args):
+        self.args = args
+
+    def inputs(self):
+        values = []
+        for spec in (self.args.frequency, self.args.diameter, self.args.velocity_factor, self.args.harmonic):
+            values.append(np.array([float(v) for v in spec.split(',')]))
+        return np.broadcast_arrays(*values)
+
+    def design(self):
+        f, diameter, velocity_factor, harmonic = self.inputs()
+        if np.any(harmonic != np.round(harmonic)):
+            raise ValueError("--harmonic must be a whole number")
+        design = design_wire_monopole if self.args.antenna == 'monopole' else design_wire_dipole
+        return design(f, diameter, velocity_factor, harmonic.astype(np.int64), self.args.impedance, self.args.vswr)
+
+    def run(self):
+        try:
+            out = self.design()
+        except ValueError as e:
+            if self.args.variable_return:
+                raise
+            print("[*] " + str(e))
+            return None
+        if self.args.output:
+            from sweep import SWEEP_WRITERS, output_format
+            writer = SWEEP_WRITERS[output_format(self.args.output, self.args.format)](self.args.output, out.dtype, len(out))
+            try:
+                writer.write(out)
+            finally:
+                writer.close()
+            print("[*] Wire antenna designs saved: " + self.args.output + " ({} designs)".format(len(out)))
+        if self.args.variable_return:
+            return out
+        if not self.args.output:
+            unit = self.args.unit or 'meter'
+            scale = UNIT_SCALE[unit]
+            length = 'L' if self.args.antenna == 'monopole' else 'L_total'
+            for row in out:
+                line = "[*] f = {:.6g} Hz: {} = {:.4f} {}".format(row['frequency'], length, row[length] * scale, unit)
+                if self.args.verbose:
+                    line += ", harmonic {}, shortening {:.4f}".format(row['harmonic'], row['shortening'])
+                line += ", Rin = {:.2f} ohm, Q = {:.2f}, bandwidth = {:.6g} Hz".format(row['Rin'], row['Q'],
+                                                                                    row['bandwidth'])
+                print(line)
+        return out
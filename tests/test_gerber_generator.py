@@ -0,0 +1,68 @@
+import gerber
+import pytest
+
+from antenna_calculator import AntennaCalculator
+
+
+def export(engine, patch_type):
+    # gerber layers of the 2.4 GHz FR-4 patch, in millimeters
+    shell = AntennaCalculator(['rectangular_patch', '-f', '2.4e9', '-er', '4.4', '-h', '1.6e-3', '--type', patch_type,
+                               '-du', 'millimeter', '--gerberoutput', engine, '--gerber_engine', engine])
+    shell.main(shell.getArgs())
+    layers = []
+    for suffix in ('_top.gtl', '_substrate.gml'):
+        with open(engine + suffix) as f:
+            layer = gerber.loads(f.read())
+        layer.to_metric()
+        layers.append(layer)
+    return layers
+
+
+def vertices(primitive):
+    # corners of a region, or the ends of a line
+    segments = getattr(primitive, 'primitives', None) or [primitive]
+    return sorted((round(x, 4), round(y, 4)) for segment in segments for x, y in (segment.start, segment.end))
+
+
+def center(primitive):
+    (x0, x1), (y0, y1) = primitive.bounding_box
+    return (x0 + x1) / 2, (y0 + y1) / 2
+
+
+@pytest.mark.parametrize('patch_type', ['microstrip', 'probe'])
+def test_native_writer_matches_gerberex(tmp_path, monkeypatch, patch_type):
+    monkeypatch.chdir(tmp_path)
+    gerberex_top, gerberex_substrate = export('gerberex', patch_type)
+    native_top, native_substrate = export('native', patch_type)
+
+    # the copper polygon has the same corners
+    gerberex_copper = [p for p in gerberex_top.primitives if p.level_polarity == 'dark']
+    native_copper = [p for p in native_top.primitives if p.level_polarity == 'dark']
+    assert len(gerberex_copper) == len(native_copper) == 1
+    assert vertices(native_copper[0]) == vertices(gerberex_copper[0])
+
+    # the probe feed is cleared out of the copper at the same point
+    gerberex_feed = [p for p in gerberex_top.primitives if p.level_polarity == 'clear']
+    native_feed = [p for p in native_top.primitives if p.level_polarity == 'clear']
+    assert len(gerberex_feed) == len(native_feed) == (1 if patch_type == 'probe' else 0)
+    for a, b in zip(gerberex_feed, native_feed):
+        assert center(b) == pytest.approx(center(a), abs=1e-3)
+
+    # the board outline is the same rectangle
+    assert sorted(vertices(p) for p in native_substrate.primitives) == \
+        sorted(vertices(p) for p in gerberex_substrate.primitives)
+
+
+@pytest.mark.parametrize('patch_type', ['microstrip', 'probe'])
+def test_in_memory_documents_match_dxf_files(tmp_path, monkeypatch, patch_type):
+    # the layers written from the in-memory documents are byte for byte the
+    # ones written from the _top.dxf and _substrate.dxf files
+    from gerber_generator import GerberGenerator
+    monkeypatch.chdir(tmp_path)
+    shell = AntennaCalculator(['rectangular_patch', '-f', '2.4e9', '-er', '4.4', '-h', '1.6e-3', '--type', patch_type,
+                               '--gerberoutput', 'patch', '--keep_dxf'])
+    shell.main(shell.getArgs())
+    in_memory = [(tmp_path / name).read_bytes() for name in ('patch_top.gtl', 'patch_substrate.gml')]
+    GerberGenerator(shell.getArgs()).generate_gerber('patch')
+    from_files = [(tmp_path / name).read_bytes() for name in ('patch_top.gtl', 'patch_substrate.gml')]
+    assert in_memory == from_files
@@ -0,0 +1,18 @@
+import pytest
+
+from antenna_api import design_half_wave_dipole, design_quarter_wave_monopole
+from radiation_pattern import RadiationPattern
+
+
+def test_half_wave_dipole_directivity():
+    s = RadiationPattern(design_half_wave_dipole(433e6)).summary()
+    assert s.directivity_dBi == pytest.approx(2.15, abs=0.01)
+    assert s.peak_theta == pytest.approx(90.0)
+    assert s.hpbw_e_plane == pytest.approx(78.0, abs=0.5)
+
+
+def test_quarter_wave_monopole_directivity():
+    # the image in the ground plane doubles the dipole directivity
+    s = RadiationPattern(design_quarter_wave_monopole(433e6)).summary()
+    assert s.directivity_dBi == pytest.approx(5.16, abs=0.01)
+    assert s.peak_theta == pytest.approx(90.0)
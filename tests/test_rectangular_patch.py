@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from antenna_calculator import AntennaCalculator
+from rectangular_patch import RectangularPatch
+
+OUTPUTS = {'png': ['patch.png'], 'dxf': ['patch.dxf'], 'gerber': ['patch_top.gtl', 'patch_substrate.gml']}
+
+
+def patch():
+    args = AntennaCalculator(['rectangular_patch_export', '--width', '38.04e-3', '--length', '29.44e-3',
+                              '-x0', '11.32e-3', '-y0', '19.02e-3', '-ws', '3.06e-3', '--png_mode', '1bit',
+                              '--png_dpi', '72', '--pngoutput', 'patch.png', '--dxfoutput', 'patch.dxf',
+                              '--gerberoutput', 'patch']).getArgs()
+    return RectangularPatch(args)
+
+
+@pytest.mark.parametrize('kind', sorted(OUTPUTS))
+def test_single_format_wrappers(tmp_path, monkeypatch, kind):
+    # each wrapper writes its own format only, though every output is named
+    monkeypatch.chdir(tmp_path)
+    getattr(patch(), 'export_patch_to_' + kind)()
+    assert sorted(os.listdir(tmp_path)) == sorted(OUTPUTS[kind])
+
+
+def test_export_patch_writes_every_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    patch().export_patch()
+    assert sorted(os.listdir(tmp_path)) == sorted(sum(OUTPUTS.values(), []))
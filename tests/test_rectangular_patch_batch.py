@@ -0,0 +1,58 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from antenna_api import design_rectangular_patch
+from antenna_calculator import AntennaCalculator
+from rectangular_patch import RectangularPatch
+from rectangular_patch_batch import RectangularPatchBatch
+
+F = np.array([0.9e9, 2.4e9, 5.8e9, 10e9])
+ER = np.array([1.5, 2.2, 4.4, 10.2])
+H = np.array([0.5e-3, 1.6e-3, 3.2e-3])
+# narrow (A form) and wide (B form) strips, and 300 ohms above the edge resistance
+Z0 = np.array([20.0, 50.0, 100.0, 300.0])
+
+
+def grid():
+    return list(itertools.product(F, ER, H, Z0))
+
+
+def design_grid():
+    f, er, h, z0 = (np.array(v) for v in zip(*grid()))
+    with np.errstate(invalid='ignore'):
+        return RectangularPatchBatch().design(f, er, h, z0)
+
+
+def test_batch_matches_scalar_api():
+    batch = design_grid()
+    for i, point in enumerate(grid()):
+        try:
+            d = design_rectangular_patch(*(float(v) for v in point[:3]), 'microstrip', float(point[3]))
+        except ValueError:
+            # the scalar API rejects what the batch marks NaN
+            assert np.isnan(batch['x0'][i])
+            continue
+        for name in ('W', 'L', 'x0', 'y0', 'Ereff'):
+            assert batch[name][i] == pytest.approx(getattr(d, name), rel=1e-12)
+        if d.Ws is None:
+            assert np.isnan(batch['Ws'][i])
+        else:
+            assert batch['Ws'][i] == pytest.approx(d.Ws, rel=1e-12)
+
+
+def test_batch_matches_patch_methods():
+    patch = RectangularPatch(AntennaCalculator(['rectangular_patch', '-f', '2.4e9', '-er', '4.4',
+                                                '-h', '1.6e-3']).getArgs())
+    batch = design_grid()
+    for i, (f, er, h, z0) in enumerate(grid()):
+        f, er, h, z0 = float(f), float(er), float(h), float(z0)
+        W = patch.patch_width(f, er)
+        ereff = patch.effective_relative_permittivity(f, er, h, W)
+        L = patch.effective_length(f, ereff) - 2 * patch.delta_length(h, ereff, W)
+        assert batch['W'][i] == pytest.approx(W, rel=1e-12)
+        assert batch['L'][i] == pytest.approx(L, rel=1e-12)
+        np.testing.assert_allclose(batch['x0'][i], patch.x0_calculation(L, W, er, z0), rtol=1e-12)
+        ws = patch.ws_calculation(h, z0, er)
+        np.testing.assert_allclose(batch['Ws'][i], np.nan if ws is None else ws, rtol=1e-12)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from result_store import ResultStore
+from sweep import ParameterAxis
+
+
+@pytest.fixture
+def store(tmp_path):
+    # 4 frequencies x 2 permittivities, written in two chunks like a sweep
+    path = str(tmp_path / 'small.store')
+    axes = [ParameterAxis('frequency', '1e9:4e9:1e9'), ParameterAxis('relative_permittivity', '2.2,4.4')]
+    dtype = np.dtype([('W', 'f8'), ('L', 'f8')])
+    out = ResultStore.create(path, dtype, 8, axes)
+    W = np.array([8.0, 3.0, 6.0, np.nan, 1.0, 5.0, 3.0, 7.0])
+    for start, stop in ((0, 5), (5, 8)):
+        rows = out.rows(start, stop)
+        rows['W'] = W[start:stop]
+        rows['L'] = np.arange(start, stop)
+        rows.flush()
+    out.close()
+    return ResultStore(path)
+
+
+def test_store_is_complete(store):
+    assert store.header['complete']
+    assert len(store) == 8
+    np.testing.assert_array_equal(store['L'], np.arange(8))
+    assert store.row(5) == {'frequency': 3e9, 'relative_permittivity': 4.4, 'W': 5.0, 'L': 5.0}
+
+
+def test_select(store):
+    assert store.select(frequency=2.1e9, relative_permittivity=4.0) == 3
+    np.testing.assert_array_equal(store.select(relative_permittivity=2.2), [0, 2, 4, 6])
+    np.testing.assert_array_equal(store.select(frequency=9e9), [6, 7])
+    with pytest.raises(KeyError):
+        store.select(height=1.6e-3)
+
+
+def test_nearest(store):
+    assert store.nearest('W', 5.9) == 2
+    assert store.nearest('W', 100.0) == 0
+    assert store.nearest('W', -1.0) == 4
+    # halfway between two values the lower one wins
+    assert store['W'][store.nearest('W', 4.0)] == 3.0
+
+
+def test_between(store):
+    assert sorted(store.between('W', 3.0, 6.0)) == [1, 2, 5, 6]
+    assert len(store.between('W', 9.0, 10.0)) == 0
+    # the NaN row is never in range
+    assert sorted(store.between('W', -np.inf, np.inf)) == [0, 1, 2, 4, 5, 6, 7]
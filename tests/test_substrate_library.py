@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from substrate_library import pareto_mask
+
+
+def brute_force_mask(costs):
+    # a row is dropped when another row is no worse anywhere and better
+    # somewhere, or when it repeats an earlier row
+    keep = np.ones(len(costs), dtype=bool)
+    for i, c in enumerate(costs):
+        for j, other in enumerate(costs):
+            if np.all(other <= c) and (np.any(other < c) or j < i):
+                keep[i] = False
+                break
+    return keep
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('objectives', [1, 2, 3])
+def test_pareto_mask_matches_brute_force(seed, objectives):
+    rng = np.random.default_rng(seed)
+    costs = rng.random((200, objectives))
+    np.testing.assert_array_equal(pareto_mask(costs), brute_force_mask(costs))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pareto_mask_with_ties(seed):
+    # few distinct values, so rows tie in some objectives and repeat
+    costs = np.random.default_rng(seed).integers(0, 4, (100, 3)).astype(float)
+    np.testing.assert_array_equal(pareto_mask(costs), brute_force_mask(costs))
@@ -0,0 +1,23 @@
+import pytest
+
+from antenna_calculator import AntennaCalculator
+from tolerance_analysis import ToleranceAnalysis
+
+
+def run(*argv):
+    args = AntennaCalculator(['tolerance', '-f', '2.4e9', '-er', '4.4', '-h', '1.6e-3', '--loss_tangent', '0.02',
+                              '--tol_er', 'normal:0.1', '--tol_h', 'uniform:5%', '--tol_etch', 'normal:10e-6',
+                              '-n', '20000', '--chunk_size', '3000', '--bins', '200', '--variable_return']
+                             + list(argv)).getArgs()
+    return ToleranceAnalysis(args).run()
+
+
+@pytest.mark.parametrize('workers', ['2', '3'])
+def test_same_seed_same_report_with_any_worker_count(workers):
+    # the blocks have their own seeds and are added up in order, so the
+    # worker processes change nothing down to the last bit
+    assert run('--seed', '5', '-j', workers) == run('--seed', '5', '-j', '1')
+
+
+def test_seed_changes_report():
+    assert run('--seed', '5', '-j', '1')['metrics'] != run('--seed', '6', '-j', '1')['metrics']
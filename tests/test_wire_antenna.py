@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from wire_antenna import design_wire_dipole, design_wire_monopole, sici
+
+
+def test_sici_tabulated():
+    # Abramowitz and Stegun table 5.1, on both sides of the series/continued fraction switch at x = 4
+    x = [0.5, 1.0, 5.0, 10.0, 20.0]
+    si, ci = sici(x)
+    np.testing.assert_allclose(si, [0.493107, 0.946083, 1.549931, 1.658348, 1.548242], atol=1e-6)
+    np.testing.assert_allclose(ci, [-0.177784, 0.337404, -0.190030, -0.045456, 0.044420], atol=1e-6)
+
+
+def test_thin_half_wave_dipole_shortening():
+    # a wire of 1e-4 wavelengths resonates about 3 % short of half a wavelength
+    d = design_wire_dipole(300e6, 1e-4)
+    assert d['shortening'] == pytest.approx(0.97, abs=0.005)
+    assert d['L_element'] == pytest.approx(d['L_total'] / 2)
+    assert 65 < d['Rin'] < 73
+
+
+def test_thicker_wire_is_shorter():
+    d = design_wire_dipole(300e6, [1e-4, 1e-3, 1e-2])
+    assert np.all(np.diff(d['shortening']) < 0)
+
+
+def test_monopole_is_half_the_dipole():
+    dipole = design_wire_dipole(300e6, 1e-3)
+    monopole = design_wire_monopole(300e6, 1e-3)
+    assert monopole['L'] == pytest.approx(dipole['L_total'] / 2)
+    assert monopole['Rin'] == pytest.approx(dipole['Rin'] / 2)
+
+
+def test_velocity_factor_scales_the_length_only():
+    bare = design_wire_dipole(144e6, 2e-3)
+    insulated = design_wire_dipole(144e6, 2e-3, velocity_factor=0.95)
+    assert insulated['L_total'] == pytest.approx(0.95 * bare['L_total'])
+    assert insulated['Rin'] == pytest.approx(bare['Rin'])
+
+
+def test_invalid_wires_are_rejected():
+    with pytest.raises(ValueError):
+        design_wire_dipole(300e6, 0.5)
+    with pytest.raises(ValueError):
+        design_wire_dipole(300e6, 1e-3, harmonic=2)